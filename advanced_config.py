@@ -3,6 +3,8 @@ Configuración avanzada (OPCIONAL)
 Solo edita este archivo si necesitas ajustar parámetros específicos
 """
 
+import os
+
 
 class AdvancedConfig:
     """Configuración avanzada del sistema"""
@@ -20,25 +22,11 @@ class AdvancedConfig:
     # 3. Anota las direcciones de memoria
     # 4. Calcula el offset desde el inicio de la memoria compartida
     
-    # Offsets alternativos para diferentes versiones (descomentar si es necesario)
-    
-    # Versión 1 (predeterminada - en config.py)
-    # OFFSET_FUEL = 100
-    # OFFSET_MAX_FUEL = 104
-    # OFFSET_LAP = 200
-    # OFFSET_TOTAL_LAPS = 204
-    
-    # Versión 2 (alternativa - descomenta si la versión 1 no funciona)
-    # OFFSET_FUEL = 120
-    # OFFSET_MAX_FUEL = 124
-    # OFFSET_LAP = 220
-    # OFFSET_TOTAL_LAPS = 224
-    
-    # Versión 3 (para builds más recientes)
-    # OFFSET_FUEL = 150
-    # OFFSET_MAX_FUEL = 154
-    # OFFSET_LAP = 250
-    # OFFSET_TOTAL_LAPS = 254
+    # Los offsets alternativos para diferentes versiones ("Versión 1/2/3")
+    # están registrados como perfiles en layouts.py (LAYOUT_PROFILES).
+    # Con Config.LAYOUT_PROFILE = "auto" el monitor elige al conectar el
+    # perfil cuyos valores son coherentes, sin tener que editar nada.
+    # Para añadir una versión nueva, registra un LayoutProfile en layouts.py.
     
     # ============================================================
     # CONFIGURACIÓN DE CÁLCULOS
@@ -49,12 +37,82 @@ class AdvancedConfig:
     # Menos vueltas = más reactivo pero menos estable
     LAPS_FOR_AVERAGE = 10
     
+    # Factor de suavizado de la media exponencial (EWMA) del consumo
+    # Valores altos reaccionan antes a cambios de mezcla o ritmo
+    EWMA_ALPHA = 0.3
+    
+    # Subida mínima de combustible (litros) que se considera un repostaje
+    # y abre un stint nuevo
+    REFUEL_THRESHOLD = 1.0
+    
+    # Vueltas que no cuentan para el consumo: más lentas que la mediana de las
+    # últimas vueltas en esta fracción (amarilla, safety car, entrada a boxes)
+    LAP_TIME_OUTLIER = 0.07
+    
+    # Vueltas con tiempo necesarias antes de descartar ninguna por lenta
+    LAP_TIME_MIN_REFERENCE = 3
+    
+    # El análisis se recalcula solo si el combustible se mueve más que esto
+    # (litros) o cambian vuelta, vueltas totales o depósito
+    ANALYSIS_FUEL_TOLERANCE = 0.01
+    
+    # Tramos en que se divide la vuelta para el modelo por distancia
+    # (lapdist_model.py, requiere mLapDist: CONNECTOR_MODE = "ctypes")
+    LAPDIST_BINS = 100
+    
+    # Fracción de vuelta recorrida antes de dar una proyección de consumo
+    LAPDIST_MIN_COVERAGE = 0.1
+    
+    # Lift & coast (liftcoast.py, requiere CONNECTOR_MODE = "ctypes")
+    # Metros de cada tramo del perfil de acelerador, freno y consumo
+    LIFTCOAST_SEGMENT_LENGTH = 10.0
+    
+    # Acelerador (fracción) a partir del que un tramo va "a fondo" y freno
+    # (fracción del tiempo del tramo) a partir del que empieza una frenada
+    LIFTCOAST_FULL_THROTTLE = 0.95
+    LIFTCOAST_BRAKE_THRESHOLD = 0.1
+    
+    # Metros máximos antes de la frenada en que se propone levantar
+    LIFTCOAST_MAX_LIFT = 200.0
+    
+    # Deceleración sin gas (m/s²): resistencia aerodinámica y freno motor
+    LIFTCOAST_COAST_DECELERATION = 1.5
+    
+    # Espera entre sondeos sin frame nuevo, hueco entre frames que descarta
+    # la vuelta (pausa) y velocidad máxima creíble (m/s) entre lecturas
+    LIFTCOAST_POLL_INTERVAL = 0.001
+    LIFTCOAST_MAX_GAP = 0.5
+    LIFTCOAST_MAX_SPEED = 150.0
+    
     # Multiplicador de consumo para ser más conservador
     # 1.0 = sin cambio
     # 1.05 = 5% más conservador (recomendado)
     # 1.10 = 10% más conservador
     CONSUMPTION_MULTIPLIER = 1.0
     
+    # ============================================================
+    # ESTRATEGIA DE PARADAS (ver strategy.py)
+    # ============================================================
+    
+    # Litros por segundo que entran al repostar
+    REFUEL_RATE = 2.5
+    
+    # Segundos perdidos por pasar por el pit lane (sin contar el repostaje)
+    PIT_LANE_TIME_LOSS = 25.0
+    
+    # Segundos por vuelta que cuesta cada litro de combustible en el tanque
+    FUEL_WEIGHT_PENALTY = 0.03
+    
+    # Fracción del consumo por vuelta que se puede ahorrar en pista; si el
+    # déficit exige más, el monitor indica la parada en lugar de ahorrar
+    MAX_FUEL_SAVE_FRACTION = 0.05
+    
+    # Resolución del combustible en el optimizador (unidades por vuelta)
+    STRATEGY_STEPS_PER_LAP = 2
+    
+    # Redondeo del consumo (litros) para reutilizar el plan entre vueltas
+    STRATEGY_CONSUMPTION_STEP = 0.05
+    
     # ============================================================
     # CONFIGURACIÓN DE ALERTAS
     # ============================================================
@@ -81,6 +139,67 @@ class AdvancedConfig:
     # Ruta del CSV
     CSV_FILE_PATH = "lap_history.csv"
     
+    # Tamaño máximo de cada fichero antes de rotarlo (log y CSV) y copias que
+    # se conservan (fichero.1, fichero.2...): acota el disco en carreras de 24 h
+    LOG_MAX_BYTES = 5 * 1024 * 1024
+    LOG_BACKUP_COUNT = 5
+    
+    # Segundos entre volcados al disco y entre fsync (ver session_log.py)
+    LOG_FLUSH_INTERVAL = 1.0
+    LOG_FSYNC_INTERVAL = 10.0
+    
+    # ============================================================
+    # GRABACIÓN DE SESIONES
+    # ============================================================
+    
+    # Grabar cada frame de telemetría en un fichero binario (.lmurec)
+    RECORD_SESSIONS = False
+    
+    # Carpeta donde se guardan las grabaciones
+    RECORDINGS_DIR = "sessions"
+    
+    # Frames por chunk del fichero de grabación
+    RECORDING_CHUNK_FRAMES = 4096
+    
+    # ============================================================
+    # CACHÉ DE CONSUMO (ver consumption_cache.py)
+    # ============================================================
+    
+    # Recordar el consumo por circuito y coche entre sesiones (escribe en disco)
+    CONSUMPTION_CACHE_ENABLED = False
+    
+    # Fichero de la caché: en la carpeta del usuario, no en la de trabajo
+    CONSUMPTION_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".lmu_fuel_monitor",
+                                          "consumption_cache.json")
+    
+    # Combinaciones circuito/coche guardadas como máximo (se descartan las más antiguas)
+    CONSUMPTION_CACHE_MAX_ENTRIES = 200
+    
+    # Días tras los que una combinación no usada se descarta
+    CONSUMPTION_CACHE_MAX_AGE_DAYS = 180
+    
+    # Vueltas que "vale" el consumo guardado al empezar; cada vuelta real
+    # completada le resta una hasta desaparecer
+    PRIOR_WEIGHT_LAPS = 3
+    
+    # ============================================================
+    # DASHBOARD WEB (ver dashboard.py)
+    # ============================================================
+    
+    # Servir el dashboard en la red local (tablet, pantalla del muro de boxes)
+    DASHBOARD_ENABLED = False
+    
+    # Dirección y puerto del servidor ("0.0.0.0" = accesible desde la red local)
+    DASHBOARD_HOST = "0.0.0.0"
+    DASHBOARD_PORT = 8765
+    
+    # Envíos por segundo como máximo a cada cliente (los cambios se agrupan)
+    DASHBOARD_PUSH_RATE = 5.0
+    
+    # Bytes pendientes de enviar a partir de los que un cliente se considera
+    # lento: se le saltan envíos y al recuperarse recibe el estado completo
+    DASHBOARD_MAX_CLIENT_BUFFER = 65536
+    
     # ============================================================
     # CONFIGURACIÓN DE INTERFAZ
     # ============================================================
@@ -98,14 +217,22 @@ class AdvancedConfig:
     # CONFIGURACIÓN DE DEBUG
     # ============================================================
     
-    # Modo debug: muestra información técnica adicional
+    # Modo debug: latencias por etapa, frames perdidos, errores de lectura y
+    # jitter del sondeo (ver instrumentation.py). Desactivado no cuesta nada
     DEBUG_MODE = False
     
-    # Mostrar valores raw de memoria
+    # Mostrar valores raw de memoria (bytes de cada campo en el informe de debug)
     SHOW_RAW_MEMORY_VALUES = False
     
-    # Guardar dumps de memoria para análisis
+    # Segundos entre informes de debug y fichero JSON donde se vuelcan
+    DEBUG_REPORT_INTERVAL = 10.0
+    DEBUG_DUMP_PATH = "instrumentation.json"
+    
+    # Guardar dumps de memoria para análisis (dentro de la grabación .lmurec)
     SAVE_MEMORY_DUMPS = False
+    
+    # Segundos entre dumps de memoria
+    MEMORY_DUMP_INTERVAL = 5.0
 
 
 # ============================================================
@@ -0,0 +1,383 @@
+"""
+Análisis offline de archivos de sesiones grabadas (.lmurec)
+
+Mapea en memoria cada grabación, toma sus columnas como arrays de NumPy y
+extrae las vueltas con las mismas definiciones que FuelCalculator
+(is_refuel, lap_consumption, is_valid_consumption), así que las cifras
+offline coinciden con las del monitor en vivo (--verify compara las vueltas
+limpias y su mediana en ventana, el consumo de referencia del monitor). Con las vueltas de cientos
+de carreras en una tabla de columnas se hacen agregaciones por grupo
+(circuito, coche, sesión, stint) sin bucles en Python:
+
+- Vueltas, media, desviación y percentiles del consumo.
+- Deriva: pendiente del consumo vuelta a vuelta dentro de cada stint
+  (lo que get_consumption_trend solo estima en vivo).
+- Efectividad del ahorro: vueltas del cuartil de menor consumo frente al
+  resto; litros ahorrados y segundos perdidos por vuelta.
+
+Requiere numpy (pip install numpy).
+
+Uso:
+    python analytics.py sessions/
+    python analytics.py sessions/*.lmurec --by track,vehicle,stint --percentiles 10 50 90
+    python analytics.py sessions/ --verify   # compara con FuelCalculator
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from advanced_config import AdvancedConfig
+from calculator import (FuelCalculator, is_refuel, is_slow_lap, is_valid_consumption,
+                        lap_consumption)
+from recorder import SessionReader
+from stats import WindowedMedian
+
+GROUP_FIELDS = ("track", "vehicle", "session", "stint")
+DEFAULT_PERCENTILES = (10, 50, 90)
+SAVE_QUANTILE = 25  # Vueltas de ahorro: percentil de consumo del grupo
+
+LAP_DTYPES = {
+    "session": np.int32,
+    "track": np.int32,
+    "vehicle": np.int32,
+    "stint": np.int32,
+    "lap": np.int32,
+    "fuel_at_line": np.float64,
+    "consumption": np.float64,
+    "lap_time": np.float64,
+    "line_lap_time": np.float64,
+}
+
+
+def load_columns(reader: SessionReader, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Columnas de una grabación como arrays (vistas del mapa unidas en una copia)"""
+    types = dict(reader.columns)
+    result = {}
+    for name in names:
+        views = reader.column_chunks(name)
+        dtype = np.dtype(types[name])
+        parts = [np.frombuffer(view, dtype=dtype) for view in views]
+        result[name] = np.concatenate(parts) if parts else np.empty(0, dtype)
+        # Las vistas deben soltarse antes de cerrar el mapa
+        del parts
+        for view in views:
+            view.release()
+    return result
+
+
+def session_laps(lap: np.ndarray, fuel: np.ndarray, last_lap_time: np.ndarray,
+                 refuel_threshold: float) -> Dict[str, np.ndarray]:
+    """
+    Vueltas válidas de una sesión, con el mismo criterio que FuelCalculator.update
+
+    Solo cuentan los frames con vuelta > 0 (los que el monitor pasa a la
+    calculadora). Una vuelta es válida si va de un cruce de meta al siguiente,
+    el contador sube exactamente en uno, no hay repostaje entre medias y el
+    consumo es positivo. El stint es el número de repostajes previos.
+    """
+    keep = lap > 0
+    lap, fuel, last_lap_time = lap[keep], fuel[keep], last_lap_time[keep]
+    n = len(lap)
+
+    refuel = np.zeros(n, dtype=bool)
+    refuel[1:] = is_refuel(fuel[:-1], fuel[1:], refuel_threshold)
+    refuels = np.cumsum(refuel)
+
+    # Cruces de meta; el primer frame nunca lo es (no se sabe si está en la línea)
+    crossings = np.flatnonzero(lap[1:] > lap[:-1]) + 1
+    if len(crossings) < 2:
+        return {name: np.empty(0, LAP_DTYPES[name]) for name in
+                ("stint", "lap", "fuel_at_line", "consumption", "lap_time", "line_lap_time")}
+    start, end = crossings[:-1], crossings[1:]
+    consumption = lap_consumption(fuel[start], fuel[end])
+    valid = ((lap[end] == lap[end - 1] + 1)
+             & (refuels[end] == refuels[start])
+             & is_valid_consumption(consumption))
+
+    # El tiempo de la vuelta es el último valor publicado durante la siguiente
+    following_end = np.append(crossings[2:], n) - 1
+    return {
+        "stint": refuels[start][valid].astype(np.int32),
+        "lap": lap[start][valid].astype(np.int32),
+        "fuel_at_line": fuel[start][valid],
+        "consumption": consumption[valid],
+        "lap_time": last_lap_time[following_end][valid],
+        # Lo publicado al cruzar la meta: lo que clasifica FuelCalculator
+        "line_lap_time": last_lap_time[end][valid],
+    }
+
+
+def clean_laps(line_lap_time: np.ndarray, window: int, min_reference: int,
+               tolerance: float) -> np.ndarray:
+    """
+    Máscara de vueltas limpias, con las reglas de FuelCalculator.classify_lap
+
+    Una vuelta es lenta si supera la mediana de los últimos `window` tiempos
+    en `tolerance` (con al menos `min_reference` tiempos); sin tiempo de
+    vuelta cuenta como limpia. Las grabaciones no guardan el paso por boxes.
+    Recorre las vueltas en orden (la referencia depende de las anteriores).
+    """
+    clean = np.ones(len(line_lap_time), dtype=bool)
+    times = WindowedMedian(window)
+    for i, lap_time in enumerate(line_lap_time.tolist()):
+        if lap_time <= 0:
+            continue
+        reference = times.median if len(times) >= min_reference else 0.0
+        times.append(lap_time)
+        if reference and is_slow_lap(lap_time, reference, tolerance):
+            clean[i] = False
+    return clean
+
+
+class LapTable:
+    """Vueltas de muchas sesiones en columnas"""
+
+    def __init__(self):
+        self.columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype) for name, dtype in LAP_DTYPES.items()}
+        self.sessions: List[str] = []
+        self.tracks: List[str] = []
+        self.vehicles: List[str] = []
+        self.frames = 0
+
+    def __len__(self) -> int:
+        return len(self.columns["consumption"])
+
+    def labels(self, field: str) -> Optional[List[str]]:
+        """Nombres de los códigos de una columna (None si es numérica)"""
+        return {"session": self.sessions, "track": self.tracks, "vehicle": self.vehicles}.get(field)
+
+
+def _code(names: List[str], codes: Dict[str, int], name: str) -> int:
+    if name not in codes:
+        codes[name] = len(names)
+        names.append(name)
+    return codes[name]
+
+
+def expand_paths(paths: Sequence[str]) -> List[str]:
+    """Ficheros .lmurec de una lista de ficheros, directorios o patrones"""
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(glob.glob(os.path.join(path, "*.lmurec"))))
+        else:
+            result.extend(sorted(glob.glob(path)) or [path])
+    return result
+
+
+def load_archive(paths: Sequence[str], refuel_threshold: Optional[float] = None) -> LapTable:
+    """Lee las grabaciones y construye la tabla de vueltas"""
+    if refuel_threshold is None:
+        refuel_threshold = AdvancedConfig.REFUEL_THRESHOLD
+    table = LapTable()
+    track_codes: Dict[str, int] = {}
+    vehicle_codes: Dict[str, int] = {}
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in LAP_DTYPES}
+
+    for path in expand_paths(paths):
+        try:
+            reader = SessionReader(path)
+        except (OSError, ValueError) as e:
+            print(f"Aviso: se omite {path}: {e}")
+            continue
+        with reader:
+            metadata = reader.metadata
+            columns = load_columns(reader, ("lap", "fuel", "last_lap_time"))
+            table.frames += reader.frame_count
+        laps = session_laps(columns["lap"], columns["fuel"], columns["last_lap_time"],
+                            refuel_threshold)
+        count = len(laps["consumption"])
+        session = len(table.sessions)
+        table.sessions.append(os.path.basename(path))
+        track = _code(table.tracks, track_codes, metadata.get("track", "?"))
+        vehicle = _code(table.vehicles, vehicle_codes, metadata.get("vehicle", "?"))
+        parts["session"].append(np.full(count, session, dtype=np.int32))
+        parts["track"].append(np.full(count, track, dtype=np.int32))
+        parts["vehicle"].append(np.full(count, vehicle, dtype=np.int32))
+        for name, values in laps.items():
+            parts[name].append(values)
+
+    for name, dtype in LAP_DTYPES.items():
+        if parts[name]:
+            table.columns[name] = np.concatenate(parts[name]).astype(dtype, copy=False)
+    return table
+
+
+def grouped_percentiles(group: np.ndarray, values: np.ndarray, counts: np.ndarray,
+                        percentiles: Sequence[float]) -> np.ndarray:
+    """Percentiles (interpolación lineal) de `values` por grupo: (grupos, percentiles)"""
+    ordered = values[np.lexsort((values, group))]
+    starts = np.cumsum(counts) - counts
+    result = np.empty((len(counts), len(percentiles)))
+    for j, q in enumerate(percentiles):
+        position = starts + (counts - 1) * (q / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts + counts - 1)
+        weight = position - low
+        result[:, j] = ordered[low] * (1 - weight) + ordered[high] * weight
+    return result
+
+
+def summarize(table: LapTable, by: Sequence[str],
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> List[dict]:
+    """Agregaciones del consumo por grupo"""
+    if len(table) == 0:
+        return []
+    columns = table.columns
+    keys, group = np.unique(np.stack([columns[field] for field in by], axis=1),
+                            axis=0, return_inverse=True)
+    group = group.ravel()
+    groups = len(keys)
+    consumption = columns["consumption"]
+    lap_time = columns["lap_time"]
+
+    counts = np.bincount(group, minlength=groups)
+    total = np.bincount(group, consumption, groups)
+    mean = total / counts
+    squares = np.bincount(group, (consumption - mean[group]) ** 2, groups)
+    std = np.sqrt(squares / np.maximum(counts - 1, 1))
+    quantiles = grouped_percentiles(group, consumption, counts, percentiles)
+
+    # Deriva: regresión del consumo sobre la vuelta, centrada en cada stint
+    _, stint = np.unique(np.stack([columns["session"], columns["stint"]], axis=1),
+                         axis=0, return_inverse=True)
+    stint = stint.ravel()
+    stint_counts = np.bincount(stint)
+    lap = columns["lap"].astype(np.float64)
+    x = lap - (np.bincount(stint, lap) / stint_counts)[stint]
+    y = consumption - (np.bincount(stint, consumption) / stint_counts)[stint]
+    sxy = np.bincount(group, x * y, groups)
+    sxx = np.bincount(group, x * x, groups)
+    drift = np.divide(sxy, sxx, out=np.full(groups, np.nan), where=sxx > 0)
+
+    # Ahorro: cuartil de menor consumo frente al resto (solo vueltas con tiempo)
+    threshold = grouped_percentiles(group, consumption, counts, (SAVE_QUANTILE,))[:, 0]
+    timed = lap_time > 0
+    save = timed & (consumption <= threshold[group])
+    rest = timed & ~save
+    save_n = np.bincount(group, save, groups)
+    rest_n = np.bincount(group, rest, groups)
+    both = (save_n > 0) & (rest_n > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        saved = (np.bincount(group, consumption * rest, groups) / rest_n
+                 - np.bincount(group, consumption * save, groups) / save_n)
+        lost = (np.bincount(group, lap_time * save, groups) / save_n
+                - np.bincount(group, lap_time * rest, groups) / rest_n)
+    saved[~both] = np.nan
+    lost[~both] = np.nan
+
+    rows = []
+    for g in range(groups):
+        row = {}
+        for field, code in zip(by, keys[g]):
+            labels = table.labels(field)
+            row[field] = labels[code] if labels is not None else int(code)
+        row.update({
+            "laps": int(counts[g]),
+            "mean": float(mean[g]),
+            "std": float(std[g]),
+            "percentiles": {f"p{q:g}": float(v) for q, v in zip(percentiles, quantiles[g])},
+            "drift_per_lap": float(drift[g]),
+            "save_liters_per_lap": float(saved[g]),
+            "save_seconds_per_lap": float(lost[g]),
+        })
+        rows.append(row)
+    return rows
+
+
+def verify(path: str, refuel_threshold: Optional[float] = None) -> dict:
+    """
+    Compara las vueltas offline de una grabación con FuelCalculator
+
+    Cuenta las vueltas limpias y compara la mediana de las últimas
+    LAPS_FOR_AVERAGE (el consumo de referencia del monitor) al terminar.
+    """
+    calculator = FuelCalculator()
+    if refuel_threshold is not None:
+        calculator.advanced.REFUEL_THRESHOLD = refuel_threshold
+    with SessionReader(path) as reader:
+        for _, telemetry in reader.frames():
+            if telemetry.lap > 0:
+                calculator.update(telemetry.fuel, telemetry.max_fuel, telemetry.lap,
+                                  telemetry.total_laps, telemetry.last_lap_time)
+        columns = load_columns(reader, ("lap", "fuel", "last_lap_time"))
+    laps = session_laps(columns["lap"], columns["fuel"], columns["last_lap_time"],
+                        calculator.advanced.REFUEL_THRESHOLD)
+    advanced = calculator.advanced
+    window = advanced.LAPS_FOR_AVERAGE
+    clean = clean_laps(laps["line_lap_time"], window, advanced.LAP_TIME_MIN_REFERENCE,
+                       advanced.LAP_TIME_OUTLIER)
+    offline = laps["consumption"][clean]
+    live_laps = calculator.clean_stats.count
+    live_median = calculator.consumption_median.median
+    offline_median = float(np.median(offline[-window:])) if len(offline) else 0.0
+    return {
+        "session": os.path.basename(path),
+        "live_laps": live_laps,
+        "offline_laps": len(offline),
+        "live_median": live_median,
+        "offline_median": offline_median,
+        "match": live_laps == len(offline) and abs(live_median - offline_median) < 1e-9,
+    }
+
+
+def format_rows(rows: List[dict], by: Sequence[str]) -> str:
+    """Tabla de texto con el resumen por grupo"""
+    if not rows:
+        return "Sin vueltas válidas"
+    names = list(rows[0]["percentiles"])
+    header = [*by, "vueltas", "media", "desv", *names, "deriva/v", "ahorro L/v", "pierde s/v"]
+    lines = []
+    for row in rows:
+        values = [str(row[field]) for field in by]
+        values += [str(row["laps"]), f"{row['mean']:.3f}", f"{row['std']:.3f}"]
+        values += [f"{row['percentiles'][name]:.3f}" for name in names]
+        values += [f"{row[key]:+.4f}" if row[key] == row[key] else "-"
+                   for key in ("drift_per_lap", "save_liters_per_lap", "save_seconds_per_lap")]
+        lines.append(values)
+    widths = [max(len(header[i]), *(len(line[i]) for line in lines)) for i in range(len(header))]
+    out = ["  ".join(h.ljust(w) for h, w in zip(header, widths))]
+    out += ["  ".join(v.ljust(w) for v, w in zip(line, widths)) for line in lines]
+    return "\n".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis offline de sesiones grabadas")
+    parser.add_argument("paths", nargs="+", help="Ficheros .lmurec, directorios o patrones")
+    parser.add_argument("--by", default="track,vehicle",
+                        help=f"Campos de agrupación separados por comas ({', '.join(GROUP_FIELDS)})")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=list(DEFAULT_PERCENTILES))
+    parser.add_argument("--refuel-threshold", type=float, default=AdvancedConfig.REFUEL_THRESHOLD)
+    parser.add_argument("--json", help="Guardar el resumen en un fichero JSON")
+    parser.add_argument("--verify", action="store_true",
+                        help="Comparar cada grabación con FuelCalculator (lento)")
+    args = parser.parse_args()
+
+    by = [field.strip() for field in args.by.split(",") if field.strip()]
+    unknown = [field for field in by if field not in GROUP_FIELDS]
+    if unknown:
+        parser.error(f"Campos de agrupación desconocidos: {', '.join(unknown)}")
+
+    if args.verify:
+        for path in expand_paths(args.paths):
+            result = verify(path, args.refuel_threshold)
+            status = "OK" if result["match"] else "DIFERENTE"
+            print(f"{status:9s} {result['session']}: vivo {result['live_laps']} vueltas "
+                  f"limpias (mediana {result['live_median']:.4f}L), offline "
+                  f"{result['offline_laps']} (mediana {result['offline_median']:.4f}L)")
+        return
+
+    table = load_archive(args.paths, args.refuel_threshold)
+    print(f"{len(table.sessions)} sesiones, {table.frames} frames, {len(table)} vueltas válidas\n")
+    rows = summarize(table, by, args.percentiles)
+    print(format_rows(rows, by))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
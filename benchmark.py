@@ -0,0 +1,463 @@
+"""
+Benchmarks de rendimiento del monitor de combustible
+
+Mide sin el juego dónde se va el tiempo de cada tick: decodificación de la
+memoria compartida, FuelCalculator.update/get_analysis y render del display,
+además de la reproducción completa de sesiones grabadas. Los resultados se
+guardan en JSON para comparar entre commits.
+
+Uso:
+    python benchmark.py --output bench.json
+    python benchmark.py --session sessions/session_X.lmurec --output bench.json
+    python benchmark.py --compare bench_anterior.json
+    python benchmark.py --check-allocations
+"""
+
+import argparse
+import ctypes
+import gc
+import io
+import json
+import mmap
+import os
+import platform
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional
+from calculator import FuelAnalysis, FuelCalculator
+from display import AnsiDisplay, Display, NullDisplay
+from emulator import RF2Emulator
+from fuel_monitor import FuelMonitor, LeMansUltimateConnector
+from layouts import LAYOUT_PROFILES
+from liftcoast import LiftCoastSampler
+from rf2_connector import RF2DirectConnector
+from strategy import get_table, plan_stops
+from telemetry import TelemetryData
+
+# Diferencia relativa a partir de la cual --compare marca una regresión
+REGRESSION_THRESHOLD = 0.10
+
+# Sufijos de las métricas de tiempo que compara --compare
+TIME_METRICS = ("_us", "us_per_op", "us_per_frame")
+
+
+def _sample_frames(count: int):
+    """Genera frames sintéticos con el combustible bajando poco a poco"""
+    frames = []
+    for i in range(count):
+        telemetry = TelemetryData(
+            fuel=80.0 - i * 0.002,
+            max_fuel=100.0,
+            lap=1 + i // 900,
+            total_laps=30,
+            session_time=i * 0.1,
+            last_lap_time=90.0,
+        )
+        analysis = FuelAnalysis(
+            avg_consumption=3.1,
+            fuel_needed=70.0,
+            fuel_balance=telemetry.fuel - 70.0,
+            laps_remaining=30 - telemetry.lap,
+            laps_possible=telemetry.fuel / 3.1,
+            status="OK",
+            message=f"OK: Sobran {telemetry.fuel - 70.0:.2f}L",
+        )
+        frames.append((telemetry, analysis))
+    return frames
+
+
+def _measure(func: Callable[[], None], number: int, repeat: int = 5) -> dict:
+    """Mejor tiempo por operación de `repeat` tandas de `number` llamadas"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return {"us_per_op": best * 1e6, "ops_per_s": 1.0 / best if best > 0 else 0.0}
+
+
+def _time_per_frame(func, frames) -> float:
+    """Microsegundos por frame de func(telemetry, analysis)"""
+    start = time.perf_counter()
+    for telemetry, analysis in frames:
+        func(telemetry, analysis)
+    return (time.perf_counter() - start) / len(frames) * 1e6
+
+
+# ============================================================
+# LECTURA DE MEMORIA COMPARTIDA
+# ============================================================
+
+def bench_read_offsets(number: int = 20000) -> dict:
+    """Decodificación por offsets con un struct precompilado"""
+    connector = LeMansUltimateConnector()
+    connector.shared_mem = mmap.mmap(-1, connector.config.SHARED_MEMORY_SIZE)
+    connector.layout = LAYOUT_PROFILES["v1"]
+    struct.pack_into("=ff", connector.shared_mem, 100, 55.0, 100.0)
+    struct.pack_into("=ii", connector.shared_mem, 200, 5, 30)
+    struct.pack_into("=d", connector.shared_mem, 300, 420.0)
+    struct.pack_into("=f", connector.shared_mem, 400, 91.5)
+    result = _measure(connector.read_telemetry, number)
+    connector.disconnect()
+    return result
+
+
+def bench_read_ctypes(number: int = 20000) -> dict:
+    """Lectura ctypes sin copias sobre buffers del emulador"""
+    with tempfile.TemporaryDirectory() as directory:
+        emulator = RF2Emulator(directory, vehicles=20, seed=1)
+        emulator.open()
+        for _ in range(100):
+            emulator.step(0.01)
+            emulator.publish_telemetry(0.01)
+        emulator._publish_scoring()
+
+        connector = RF2DirectConnector()
+        connector.config.SHARED_MEMORY_DIR = directory
+        connector.connect()
+        result = _measure(connector.read_telemetry, number)
+        result["update_counter"] = _measure(connector.read_update_counter, number)["us_per_op"]
+        connector.disconnect()
+        emulator.close()
+    return result
+
+
+# ============================================================
+# CÁLCULO
+# ============================================================
+
+def bench_calculator_update(number: int = 50000) -> dict:
+    """FuelCalculator.update con un frame por tick (10 Hz, vuelta de 90 s)"""
+    calculator = FuelCalculator()
+    state = {"tick": 0}
+
+    def tick():
+        i = state["tick"]
+        state["tick"] = i + 1
+        calculator.update(80.0 - i * 0.0035, 100.0, 1 + i // 900, 30, 90.0)
+
+    return _measure(tick, number, repeat=1)
+
+
+def bench_get_analysis(number: int = 50000) -> dict:
+    """FuelCalculator.get_analysis con historial completo: recalculado y en caché"""
+    calculator = FuelCalculator()
+    for lap in range(1, 13):
+        calculator.update(80.0 - lap * 3.2, 100.0, lap, 30, 90.0)
+
+    def recompute():
+        calculator.dirty = True
+        calculator.get_analysis()
+
+    result = _measure(recompute, number)
+    result["cached_us_per_op"] = _measure(calculator.get_analysis, number)["us_per_op"]
+    return result
+
+
+def bench_pit_strategy(laps: int = 400, number: int = 2000) -> dict:
+    """Plan de paradas: resolución en frío frente a replanificación por vuelta"""
+    def solve(lap):
+        return plan_stops(90.0, 100.0, 3.5, laps - lap, lap, 2.5, 25.0, 0.03, 0.5)
+
+    get_table.cache_clear()
+    start = time.perf_counter()
+    solve(0)
+    cold = (time.perf_counter() - start) * 1e6
+    state = {"lap": 0}
+
+    def replan():
+        state["lap"] = (state["lap"] + 1) % laps
+        solve(state["lap"])
+
+    result = _measure(replan, number)
+    result["cold_solve_us"] = cold
+    return result
+
+
+# ============================================================
+# RENDER
+# ============================================================
+
+def bench_render(count: int = 5000) -> dict:
+    """Coste de render por frame: display completo frente a incremental ANSI"""
+    frames = _sample_frames(count)
+
+    display = Display()
+    full_text = _time_per_frame(display._create_display, frames)
+
+    stream = io.StringIO()
+    ansi = AnsiDisplay(stream=stream)
+    ansi.min_frame_interval = 0.0  # Sin límite de FPS para medir el render puro
+    incremental = _time_per_frame(ansi.update, frames)
+
+    return {
+        "full_create_display_us": full_text,
+        "ansi_incremental_us": incremental,
+        "ansi_bytes_per_frame": len(stream.getvalue()) / count,
+    }
+
+
+# ============================================================
+# TICK COMPLETO Y SESIONES GRABADAS
+# ============================================================
+
+def bench_tick(number: int = 20000) -> dict:
+    """Tick completo: lectura por offsets + update + get_analysis + display nulo"""
+    connector = LeMansUltimateConnector()
+    connector.shared_mem = mmap.mmap(-1, connector.config.SHARED_MEMORY_SIZE)
+    connector.layout = LAYOUT_PROFILES["v1"]
+    struct.pack_into("=ff", connector.shared_mem, 100, 55.0, 100.0)
+    struct.pack_into("=ii", connector.shared_mem, 200, 5, 30)
+    calculator = FuelCalculator()
+    display = NullDisplay()
+
+    def tick():
+        telemetry = connector.read_telemetry()
+        calculator.update(telemetry.fuel, telemetry.max_fuel, telemetry.lap,
+                          telemetry.total_laps, telemetry.last_lap_time)
+        display.update(telemetry, calculator.get_analysis())
+
+    result = _measure(tick, number)
+    connector.disconnect()
+    return result
+
+
+def bench_liftcoast(number: int = 20000) -> dict:
+    """Muestreo lift & coast por frame de físicas (Scoring a 5 Hz) y ranking por vuelta"""
+    with tempfile.TemporaryDirectory() as directory:
+        emulator = RF2Emulator(directory, seed=1)
+        emulator.open()
+        connector = RF2DirectConnector()
+        connector.config.SHARED_MEMORY_DIR = directory
+        connector.connect()
+        sampler = LiftCoastSampler(connector)
+        sampler.clock = lambda: emulator.elapsed
+        state = {"frame": 0}
+
+        def frame():
+            i = state["frame"]
+            state["frame"] = i + 1
+            emulator.step(0.01)
+            emulator.publish_telemetry(0.01)
+            if i % 20 == 0:
+                emulator._publish_scoring()
+            sampler.poll()
+
+        def publish():
+            emulator.step(0.01)
+            emulator.publish_telemetry(0.01)
+
+        # Varias vueltas para tener perfil y frenadas que ordenar
+        for _ in range(3 * 9000):
+            frame()
+        result = _measure(frame, number)
+        result["us_per_op"] -= _measure(publish, number)["us_per_op"]
+        result["max_rate_hz"] = 1e6 / result["us_per_op"]
+        analyzer = sampler.analyzer
+        result["rank_us"] = _measure(analyzer.rank, 200)["us_per_op"]
+        result["zones"] = len(analyzer.zones)
+        del result["ops_per_s"]
+
+        sampler.detach()
+        connector.disconnect()
+        emulator.close()
+    return result
+
+
+def bench_allocations(laps: int = 4, ticks_per_lap: int = 900, warmup_laps: int = 12) -> dict:
+    """
+    Memoria neta que asigna el tick en régimen estable (LOW_ALLOCATION_MODE)
+
+    Tick completo (FuelMonitor.tick) sobre la memoria compartida, con el
+    combustible bajando a lo largo de la vuelta y cruzando la meta en cada
+    vuelta (ventanas de consumo, análisis, plan de paradas). Tras llenar las
+    ventanas, tracemalloc compara lo asignado al final de dos tandas de
+    vueltas (mismo punto de la vuelta): la diferencia debe ser cero. gc cuenta
+    las pasadas del recolector durante las tandas.
+    """
+    connector = LeMansUltimateConnector()
+    connector.shared_mem = memory = mmap.mmap(-1, connector.config.SHARED_MEMORY_SIZE)
+    connector.layout = layout = LAYOUT_PROFILES["v1"]
+    offsets = layout.offsets
+    # Sin repostajes en la medida: depósito lleno y consumo de 3 L por vuelta
+    fuel_per_lap = 3.0
+    struct.pack_into("=f", memory, offsets["max_fuel"], 100.0)
+    struct.pack_into("=i", memory, offsets["total_laps"], 200)
+    monitor = FuelMonitor(connector=connector, display=NullDisplay())
+    monitor.enable_low_allocation()
+    calculator = monitor.calculator
+    fuel = [99.0]
+
+    def run(first_lap: int, count: int):
+        for lap in range(first_lap, first_lap + count):
+            struct.pack_into("=i", memory, offsets["lap"], lap)
+            struct.pack_into("=f", memory, offsets["last_lap_time"], 90.0 + (lap % 3) * 0.1)
+            # Variación pequeña: el consumo no cambia de escalón en la estrategia
+            burn = fuel_per_lap * (1.0 + 0.001 * (lap % 4)) / ticks_per_lap
+            for i in range(ticks_per_lap):
+                fuel[0] -= burn
+                struct.pack_into("=f", memory, offsets["fuel"], fuel[0])
+                struct.pack_into("=d", memory, offsets["session_time"],
+                                 (lap * ticks_per_lap + i) * 0.1)
+                monitor.tick()
+
+    run(1, warmup_laps)
+    laps_before = calculator.laps_recorded
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    tracemalloc.start()
+    try:
+        run(1 + warmup_laps, laps)
+        # Lo que cuesta la propia medida (el entero que guarda la primera lectura)
+        base = tracemalloc.get_traced_memory()[0]
+        overhead = tracemalloc.get_traced_memory()[0] - base
+        first = tracemalloc.get_traced_memory()[0]
+        run(1 + warmup_laps + laps, laps)
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    connector.disconnect()
+    return {
+        "ticks": 2 * laps * ticks_per_lap,
+        "laps_crossed": calculator.laps_recorded - laps_before,
+        "net_bytes": current - first - overhead,
+        "gc_collections": sum(stats["collections"] for stats in gc.get_stats()) - collections,
+    }
+
+
+def check_allocations(result: dict) -> bool:
+    """Vueltas completas sin asignaciones netas ni pasadas del recolector"""
+    return (result["laps_crossed"] > 0 and result["net_bytes"] <= 0
+            and result["gc_collections"] == 0)
+
+
+def bench_replay(path: str) -> dict:
+    """Reproducción completa de una sesión grabada, sin esperas ni display"""
+    from replay import replay_session
+
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()  # Silencia los mensajes del monitor
+    try:
+        start = time.perf_counter()
+        monitor = replay_session(path, speed=0.0)
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+    frames = monitor.connector.frames_read
+    return {
+        "frames": frames,
+        "seconds": elapsed,
+        "us_per_frame": elapsed / frames * 1e6 if frames else 0.0,
+        "frames_per_s": frames / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# ============================================================
+# EJECUCIÓN Y COMPARACIÓN
+# ============================================================
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(session: Optional[str] = None) -> dict:
+    """Ejecuta todos los benchmarks y devuelve el informe"""
+    results: Dict[str, dict] = {
+        "read_offsets": bench_read_offsets(),
+        "read_ctypes": bench_read_ctypes(),
+        "calculator_update": bench_calculator_update(),
+        "get_analysis": bench_get_analysis(),
+        "pit_strategy": bench_pit_strategy(),
+        "render": bench_render(),
+        "tick": bench_tick(),
+        "liftcoast": bench_liftcoast(),
+        "allocations": bench_allocations(),
+    }
+    if session:
+        results["replay"] = bench_replay(session)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ctypes_pointer_size": ctypes.sizeof(ctypes.c_void_p),
+        },
+        "results": results,
+    }
+
+
+def _flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    """Convierte el informe anidado en {"bench.métrica": valor}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(current: dict, baseline: dict) -> int:
+    """Imprime la comparación de tiempos y devuelve el nº de regresiones"""
+    now = _flatten(current["results"])
+    before = _flatten(baseline["results"])
+    regressions = 0
+    print(f"Comparando con {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for name in sorted(now):
+        # Solo se comparan tiempos (en µs): más alto es peor
+        if not name.endswith(TIME_METRICS) or before.get(name, 0.0) <= 0:
+            continue
+        change = now[name] / before[name] - 1.0
+        mark = ""
+        if change > REGRESSION_THRESHOLD:
+            mark = "  <-- REGRESIÓN"
+            regressions += 1
+        print(f"  {name:45s} {before[name]:10.2f} -> {now[name]:10.2f}  ({change * 100:+.1f}%){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del monitor de combustible")
+    parser.add_argument("--output", help="Guarda los resultados en este fichero JSON")
+    parser.add_argument("--session", help="Sesión .lmurec para medir la reproducción completa")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--check-allocations", action="store_true",
+                        help="Solo comprueba que el tick, cruzando vueltas, no deja asignaciones netas (código 1 si falla)")
+    args = parser.parse_args()
+
+    if args.check_allocations:
+        result = bench_allocations()
+        print(json.dumps(result, indent=2))
+        ok = check_allocations(result)
+        print("OK: sin asignaciones netas ni pasadas del recolector en vueltas completas" if ok else
+              "FALLO: el tick deja asignaciones netas o despierta al recolector")
+        sys.exit(0 if ok else 1)
+
+    report = run_all(args.session)
+    print(json.dumps(report["results"], indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
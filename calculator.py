@@ -2,9 +2,44 @@
 Módulo de cálculo para análisis de combustible
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import List, Optional
 from config import Config
+from advanced_config import AdvancedConfig
+from stats import RingBuffer, RunningStats, WindowedMedian
+from strategy import PitPlan, plan_stops
+from lapdist_model import LapDistanceFuelModel
+
+
+# Definiciones de consumo compartidas con el análisis offline (analytics.py).
+# Funcionan igual con números que con arrays de NumPy.
+
+def is_refuel(previous_fuel, fuel, threshold):
+    """Subida de combustible entre dos lecturas que cuenta como repostaje"""
+    return fuel > previous_fuel + threshold
+
+
+def lap_consumption(start_fuel, end_fuel):
+    """Combustible gastado entre dos cruces de meta consecutivos"""
+    return start_fuel - end_fuel
+
+
+def is_valid_consumption(consumption):
+    """Solo cuentan vueltas con consumo positivo"""
+    return consumption > 0
+
+
+def is_slow_lap(lap_time, reference, tolerance):
+    """Vuelta más lenta que la referencia en más de `tolerance` (fracción)"""
+    return lap_time > reference * (1.0 + tolerance)
+
+
+# Clasificación de las vueltas completadas (FuelCalculator.last_lap_class)
+LAP_CLEAN = "clean"  # Cuenta para el consumo
+LAP_PARTIAL = "partial"  # No se vio de línea a línea (inicio, saltos de vuelta)
+LAP_REFUEL = "refuel"  # Hubo repostaje durante la vuelta (sin dato de boxes)
+LAP_PIT = "pit"  # Pasó por boxes (entrada o salida, con o sin repostaje)
+LAP_SLOW = "slow"  # Tiempo atípico: amarilla, safety car, trompo...
 
 
 @dataclass
@@ -18,18 +53,78 @@ class FuelAnalysis:
     fuel_to_save_per_lap: float = 0.0  # Combustible a ahorrar por vuelta
     status: str = "OK"  # Estado: OK, WARNING, CRITICAL
     message: str = ""  # Mensaje descriptivo
+    pit_stops: int = 0  # Paradas del plan más rápido
+    next_pit_lap: int = 0  # Vuelta al final de la cual parar (0 = sin parada)
+    next_pit_fuel: float = 0.0  # Litros a repostar en la próxima parada
+    projected_consumption: float = 0.0  # Proyección de la vuelta en curso (0 = sin datos)
+    
+    def reset(self):
+        """Vuelve a los valores por defecto (para reutilizar el objeto)"""
+        for name, default in _ANALYSIS_DEFAULTS:
+            setattr(self, name, default)
+
+
+_ANALYSIS_DEFAULTS = tuple((f.name, f.default) for f in fields(FuelAnalysis))
 
 
 class FuelCalculator:
     """Calculadora de consumo de combustible"""
     
-    def __init__(self):
+    def __init__(self, window: Optional[int] = None):
         self.config = Config()
-        self.consumption_history: List[float] = []
-        self.fuel_history: List[float] = []
+        self.advanced = AdvancedConfig()
+        
+        # Ventana de vueltas para el promedio (LAPS_FOR_AVERAGE por defecto)
+        if window is None:
+            window = self.advanced.LAPS_FOR_AVERAGE
+        # Solo vueltas limpias; la mediana es la cifra que usa el análisis
+        self.consumption_history = RingBuffer(window, self.advanced.EWMA_ALPHA)
+        self.consumption_median = WindowedMedian(window)
+        # Referencia de ritmo para descartar vueltas lentas
+        self.lap_time_median = WindowedMedian(window)
+        self.fuel_history = RingBuffer(100)
         self.last_fuel: Optional[float] = None
         self.last_lap: int = 0
         
+        # Combustible al cruzar la línea al inicio de la vuelta actual
+        self.lap_start_fuel: Optional[float] = None
+        # Consumo de la última vuelta completada (None si no fue válida)
+        self.last_lap_consumption: Optional[float] = None
+        self.last_lap_class = LAP_PARTIAL
+        # Lo que ha pasado en la vuelta en curso
+        self.lap_refueled = False
+        self.lap_in_pits = False
+        
+        # Estadísticas por stint (se abre uno nuevo en cada repostaje); cuentan
+        # todas las vueltas válidas, como analytics.py
+        self.stint_stats = RunningStats()
+        self.stints: List[RunningStats] = [self.stint_stats]
+        # Solo vueltas limpias (lo que se guarda en consumption_cache)
+        self.clean_stats = RunningStats()
+        
+        # Consumo por distancia en la vuelta: estimación antes de completar vueltas
+        self.lapdist_model = LapDistanceFuelModel(
+            bins=self.advanced.LAPDIST_BINS,
+            alpha=self.advanced.EWMA_ALPHA,
+            min_coverage=self.advanced.LAPDIST_MIN_COVERAGE,
+            refuel_threshold=self.advanced.REFUEL_THRESHOLD,
+        )
+        
+        # Consumo de sesiones anteriores (consumption_cache.py)
+        self.prior_consumption = 0.0
+        self.prior_weight = 0
+        self.laps_recorded = 0  # Vueltas limpias registradas en la sesión
+        
+        # Último plan de paradas calculado
+        self.pit_plan: Optional[PitPlan] = None
+        
+        # Último análisis: solo se recalcula si algo cambió (dirty) y, con
+        # reuse_analysis, se rellena el mismo objeto en lugar de crear otro
+        self.analysis: Optional[FuelAnalysis] = None
+        self.dirty = True
+        self.analyzed_fuel = 0.0
+        self.reuse_analysis = False
+        
         # Datos actuales
         self.current_fuel = 0.0
         self.max_fuel = 0.0
@@ -37,17 +132,56 @@ class FuelCalculator:
         self.total_laps = 0
         
     def update(self, current_fuel: float, max_fuel: float, 
-               current_lap: int, total_laps: int, last_lap_time: float):
+               current_lap: int, total_laps: int, last_lap_time: float,
+               lap_dist: float = 0.0, track_length: float = 0.0, in_pits: bool = False):
         """Actualiza los datos y calcula consumo"""
         
+        # Modelo por distancia (solo si el conector da la posición en la vuelta)
+        if track_length > 0:
+            self.lapdist_model.update(current_lap, lap_dist / track_length, current_fuel)
+        
+        # Detectar repostaje: empieza un stint nuevo y la vuelta en curso no es válida
+        if self.last_fuel is not None and \
+                is_refuel(self.last_fuel, current_fuel, self.advanced.REFUEL_THRESHOLD):
+            self.stint_stats = RunningStats()
+            self.stints.append(self.stint_stats)
+            self.lap_start_fuel = None
+            self.lap_refueled = True
+        
         # Detectar nueva vuelta
-        if current_lap > self.last_lap and self.last_fuel is not None:
-            consumption = self.last_fuel - current_fuel
-            if consumption > 0:  # Solo registrar consumos válidos
-                self.consumption_history.append(consumption)
-                # Mantener solo últimas 10 vueltas para promedio
-                if len(self.consumption_history) > 10:
-                    self.consumption_history.pop(0)
+        if current_lap > self.last_lap:
+            self.last_lap_consumption = None
+            # El repostaje ocurre en boxes: con el dato de boxes la vuelta es "pit"
+            if self.lap_in_pits:
+                self.last_lap_class = LAP_PIT
+            else:
+                self.last_lap_class = LAP_REFUEL if self.lap_refueled else LAP_PARTIAL
+            # Solo se registran vueltas completas observadas de línea a línea
+            if self.lap_start_fuel is not None and current_lap == self.last_lap + 1:
+                consumption = lap_consumption(self.lap_start_fuel, current_fuel)
+                if is_valid_consumption(consumption):
+                    self.stint_stats.add(consumption)
+                    self.last_lap_consumption = consumption
+                    self.last_lap_class = self.classify_lap(last_lap_time)
+                    if self.last_lap_class == LAP_CLEAN:
+                        self.consumption_history.append(consumption)
+                        self.consumption_median.append(consumption)
+                        self.clean_stats.add(consumption)
+                        self.laps_recorded += 1
+            
+            # En la primera lectura no sabemos si estamos en la línea
+            self.lap_start_fuel = current_fuel if self.last_fuel is not None else None
+            self.lap_refueled = False
+            self.lap_in_pits = False
+        
+        if in_pits:
+            self.lap_in_pits = True
+        
+        # El análisis queda obsoleto si algo cambió más que la tolerancia
+        if current_lap != self.current_lap or total_laps != self.total_laps \
+                or max_fuel != self.max_fuel \
+                or abs(current_fuel - self.analyzed_fuel) > self.advanced.ANALYSIS_FUEL_TOLERANCE:
+            self.dirty = True
         
         # Actualizar datos
         self.current_fuel = current_fuel
@@ -59,22 +193,87 @@ class FuelCalculator:
         
         # Guardar histórico de combustible
         self.fuel_history.append(current_fuel)
-        if len(self.fuel_history) > 100:
-            self.fuel_history.pop(0)
+    
+    def classify_lap(self, lap_time: float) -> str:
+        """
+        Clasifica una vuelta completa con consumo válido
+        
+        En boxes en algún momento -> LAP_PIT. Si no, el tiempo se compara con
+        la mediana de las últimas vueltas (fuera de boxes, también las lentas:
+        si el ritmo cambia de verdad, la referencia lo sigue en media ventana).
+        """
+        if self.lap_in_pits:
+            return LAP_PIT
+        if lap_time <= 0:  # El conector no da el tiempo de vuelta
+            return LAP_CLEAN
+        
+        reference = self.lap_time_median.median \
+            if len(self.lap_time_median) >= self.advanced.LAP_TIME_MIN_REFERENCE else 0.0
+        self.lap_time_median.append(lap_time)
+        if reference and is_slow_lap(lap_time, reference, self.advanced.LAP_TIME_OUTLIER):
+            return LAP_SLOW
+        return LAP_CLEAN
+    
+    def set_prior(self, consumption: float, weight: int):
+        """
+        Consumo de referencia de sesiones anteriores
+        
+        Cuenta como `weight` vueltas en el promedio y pierde una por cada
+        vuelta real registrada.
+        """
+        self.prior_consumption = consumption
+        self.prior_weight = weight
+        self.dirty = True
     
     def get_average_consumption(self) -> float:
-        """Calcula el consumo promedio por vuelta"""
-        if not self.consumption_history:
-            return 0.0
-        return sum(self.consumption_history) / len(self.consumption_history)
+        """
+        Consumo de referencia por vuelta
+        
+        Mediana de las últimas vueltas limpias: una vuelta atípica que se cuele
+        no mueve el objetivo de ahorro de las siguientes.
+        """
+        median = self.consumption_median.median
+        weight = self.prior_weight - self.laps_recorded
+        if weight <= 0:
+            return median
+        laps = len(self.consumption_median)
+        return (self.prior_consumption * weight + median * laps) / (weight + laps)
+    
+    def session_stats(self) -> RunningStats:
+        """Estadísticas de todas las vueltas válidas de la sesión (todos los stints)"""
+        total = RunningStats()
+        for stint in self.stints:
+            total.merge(stint)
+        return total
+    
+    def get_ewma_consumption(self) -> float:
+        """Consumo por vuelta suavizado exponencialmente (más reactivo)"""
+        return self.consumption_history.ewma
     
     def get_analysis(self) -> FuelAnalysis:
-        """Realiza el análisis completo de combustible"""
-        analysis = FuelAnalysis()
+        """Realiza el análisis completo de combustible (el último, si nada ha cambiado)"""
+        if not self.dirty and self.analysis is not None:
+            return self.analysis
+        self.dirty = False
+        self.analyzed_fuel = self.current_fuel
+        
+        if self.reuse_analysis and self.analysis is not None:
+            analysis = self.analysis
+            analysis.reset()
+        else:
+            analysis = FuelAnalysis()
+        self.analysis = analysis
         
         # Calcular consumo promedio
         analysis.avg_consumption = self.get_average_consumption()
         
+        # Proyección de la vuelta en curso; sin vueltas completas hace de promedio
+        projected = self.lapdist_model.projected_consumption()
+        if projected is not None:
+            analysis.projected_consumption = projected
+            if analysis.avg_consumption == 0:
+                analysis.avg_consumption = projected
+        
         if analysis.avg_consumption == 0 or self.total_laps == 0:
             analysis.message = "Esperando datos de consumo..."
             return analysis
@@ -97,6 +296,15 @@ class FuelCalculator:
         if analysis.avg_consumption > 0:
             analysis.laps_possible = self.current_fuel / analysis.avg_consumption
         
+        # Plan de paradas (tabla memorizada: replanificar cada vuelta es barato)
+        if self.max_fuel > 0:
+            self.pit_plan = self.get_pit_plan(analysis.avg_consumption, analysis.laps_remaining)
+            next_stop = self.pit_plan.next_stop
+            analysis.pit_stops = len(self.pit_plan.stops)
+            if next_stop is not None:
+                analysis.next_pit_lap = next_stop.lap
+                analysis.next_pit_fuel = next_stop.fuel_to_add
+        
         # Determinar estado y mensaje
         if analysis.fuel_balance < -self.config.THRESHOLD_CRITICAL:
             analysis.status = "CRITICAL"
@@ -119,15 +327,56 @@ class FuelCalculator:
             analysis.status = "OK"
             analysis.message = f"OK: Sobran {analysis.fuel_balance:.2f}L"
         
+        # Si el déficit no se puede ahorrar en pista, la respuesta es parar
+        if analysis.pit_stops > 0 and analysis.fuel_to_save_per_lap > \
+                analysis.avg_consumption * self.advanced.MAX_FUEL_SAVE_FRACTION:
+            analysis.fuel_to_save_per_lap = 0.0
+            analysis.status = "WARNING"
+            analysis.message = (f"BOXES: Parar al final de la vuelta {analysis.next_pit_lap} "
+                                f"(+{analysis.next_pit_fuel:.1f}L)")
+        
         return analysis
     
+    def remaining_lap_burn(self, consumption: float) -> float:
+        """
+        Litros que faltan por gastar hasta la próxima línea de meta
+
+        Con la posición en la vuelta (lapdist_model) se usa la proyección de la
+        vuelta en curso repartida según el perfil por tramos; sin ella, una
+        vuelta de `consumption` menos lo gastado desde la última línea.
+        """
+        model = self.lapdist_model
+        if model.last_lap == self.current_lap:
+            projected = model.projected_consumption()
+            return model.remaining_consumption(projected if projected is not None else consumption)
+        if self.lap_start_fuel is not None:
+            return max(consumption - (self.lap_start_fuel - self.current_fuel), 0.0)
+        return consumption
+    
+    def get_pit_plan(self, consumption: float, laps_remaining: int) -> PitPlan:
+        """Plan de paradas más rápido desde el estado actual (a mitad de vuelta)"""
+        return plan_stops(
+            fuel=self.current_fuel,
+            capacity=self.max_fuel,
+            consumption=consumption,
+            laps_remaining=laps_remaining,
+            current_lap=self.current_lap,
+            refuel_rate=self.advanced.REFUEL_RATE,
+            pit_loss=self.advanced.PIT_LANE_TIME_LOSS,
+            weight_penalty=self.advanced.FUEL_WEIGHT_PENALTY,
+            safety_margin=self.config.SAFETY_MARGIN,
+            steps_per_lap=self.advanced.STRATEGY_STEPS_PER_LAP,
+            consumption_step=self.advanced.STRATEGY_CONSUMPTION_STEP,
+            remaining_burn=self.remaining_lap_burn(consumption),
+        )
+    
     def get_consumption_trend(self) -> str:
         """Analiza la tendencia del consumo"""
         if len(self.consumption_history) < 3:
             return "Insuficientes datos"
         
         # Comparar últimas 3 vueltas con promedio general
-        recent = sum(self.consumption_history[-3:]) / 3
+        recent = self.consumption_history.recent_mean(3)
         overall = self.get_average_consumption()
         
         diff = recent - overall
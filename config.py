@@ -3,12 +3,44 @@ Configuración para el monitor de combustible
 Contiene offsets de memoria compartida y constantes
 """
 
+import os
+
 
 class Config:
     """Configuración del sistema"""
     
     # Nombre de la memoria compartida (rFactor 2 / Le Mans Ultimate)
     SHARED_MEMORY_NAME = "$rFactor2SMMP_Telemetry$"
+    SCORING_MEMORY_NAME = "$rFactor2SMMP_Scoring$"
+    
+    # Carpeta con mapas respaldados por fichero (Linux, emulador.py)
+    # None = mapas con nombre de Windows creados por el plugin del juego
+    SHARED_MEMORY_DIR = os.environ.get("LMU_SHARED_MEMORY_DIR")
+    
+    # Modo del conector:
+    # "offsets" = lectura por offsets configurados (por defecto)
+    # "ctypes"  = vista directa de las estructuras rF2 sin copias
+    # "simhub"  = API HTTP de SimHub con conexión persistente
+    # "simhub_async" = API de SimHub sondeada con asyncio en segundo plano
+    # "hub"     = frames publicados por hub.py (sin leer el juego)
+    # La variable de entorno LMU_CONNECTOR_MODE lo sustituye (emulator.py)
+    CONNECTOR_MODE = os.environ.get("LMU_CONNECTOR_MODE", "offsets")
+    
+    # SimHub (modos "simhub" y "simhub_async", ver simhub.py)
+    SIMHUB_URL = "http://127.0.0.1:8888/api/getgamedata"
+    SIMHUB_TIMEOUT = 0.5  # Segundos de espera por respuesta
+    SIMHUB_POLL_INTERVAL = 0.02  # Segundos entre peticiones de cada conexión (async)
+    SIMHUB_MAX_IN_FLIGHT = 2  # Peticiones simultáneas como máximo (async)
+    
+    # Hub de telemetría (hub.py): un lector del juego, varios consumidores
+    HUB_MEMORY_NAME = "$LMUFuelHub$"
+    HUB_SLOTS = 256  # Frames que conserva el buffer circular
+    
+    # Reintentos cuando se detecta un frame a medio escribir (modo ctypes)
+    TORN_READ_RETRIES = 3
+    
+    # Capacidad del tanque cuando el juego no la exporta (modo ctypes)
+    DEFAULT_MAX_FUEL = 100.0
     
     # Tamaño de la memoria compartida
     SHARED_MEMORY_SIZE = 2048
@@ -22,9 +54,40 @@ class Config:
     OFFSET_SESSION_TIME = 300  # Tiempo de sesión
     OFFSET_LAST_LAP_TIME = 400  # Tiempo última vuelta
     
+    # Perfil de layout de memoria (ver layouts.py):
+    # "auto"   = detecta al conectar el perfil cuyos datos son coherentes
+    # "config" = usa siempre los OFFSET_* de arriba
+    # "v1", "v2", "v3"... = un perfil concreto del registro
+    LAYOUT_PROFILE = "auto"
+    
+    # Perfiles propios generados por sintonizador.py (se registran al conectar
+    # y se pueden elegir por nombre en LAYOUT_PROFILE)
+    CUSTOM_LAYOUTS_FILE = "layouts_custom.json"
+    
     # Configuración del display
     DISPLAY_UPDATE_RATE = 0.1  # Segundos entre actualizaciones
     
+    # Modo del display:
+    # "ansi"  = marco fijo y reescritura solo de los campos que cambian
+    # "clear" = limpia la pantalla y redibuja todo en cada cambio
+    DISPLAY_MODE = "ansi"
+    DISPLAY_MAX_FPS = 10  # Frames por segundo máximos en la consola
+    
+    # Planificador adaptativo del bucle principal (ver scheduler.py)
+    POLL_INTERVAL_FAST = 0.01  # Segundos entre lecturas cerca del cruce de meta
+    POLL_INTERVAL_IDLE_MAX = 1.0  # Intervalo máximo en pausa o en menús
+    IDLE_POLLS_BEFORE_BACKOFF = 3  # Sondeos sin datos nuevos antes de espaciar
+    LAP_CROSSING_WINDOW = 2.0  # Segundos alrededor del cruce de meta esperado
+    
+    # Lectura, cálculo y render en hilos separados (ver pipeline.py): una
+    # consola lenta no retrasa la lectura de la memoria compartida
+    THREADED_PIPELINE = True
+    
+    # Modo de baja asignación para equipos modestos: un frame de telemetría
+    # reutilizable y el análisis rellenado en sitio, sin objetos nuevos por
+    # tick (ni pausas del recolector). Usa el bucle de un solo hilo
+    LOW_ALLOCATION_MODE = False
+    
     # Margen de seguridad (litros extra para tener en cuenta)
     SAFETY_MARGIN = 0.5
     
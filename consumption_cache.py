@@ -0,0 +1,125 @@
+"""
+Caché en disco del consumo por circuito y coche
+
+Guarda las estadísticas de consumo por vuelta de sesiones anteriores con
+clave (mTrackName, mVehicleName) en un JSON pequeño. Al conectar se carga
+en milisegundos y la calculadora arranca con ese consumo como referencia
+(con un peso que se desvanece según se completan vueltas reales). Al terminar
+la sesión se fusionan los datos nuevos y se guarda en un hilo aparte con
+escritura atómica (fichero temporal + os.replace).
+
+Cuando hay más de max_entries combinaciones se descartan las usadas hace
+más tiempo; las que superan max_age_days se descartan al cargar.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from stats import RunningStats
+
+CACHE_VERSION = 1
+
+
+def cache_key(track: str, vehicle: str) -> str:
+    return f"{track.strip().lower()}|{vehicle.strip().lower()}"
+
+
+class ConsumptionCache:
+    """Estadísticas de consumo por (circuito, coche) persistidas en JSON"""
+
+    def __init__(self, path: str, max_entries: int = 200, max_age_days: float = 180.0,
+                 max_history_laps: int = 50):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400.0
+        # Peso máximo (en vueltas) de lo guardado al fusionar: prima lo reciente
+        self.max_history_laps = max_history_laps
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> "ConsumptionCache":
+        """Carga el fichero (si no existe o está corrupto se empieza vacío)"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as e:
+            print(f"Aviso: caché de consumo ilegible ({e}), se empieza vacía")
+            return self
+        if data.get("version") != CACHE_VERSION:
+            return self
+        oldest = time.time() - self.max_age
+        self.entries = {key: entry for key, entry in data.get("entries", {}).items()
+                        if entry.get("updated", 0.0) >= oldest}
+        return self
+
+    def get(self, track: str, vehicle: str) -> Optional[RunningStats]:
+        """Estadísticas guardadas para la combinación (None si no hay)"""
+        entry = self.entries.get(cache_key(track, vehicle))
+        if entry is None or entry["count"] <= 0:
+            return None
+        return RunningStats.from_summary(entry["count"], entry["mean"], entry["variance"],
+                                         entry["minimum"], entry["maximum"])
+
+    def store(self, track: str, vehicle: str, session: RunningStats):
+        """Fusiona las vueltas de esta sesión con lo guardado"""
+        if session.count == 0:
+            return
+        stats = self.get(track, vehicle)
+        if stats is None:
+            stats = RunningStats()
+        elif stats.count > self.max_history_laps:
+            # Lo antiguo pesa como mucho max_history_laps vueltas
+            stats = RunningStats.from_summary(self.max_history_laps, stats.mean, stats.variance,
+                                              stats.minimum, stats.maximum)
+        stats.merge(session)
+
+        with self._lock:
+            self.entries[cache_key(track, vehicle)] = {
+                "track": track,
+                "vehicle": vehicle,
+                "count": stats.count,
+                "mean": stats.mean,
+                "variance": stats.variance,
+                "minimum": stats.minimum,
+                "maximum": stats.maximum,
+                "updated": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        """Descarta las combinaciones usadas hace más tiempo por encima del límite"""
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0:
+            return
+        stale = sorted(self.entries, key=lambda key: self.entries[key]["updated"])[:excess]
+        for key in stale:
+            del self.entries[key]
+
+    def save(self):
+        """Escritura atómica: nunca deja un fichero a medias"""
+        with self._lock:
+            data = {"version": CACHE_VERSION, "entries": dict(self.entries)}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def save_async(self) -> threading.Thread:
+        """Guarda en un hilo aparte (no daemon: termina aunque el programa salga)"""
+        thread = threading.Thread(target=self._save_logged, name="consumption-cache")
+        thread.start()
+        return thread
+
+    def _save_logged(self):
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Aviso: no se pudo guardar la caché de consumo: {e}")
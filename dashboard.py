@@ -0,0 +1,415 @@
+"""
+Dashboard web local con envío por WebSocket
+
+Servidor asyncio (solo biblioteca estándar) que sirve una página de
+combustible para una tablet o la pantalla del muro de boxes y le envía los
+datos por WebSocket:
+
+- Solo se envían los campos de TelemetryData/FuelAnalysis que han cambiado
+  desde el último envío (redondeados, para no mandar ruido).
+- Los cambios se agrupan: como mucho DASHBOARD_PUSH_RATE envíos por segundo.
+- Cada mensaje se codifica una sola vez para todos los clientes. A un cliente
+  con más de DASHBOARD_MAX_CLIENT_BUFFER bytes pendientes (Wi-Fi lenta) se le
+  saltan envíos y, cuando se recupera, recibe el estado completo.
+- El monitor solo deja el último frame en un hueco (publish); codificar y
+  enviar ocurre en el hilo del servidor.
+
+Mensajes: {"t": "full" | "delta", "seq": n, "d": {campo: valor}}
+
+Uso:
+    DASHBOARD_ENABLED = True en advanced_config.py, o bien
+    python dashboard.py      # alimentado por hub.py
+"""
+
+import asyncio
+import base64
+import copy
+import hashlib
+import json
+import struct
+import threading
+import time
+from typing import Dict, Optional
+from advanced_config import AdvancedConfig
+from display import Display, NullDisplay
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Campos enviados y decimales con que se comparan y envían
+TELEMETRY_FIELDS = (
+    ("fuel", 2), ("max_fuel", 1), ("lap", None), ("total_laps", None),
+    ("last_lap_time", 3), ("track_name", None), ("vehicle_name", None),
+)
+ANALYSIS_FIELDS = (
+    ("avg_consumption", 3), ("fuel_needed", 2), ("fuel_balance", 2),
+    ("laps_remaining", None), ("laps_possible", 1), ("fuel_to_save_per_lap", 3),
+    ("status", None), ("message", None), ("pit_stops", None), ("next_pit_lap", None),
+    ("next_pit_fuel", 1), ("projected_consumption", 3),
+)
+
+
+def dashboard_state(telemetry, analysis) -> Dict[str, object]:
+    """Campos del dashboard para un frame (valores redondeados)"""
+    state = {}
+    for source, fields in ((telemetry, TELEMETRY_FIELDS), (analysis, ANALYSIS_FIELDS)):
+        for name, digits in fields:
+            value = getattr(source, name)
+            state[name] = round(value, digits) if digits is not None else value
+    return state
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT) -> bytes:
+    """Frame WebSocket del servidor (sin máscara, un solo fragmento)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Lee un frame del cliente: (opcode, payload desenmascarado)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else b""
+    payload = await reader.readexactly(length)
+    if mask:
+        # XOR con la máscara repetida, en un solo entero
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+    return opcode, payload
+
+
+def accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + WS_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+class DashboardClient:
+    """Un visor conectado"""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.needs_full = True  # Recién conectado o tras saltarse envíos
+        self.skipped = 0
+
+    def pending(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+
+class DashboardServer:
+    """Servidor HTTP/WebSocket en un hilo propio"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None,
+                 push_rate: Optional[float] = None, max_client_buffer: Optional[int] = None):
+        advanced = AdvancedConfig()
+        self.host = host if host is not None else advanced.DASHBOARD_HOST
+        self.port = port if port is not None else advanced.DASHBOARD_PORT
+        self.push_interval = 1.0 / (push_rate if push_rate is not None else advanced.DASHBOARD_PUSH_RATE)
+        self.max_client_buffer = (max_client_buffer if max_client_buffer is not None
+                                  else advanced.DASHBOARD_MAX_CLIENT_BUFFER)
+
+        self._latest = None  # (telemetría, análisis) publicado por el monitor
+        self.state: Dict[str, object] = {}
+        self.seq = 0
+        self._delta: Optional[bytes] = None  # Delta pendiente de enviar, ya codificado
+        self.clients = set()
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+        self.error: Optional[BaseException] = None
+
+        # Estadísticas
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.resyncs = 0
+
+    # --- Lado del monitor ---
+
+    def publish(self, telemetry, analysis):
+        """Deja el último frame para el próximo envío (una asignación, sin esperas)"""
+        self._latest = (telemetry, analysis)
+
+    def start(self) -> bool:
+        """Arranca el servidor; False si no se pudo abrir el puerto"""
+        self.thread = threading.Thread(target=self._run, name="dashboard", daemon=True)
+        self.thread.start()
+        self._ready.wait(5.0)
+        if self.error is not None:
+            print(f"Aviso: no se pudo iniciar el dashboard: {self.error}")
+            return False
+        return True
+
+    def stop(self):
+        if self.loop is not None and self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
+        if self.thread is not None:
+            self.thread.join(2.0)
+            self.thread = None
+
+    # --- Hilo del servidor ---
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except BaseException as e:
+            self.error = e
+            self._ready.set()
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Con puerto 0 el sistema asigna uno libre
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        broadcaster = asyncio.create_task(self._broadcast_loop())
+        async with server:
+            await self._stop.wait()
+            broadcaster.cancel()
+            # Cortar las conexiones deja terminar a sus tareas antes de cerrar el bucle
+            for client in list(self.clients):
+                client.writer.transport.abort()
+            for _ in range(100):
+                if not self.clients:
+                    break
+                await asyncio.sleep(0.01)
+
+    async def _broadcast_loop(self):
+        last_item = None
+        while True:
+            await asyncio.sleep(self.push_interval)
+            item = self._latest
+            if item is not last_item:
+                last_item = item
+                self._apply(dashboard_state(*item))
+            elif not any(client.needs_full for client in self.clients):
+                continue
+            self._send_pending()
+
+    def _apply(self, new_state: Dict[str, object]):
+        """Guarda el estado nuevo y prepara el delta respecto al anterior"""
+        delta = {key: value for key, value in new_state.items() if self.state.get(key) != value}
+        self.state = new_state
+        if delta:
+            self.seq += 1
+            self._delta = encode_frame(json.dumps(
+                {"t": "delta", "seq": self.seq, "d": delta}, ensure_ascii=False).encode("utf-8"))
+        else:
+            self._delta = None
+
+    def _full_frame(self) -> bytes:
+        return encode_frame(json.dumps(
+            {"t": "full", "seq": self.seq, "d": self.state}, ensure_ascii=False).encode("utf-8"))
+
+    def _send_pending(self):
+        """Envía el delta (o el estado completo) a cada cliente sin esperar a ninguno"""
+        delta, self._delta = self._delta, None
+        full = None
+        for client in list(self.clients):
+            if client.pending() > self.max_client_buffer:
+                # Cliente lento: no se acumula más; al recuperarse, estado completo
+                client.needs_full = True
+                client.skipped += 1
+                continue
+            if client.needs_full:
+                if not self.state:
+                    continue
+                if full is None:
+                    full = self._full_frame()
+                frame = full
+                client.needs_full = False
+                self.resyncs += 1
+            elif delta is not None:
+                frame = delta
+            else:
+                continue
+            client.writer.write(frame)
+            self.messages_sent += 1
+            self.bytes_sent += len(frame)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        path = parts[1] if len(parts) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+            await self._websocket(reader, writer, headers)
+        elif path == "/":
+            self._respond(writer, "200 OK", "text/html; charset=utf-8", DASHBOARD_HTML.encode("utf-8"))
+        elif path == "/state":
+            body = json.dumps({"seq": self.seq, "d": self.state}, ensure_ascii=False).encode("utf-8")
+            self._respond(writer, "200 OK", "application/json", body)
+        else:
+            self._respond(writer, "404 Not Found", "text/plain", b"Not found")
+
+    def _respond(self, writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes):
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+        writer.close()
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self._respond(writer, "400 Bad Request", "text/plain", b"Missing key")
+            return
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n".encode("latin-1"))
+        client = DashboardClient(writer)
+        self.clients.add(client)
+        try:
+            # El cliente no envía datos: solo se atienden ping y cierre
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(payload[:2], OP_CLOSE))
+                    break
+                if opcode == OP_PING:
+                    writer.write(encode_frame(payload, OP_PONG))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+
+class DashboardDisplay(Display):
+    """
+    Display que alimenta el dashboard (y opcionalmente dibuja la consola)
+
+    Con copy_frames (LOW_ALLOCATION_MODE) el monitor rellena en sitio el
+    mismo frame y el mismo análisis en cada tick: el hilo del servidor recibe
+    una copia para no leerlos a medio rellenar.
+    """
+
+    def __init__(self, server: DashboardServer, display: Optional[Display] = None,
+                 copy_frames: bool = False):
+        super().__init__()
+        self.server = server
+        self.display = display if display is not None else NullDisplay()
+        self.copy_frames = copy_frames
+
+    def update(self, telemetry, analysis):
+        if self.copy_frames:
+            self.server.publish(copy.copy(telemetry), copy.copy(analysis))
+        else:
+            self.server.publish(telemetry, analysis)
+        self.display.update(telemetry, analysis)
+
+    def flush(self):
+        self.display.flush()
+
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>LMU Fuel Monitor</title>
+<style>
+body{background:#111;color:#eee;font-family:sans-serif;margin:0;padding:1em}
+#balance{font-size:18vw;font-weight:bold;text-align:center}
+.OK{color:#3c3}.WARNING{color:#fc3}.CRITICAL{color:#f44}
+#message{font-size:5vw;text-align:center;margin-bottom:.5em}
+table{width:100%;font-size:4vw;border-collapse:collapse}
+td{padding:.2em .4em;border-bottom:1px solid #333}td+td{text-align:right}
+#conn{position:fixed;top:.3em;right:.5em;font-size:.8em;color:#888}
+</style></head><body>
+<div id="conn">conectando...</div>
+<div id="balance">--</div><div id="message"></div>
+<table>
+<tr><td>Circuito / coche</td><td id="session"></td></tr>
+<tr><td>Combustible</td><td id="fuel"></td></tr>
+<tr><td>Vuelta</td><td id="lap"></td></tr>
+<tr><td>Consumo promedio</td><td id="avg"></td></tr>
+<tr><td>Proyección vuelta actual</td><td id="projected"></td></tr>
+<tr><td>Vueltas posibles</td><td id="possible"></td></tr>
+<tr><td>Necesario</td><td id="needed"></td></tr>
+<tr><td>Boxes</td><td id="pit"></td></tr>
+</table>
+<script>
+let s={};
+const $=id=>document.getElementById(id);
+function render(){
+  const b=s.fuel_balance||0;
+  $("balance").textContent=(b>=0?"+":"")+b.toFixed(2)+" L";
+  $("balance").className=$("message").className=s.status||"OK";
+  $("message").textContent=s.message||"";
+  $("session").textContent=(s.track_name||"")+" / "+(s.vehicle_name||"");
+  $("fuel").textContent=(s.fuel||0).toFixed(2)+" / "+(s.max_fuel||0).toFixed(1)+" L";
+  $("lap").textContent=(s.lap||0)+" / "+(s.total_laps||0);
+  $("avg").textContent=(s.avg_consumption||0).toFixed(3)+" L";
+  $("projected").textContent=s.projected_consumption?s.projected_consumption.toFixed(3)+" L":"--";
+  $("possible").textContent=(s.laps_possible||0).toFixed(1);
+  $("needed").textContent=(s.fuel_needed||0).toFixed(2)+" L";
+  $("pit").textContent=s.pit_stops?s.pit_stops+" (vuelta "+s.next_pit_lap+", +"+s.next_pit_fuel.toFixed(1)+" L)":"sin parada";
+}
+function connect(){
+  const ws=new WebSocket("ws://"+location.host+"/ws");
+  ws.onopen=()=>$("conn").textContent="en vivo";
+  ws.onmessage=e=>{const m=JSON.parse(e.data);
+    if(m.t==="full")s=m.d;else Object.assign(s,m.d);render();};
+  ws.onclose=()=>{$("conn").textContent="reconectando...";setTimeout(connect,2000);};
+}
+connect();
+</script></body></html>
+"""
+
+
+def main():
+    """Dashboard alimentado por hub.py, sin leer el juego"""
+    from hub import HubConnector
+
+    connector = HubConnector()
+    while not connector.connect():
+        print("Esperando al hub... (Reintentando en 3s)")
+        time.sleep(3)
+    server = DashboardServer()
+    if not server.start():
+        return
+    print(f"Dashboard en http://{server.host}:{server.port}/")
+    last_seq = 0
+    try:
+        while True:
+            seq = connector.read_update_counter()
+            if seq != last_seq:
+                telemetry = connector.read_telemetry()
+                analysis = connector.read_analysis()
+                if telemetry is not None and analysis is not None:
+                    server.publish(telemetry, analysis)
+                last_seq = seq
+            time.sleep(server.push_interval / 2)
+    except KeyboardInterrupt:
+        print("\nDashboard detenido")
+    finally:
+        server.stop()
+        connector.disconnect()
+
+
+if __name__ == "__main__":
+    main()
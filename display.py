@@ -4,6 +4,7 @@ Módulo de visualización para mostrar datos en consola
 
 import os
 import sys
+import time
 from typing import Optional
 from config import Config
 
@@ -43,6 +44,12 @@ class Display:
         sign = "+" if balance >= 0 else ""
         return f"{color}{symbol}{sign}{balance:.2f}L{self.config.COLOR_RESET}"
     
+    def format_pit_plan(self, analysis) -> str:
+        """Resumen del plan de paradas"""
+        stops = "parada" if analysis.pit_stops == 1 else "paradas"
+        return (f"Boxes: {analysis.pit_stops} {stops}, próxima al final de la vuelta "
+                f"{analysis.next_pit_lap} (+{analysis.next_pit_fuel:.1f}L)")
+    
     def create_progress_bar(self, current: float, maximum: float, width: int = 30) -> str:
         """Crea una barra de progreso"""
         if maximum == 0:
@@ -75,6 +82,10 @@ class Display:
             print(display_text)
             self.last_display = display_text
     
+    def flush(self):
+        """El display completo no retiene frames pendientes"""
+        pass
+    
     def _create_display(self, telemetry, analysis) -> str:
         """Crea el texto del display"""
         
@@ -107,6 +118,8 @@ class Display:
         lines.append(f"  Promedio por vuelta: {analysis.avg_consumption:.3f}L")
         if hasattr(analysis, 'laps_possible') and analysis.laps_possible > 0:
             lines.append(f"  Vueltas posibles: {analysis.laps_possible:.1f}")
+        if analysis.projected_consumption > 0:
+            lines.append(f"  Proyección vuelta actual: {analysis.projected_consumption:.3f}L")
         lines.append("")
         
         # Balance y estado
@@ -114,6 +127,8 @@ class Display:
         lines.append(f"{self.config.COLOR_BOLD}ANÁLISIS:{self.config.COLOR_RESET}")
         lines.append(f"  Combustible necesario: {analysis.fuel_needed:.2f}L")
         lines.append(f"  Balance: {self.format_balance(analysis.fuel_balance)}")
+        if analysis.pit_stops > 0:
+            lines.append(f"  {self.format_pit_plan(analysis)}")
         lines.append("")
         
         # Mensaje de estado
@@ -140,4 +155,165 @@ class Display:
     
     def show_info(self, message: str):
         """Muestra un mensaje informativo"""
-        print(f"\n{self.config.COLOR_BLUE}ℹ {message}{self.config.COLOR_RESET}\n")
\ No newline at end of file
+        print(f"\n{self.config.COLOR_BLUE}ℹ {message}{self.config.COLOR_RESET}\n")
+
+
+class AnsiDisplay(Display):
+    """
+    Display incremental: dibuja el marco estático una sola vez y después
+    reescribe solo los campos que cambian mediante posicionamiento ANSI
+    """
+    
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream if stream is not None else sys.stdout
+        self.min_frame_interval = 1.0 / self.config.DISPLAY_MAX_FPS
+        self.last_frame_time = 0.0
+        self.pending = None  # Último frame retenido por el límite de FPS
+        self.frame_drawn = False
+        self.field_values = {}  # Último texto escrito en cada campo
+        self.static_lines, self.field_positions = self._build_layout()
+        
+        if os.name == 'nt':
+            # Activa el procesamiento de secuencias VT en la consola de Windows
+            os.system('')
+    
+    def _build_layout(self):
+        """Construye las líneas estáticas y la posición (fila, columna) de cada campo"""
+        c = self.config
+        template = [
+            "",
+            f"{c.COLOR_BOLD}{c.COLOR_BLUE}",
+            "╔════════════════════════════════════════════════════════════╗",
+            "║        LE MANS ULTIMATE - MONITOR DE COMBUSTIBLE          ║",
+            "╚════════════════════════════════════════════════════════════╝",
+            c.COLOR_RESET,
+            "",
+            f"{c.COLOR_BOLD}INFORMACIÓN DE CARRERA:{c.COLOR_RESET}",
+            ("  Vuelta actual:  ", "lap"),
+            ("  Vueltas restantes: ", "laps_remaining"),
+            "",
+            f"{c.COLOR_BOLD}COMBUSTIBLE:{c.COLOR_RESET}",
+            ("  Actual: ", "fuel"),
+            ("  ", "fuel_bar"),
+            "",
+            f"{c.COLOR_BOLD}CONSUMO:{c.COLOR_RESET}",
+            ("  Promedio por vuelta: ", "avg_consumption"),
+            ("", "laps_possible"),
+            ("", "projected"),
+            "",
+            f"{c.COLOR_BOLD}ANÁLISIS:{c.COLOR_RESET}",
+            ("  Combustible necesario: ", "fuel_needed"),
+            ("  Balance: ", "balance"),
+            ("", "pit_plan"),
+            "",
+            f"{c.COLOR_BOLD}ESTADO:{c.COLOR_RESET}",
+            ("  ", "message"),
+            "",
+            ("", "save"),
+            "",
+            f"{c.COLOR_BLUE}{'─' * 60}{c.COLOR_RESET}",
+            "Presiona Ctrl+C para salir",
+        ]
+        
+        lines = []
+        positions = {}
+        for row, entry in enumerate(template, start=1):
+            if isinstance(entry, tuple):
+                label, key = entry
+                # Las etiquetas no llevan secuencias de color: su longitud es la visible
+                positions[key] = (row, len(label) + 1)
+                lines.append(label)
+            else:
+                lines.append(entry)
+        return lines, positions
+    
+    def _field_texts(self, telemetry, analysis) -> dict:
+        """Texto actual de cada campo dinámico"""
+        c = self.config
+        status_color = self.get_color_for_status(analysis.status)
+        
+        texts = {
+            "lap": f"{telemetry.lap} / {telemetry.total_laps}",
+            "laps_remaining": f"{analysis.laps_remaining}",
+            "fuel": f"{telemetry.fuel:.2f}L / {telemetry.max_fuel:.2f}L",
+            "fuel_bar": self.create_progress_bar(telemetry.fuel, telemetry.max_fuel),
+            "avg_consumption": f"{analysis.avg_consumption:.3f}L",
+            "laps_possible": "",
+            "projected": "",
+            "fuel_needed": f"{analysis.fuel_needed:.2f}L",
+            "balance": self.format_balance(analysis.fuel_balance),
+            "pit_plan": "",
+            "message": f"{status_color}{c.COLOR_BOLD}{analysis.message}{c.COLOR_RESET}",
+            "save": "",
+        }
+        if analysis.laps_possible > 0:
+            texts["laps_possible"] = f"  Vueltas posibles: {analysis.laps_possible:.1f}"
+        if analysis.projected_consumption > 0:
+            texts["projected"] = f"  Proyección vuelta actual: {analysis.projected_consumption:.3f}L"
+        if analysis.pit_stops > 0:
+            texts["pit_plan"] = f"  {self.format_pit_plan(analysis)}"
+        if analysis.fuel_to_save_per_lap > 0:
+            texts["save"] = (f"{c.COLOR_RED}{c.COLOR_BOLD}"
+                             f"  ► DEBES AHORRAR: {analysis.fuel_to_save_per_lap:.2f}L POR VUELTA ◄"
+                             f"{c.COLOR_RESET}")
+        return texts
+    
+    def invalidate(self):
+        """Fuerza a redibujar el marco completo en el siguiente frame"""
+        self.frame_drawn = False
+        self.field_values = {}
+    
+    def update(self, telemetry, analysis):
+        """Actualiza el display respetando el límite de frames por segundo"""
+        now = time.monotonic()
+        if now - self.last_frame_time < self.min_frame_interval:
+            self.pending = (telemetry, analysis)
+            return
+        self.render(telemetry, analysis)
+        self.last_frame_time = now
+    
+    def flush(self):
+        """Dibuja el frame retenido por el límite de FPS si ya toca"""
+        if self.pending is not None and \
+                time.monotonic() - self.last_frame_time >= self.min_frame_interval:
+            telemetry, analysis = self.pending
+            self.update(telemetry, analysis)
+    
+    def render(self, telemetry, analysis):
+        """Escribe en una sola operación solo los campos que han cambiado"""
+        self.pending = None
+        out = []
+        
+        if not self.frame_drawn:
+            # Limpia la pantalla y dibuja el marco estático
+            out.append("\033[2J\033[H")
+            out.append("\n".join(self.static_lines))
+            self.frame_drawn = True
+        
+        for key, text in self._field_texts(telemetry, analysis).items():
+            if self.field_values.get(key) != text:
+                row, col = self.field_positions[key]
+                # Posiciona el cursor, escribe y borra el resto de la línea
+                out.append(f"\033[{row};{col}H{text}\033[K")
+                self.field_values[key] = text
+        
+        if out:
+            # Deja el cursor debajo del marco
+            out.append(f"\033[{len(self.static_lines) + 1};1H")
+            self.stream.write("".join(out))
+            self.stream.flush()
+
+
+class NullDisplay(Display):
+    """Display que no dibuja nada (reproducciones y benchmarks sin consola)"""
+    
+    def update(self, telemetry, analysis):
+        pass
+
+
+def create_display(config: Config) -> Display:
+    """Crea el display según Config.DISPLAY_MODE"""
+    if config.DISPLAY_MODE == "clear":
+        return Display()
+    return AnsiDisplay()
@@ -0,0 +1,315 @@
+"""
+Emulador de la memoria compartida de rFactor 2 / Le Mans Ultimate
+
+Publica buffers de Telemetría y Scoring compatibles con rf2_structs.py
+(con sus contadores mVersionUpdateBegin/End) a una frecuencia configurable,
+para probar y medir el monitor sin el juego. En Linux los mapas se crean
+como ficheros en un directorio (por defecto /dev/shm); en Windows se crean
+los mapas con nombre.
+
+Uso:
+    python emulator.py --rate 100 --lap-time 90 --consumption 3.2
+    LMU_SHARED_MEMORY_DIR=/dev/shm python fuel_monitor.py
+"""
+
+import argparse
+import ctypes
+import os
+import random
+import time
+from typing import List, Optional, Tuple
+from config import Config
+from rf2_structs import MAX_VEHICLES, rF2Telemetry, rF2Scoring
+from shmem import open_shared_memory
+
+# Curvas por defecto: (posición en fracción de vuelta, metros de frenada, velocidad relativa)
+DEFAULT_CORNERS: Tuple[Tuple[float, float, float], ...] = (
+    (0.12, 150.0, 0.35),
+    (0.33, 90.0, 0.55),
+    (0.52, 120.0, 0.45),
+    (0.71, 60.0, 0.70),
+    (0.90, 110.0, 0.40),
+)
+
+CORNER_LENGTH = 100.0  # Metros a velocidad de curva
+IDLE_BURN = 0.08  # Consumo al ralentí relativo al de gas a fondo
+PIT_LANE_LENGTH = 300.0  # Metros de pit lane antes y después de la línea (box en la línea)
+
+
+class TrackProfile:
+    """Velocidad, acelerador, freno y consumo a lo largo de una vuelta"""
+
+    def __init__(self, length: float = 5000.0, lap_time: float = 90.0,
+                 consumption: float = 3.2, corners=DEFAULT_CORNERS, bins: int = 1000):
+        self.length = length
+        self.bins = bins
+        self.bin_length = length / bins
+
+        factor = [1.0] * bins
+        throttle = [1.0] * bins
+        brake = [0.0] * bins
+
+        def set_zone(start: float, end: float, fn):
+            first = int(start / self.bin_length)
+            last = int(end / self.bin_length)
+            for b in range(first, last):
+                fraction = (b - first) / max(last - first, 1)
+                fn(b % bins, fraction)
+
+        for position, brake_length, corner_speed in corners:
+            apex = position * length
+
+            def braking(b, f, m=corner_speed):
+                factor[b] = min(factor[b], 1.0 - (1.0 - m) * f)
+                throttle[b] = 0.0
+                brake[b] = 1.0
+
+            def corner(b, f, m=corner_speed):
+                factor[b] = min(factor[b], m)
+                throttle[b] = min(throttle[b], 0.3)
+                brake[b] = 0.0
+
+            def exit_(b, f, m=corner_speed):
+                factor[b] = min(factor[b], m + (1.0 - m) * f)
+
+            set_zone(apex - brake_length, apex, braking)
+            set_zone(apex, apex + CORNER_LENGTH, corner)
+            set_zone(apex + CORNER_LENGTH, apex + CORNER_LENGTH + 2 * brake_length, exit_)
+
+        # Escalar velocidad y consumo para que la vuelta dure lap_time y gaste consumption
+        relative_time = sum(self.bin_length / f for f in factor)
+        self.max_speed = relative_time / lap_time
+        self.speed = [self.max_speed * f for f in factor]
+        relative_burn = sum((IDLE_BURN + t) * self.bin_length / v
+                            for t, v in zip(throttle, self.speed))
+        burn_scale = consumption / relative_burn
+        self.burn_rate = [(IDLE_BURN + t) * burn_scale for t in throttle]  # Litros/s
+        self.throttle = throttle
+        self.brake = brake
+
+    def bin_at(self, distance: float) -> int:
+        return int(distance / self.bin_length) % self.bins
+
+
+class EmulatedCar:
+    """Estado de un coche emulado"""
+
+    def __init__(self, car_id: int, name: str, fuel: float, max_fuel: float,
+                 pace: float, fuel_factor: float, distance: float):
+        self.car_id = car_id
+        self.name = name
+        self.fuel = fuel
+        self.max_fuel = max_fuel
+        self.pace = pace  # Multiplicador de velocidad
+        self.fuel_factor = fuel_factor  # Multiplicador de consumo
+        self.lap_fuel_factor = fuel_factor
+        self.distance = distance
+        self.laps = 0
+        self.lap_start_time = 0.0
+        self.last_lap_time = 0.0
+        self.best_lap_time = 0.0
+        self.throttle = 0.0
+        self.brake = 0.0
+        self.speed = 0.0
+        self.in_pits = False
+        self.pit_exit = False  # Ya repostó: sale de boxes en la vuelta nueva
+
+
+class RF2Emulator:
+    """Publica buffers rF2 con contadores de versión a frecuencia fija"""
+
+    def __init__(self, directory: Optional[str], rate: float = 100.0,
+                 scoring_rate: float = 5.0, lap_time: float = 90.0,
+                 consumption: float = 3.2, fuel: float = 90.0, max_fuel: float = 100.0,
+                 total_laps: int = 30, vehicles: int = 1,
+                 track_name: str = "Circuit de la Sarthe (emulado)", seed: Optional[int] = None):
+        self.config = Config()
+        self.directory = directory
+        self.rate = rate
+        self.scoring_interval = 1.0 / scoring_rate
+        self.total_laps = total_laps
+        self.consumption = consumption
+        self.track_name = track_name
+        self.random = random.Random(seed)
+        self.track = TrackProfile(lap_time=lap_time, consumption=consumption)
+
+        self.cars: List[EmulatedCar] = []
+        for i in range(min(vehicles, MAX_VEHICLES)):
+            self.cars.append(EmulatedCar(
+                car_id=100 + i,
+                name=f"Hypercar #{i + 1}",
+                fuel=fuel,
+                max_fuel=max_fuel,
+                pace=1.0 if i == 0 else self.random.uniform(0.97, 1.03),
+                fuel_factor=1.0 if i == 0 else self.random.uniform(0.92, 1.08),
+                distance=self.track.length - 1.0 - i * 20.0,  # En parrilla, antes de la línea
+            ))
+
+        self.telemetry_mem = None
+        self.scoring_mem = None
+        self.telemetry = None
+        self.scoring = None
+        self.elapsed = 0.0
+        self.frames = 0
+
+    def open(self):
+        """Crea los mapas de memoria compartida"""
+        self.telemetry_mem = open_shared_memory(self.config.SHARED_MEMORY_NAME,
+                                                ctypes.sizeof(rF2Telemetry),
+                                                self.directory, create=True)
+        self.scoring_mem = open_shared_memory(self.config.SCORING_MEMORY_NAME,
+                                              ctypes.sizeof(rF2Scoring),
+                                              self.directory, create=True)
+        self.telemetry = rF2Telemetry.from_buffer(self.telemetry_mem)
+        self.scoring = rF2Scoring.from_buffer(self.scoring_mem)
+
+        info = self.scoring.mScoringInfo
+        info.mTrackName = self.track_name.encode("utf-8")[:63]
+        info.mMaxLaps = self.total_laps
+        info.mLapDist = self.track.length
+        info.mNumVehicles = len(self.cars)
+        self.telemetry.mNumVehicles = len(self.cars)
+        for i, car in enumerate(self.cars):
+            self.telemetry.mVehicles[i].mID = car.car_id
+            self.telemetry.mVehicles[i].mEngineMaxRPM = 9000.0
+            vehicle = self.scoring.mVehicles[i]
+            vehicle.mID = car.car_id
+            vehicle.mDriverName = f"Piloto {i + 1}".encode("utf-8")
+            vehicle.mVehicleName = car.name.encode("utf-8")
+        # Al empezar se ha cruzado la línea en la vuelta 0
+        self._publish_scoring()
+
+    def step(self, dt: float):
+        """Avanza la simulación dt segundos"""
+        self.elapsed += dt
+        track = self.track
+        for car in self.cars:
+            b = track.bin_at(car.distance)
+            car.speed = track.speed[b] * car.pace
+            car.throttle = track.throttle[b]
+            car.brake = track.brake[b]
+            car.fuel = max(car.fuel - track.burn_rate[b] * car.lap_fuel_factor * dt, 0.0)
+            car.distance += car.speed * dt
+
+            # Entra en boxes si no llega a la vuelta y media; sale tras el pit lane
+            if car.pit_exit:
+                if car.distance >= PIT_LANE_LENGTH:
+                    car.in_pits = car.pit_exit = False
+            elif not car.in_pits and car.distance >= track.length - PIT_LANE_LENGTH \
+                    and car.fuel < 1.5 * self.consumption * car.fuel_factor:
+                car.in_pits = True
+
+            if car.distance >= track.length:
+                car.distance -= track.length
+                car.laps += 1
+                if car.laps > 1:
+                    car.last_lap_time = self.elapsed - car.lap_start_time
+                    if not car.best_lap_time or car.last_lap_time < car.best_lap_time:
+                        car.best_lap_time = car.last_lap_time
+                car.lap_start_time = self.elapsed
+                car.lap_fuel_factor = car.fuel_factor * self.random.gauss(1.0, 0.02)
+                # Parada instantánea en el box, sobre la línea
+                if car.in_pits:
+                    car.fuel = car.max_fuel
+                    car.pit_exit = True
+
+    def publish_telemetry(self, dt: float):
+        """Escribe el buffer de telemetría con el protocolo Begin/End"""
+        telemetry = self.telemetry
+        telemetry.mVersionUpdateBegin += 1
+        for i, car in enumerate(self.cars):
+            vehicle = telemetry.mVehicles[i]
+            vehicle.mDeltaTime = dt
+            vehicle.mEngineRPM = 3000.0 + 6000.0 * car.speed / (self.track.max_speed * 1.05)
+            vehicle.mUnfilteredThrottle = car.throttle
+            vehicle.mUnfilteredBrake = car.brake
+            vehicle.mFuel = car.fuel
+        telemetry.mVersionUpdateEnd += 1
+
+    def _publish_scoring(self):
+        scoring = self.scoring
+        scoring.mVersionUpdateBegin += 1
+        scoring.mScoringInfo.mCurrentET = self.elapsed
+        for i, car in enumerate(self.cars):
+            vehicle = scoring.mVehicles[i]
+            vehicle.mTotalLaps = car.laps
+            vehicle.mLapDist = car.distance
+            vehicle.mLastLapTime = car.last_lap_time
+            vehicle.mFastestLapTime = car.best_lap_time
+            vehicle.mKPH = car.speed * 3.6
+            vehicle.mSector = int(3 * car.distance / self.track.length)
+            vehicle.mInPits = car.in_pits
+        scoring.mVersionUpdateEnd += 1
+
+    def run(self, duration: float = 0.0):
+        """Publica frames a `rate` Hz durante `duration` segundos (0 = sin fin)"""
+        interval = 1.0 / self.rate
+        start = last = time.perf_counter()
+        next_frame = start + interval
+        next_scoring = start + self.scoring_interval
+        while not duration or last - start < duration:
+            now = time.perf_counter()
+            if now < next_frame:
+                time.sleep(next_frame - now)
+                now = time.perf_counter()
+            dt = now - last
+            last = now
+            self.step(dt)
+            self.publish_telemetry(dt)
+            if now >= next_scoring:
+                self._publish_scoring()
+                next_scoring += self.scoring_interval
+            self.frames += 1
+            # Si vamos con retraso no se intentan recuperar los frames perdidos
+            next_frame = max(next_frame + interval, now)
+
+    def close(self):
+        """Libera las vistas y cierra los mapas"""
+        self.telemetry = None
+        self.scoring = None
+        if self.telemetry_mem:
+            self.telemetry_mem.close()
+        if self.scoring_mem:
+            self.scoring_mem.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulador de la memoria compartida rF2/LMU")
+    parser.add_argument("--dir", default=None if os.name == "nt" else "/dev/shm",
+                        help="Directorio de los mapas (Linux). En Windows se usan mapas con nombre")
+    parser.add_argument("--rate", type=float, default=100.0, help="Frames de telemetría por segundo (10-1000)")
+    parser.add_argument("--scoring-rate", type=float, default=5.0, help="Actualizaciones de Scoring por segundo")
+    parser.add_argument("--lap-time", type=float, default=90.0)
+    parser.add_argument("--consumption", type=float, default=3.2, help="Litros por vuelta")
+    parser.add_argument("--fuel", type=float, default=90.0)
+    parser.add_argument("--max-fuel", type=float, default=100.0)
+    parser.add_argument("--laps", type=int, default=30)
+    parser.add_argument("--vehicles", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=0.0, help="Segundos (0 = sin fin)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    emulator = RF2Emulator(args.dir, rate=args.rate, scoring_rate=args.scoring_rate,
+                           lap_time=args.lap_time, consumption=args.consumption,
+                           fuel=args.fuel, max_fuel=args.max_fuel, total_laps=args.laps,
+                           vehicles=args.vehicles, seed=args.seed)
+    emulator.open()
+    print(f"Emulando {len(emulator.cars)} coche(s) a {args.rate:.0f} Hz"
+          + (f" en {args.dir}" if args.dir else ""))
+    # El monitor solo lee estos buffers con el conector ctypes
+    if args.dir:
+        print(f"Conecta el monitor con: LMU_SHARED_MEMORY_DIR={args.dir} "
+              f"LMU_CONNECTOR_MODE=ctypes python fuel_monitor.py")
+    else:
+        print('Conecta el monitor con CONNECTOR_MODE = "ctypes" (o LMU_CONNECTOR_MODE=ctypes)')
+    try:
+        emulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.close()
+        print(f"\nEmulador detenido ({emulator.frames} frames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Seguimiento de combustible de todo el campo (hasta 64 coches) con NumPy
+
+Mapea los arrays de vehículos de Telemetría y Scoring como arrays
+estructurados de NumPy sobre la memoria compartida y calcula en unas pocas
+operaciones vectorizadas por tick el consumo, las vueltas posibles y el
+balance de combustible de todos los coches. Las vueltas cuentan con los
+criterios de FuelCalculator (de línea a línea, sin repostaje, consumo
+positivo) y el balance usa SAFETY_MARGIN, pero el consumo de cada coche es
+una media exponencial (EWMA_ALPHA) de todas esas vueltas: sin tiempos de
+referencia por coche no se descartan las lentas como en el monitor.
+
+Requiere numpy (pip install numpy) y CONNECTOR_MODE = "ctypes".
+
+Uso:
+    python field_tracker.py
+"""
+
+import ctypes
+import time
+from typing import Optional
+import numpy as np
+from config import Config
+from advanced_config import AdvancedConfig
+from rf2_connector import RF2DirectConnector
+from rf2_structs import (MAX_VEHICLES, rF2Scoring, rF2ScoringInfo, rF2Telemetry,
+                         rF2VehicleScoring, rF2VehicleTelemetry)
+
+
+def _field_dtype(ctype) -> np.dtype:
+    # Las cadenas c_char * N se ven como bytes de longitud fija
+    if issubclass(ctype, ctypes.Array) and ctype._type_ is ctypes.c_char:
+        return np.dtype(f"S{ctype._length_}")
+    return np.dtype(ctype)
+
+
+def struct_dtype(struct_cls, fields) -> np.dtype:
+    """dtype de NumPy con solo `fields` de una estructura ctypes (mismos offsets)"""
+    types = dict(struct_cls._fields_)
+    return np.dtype({
+        "names": list(fields),
+        "formats": [_field_dtype(types[name]) for name in fields],
+        "offsets": [getattr(struct_cls, name).offset for name in fields],
+        "itemsize": ctypes.sizeof(struct_cls),
+    })
+
+
+TELEMETRY_DTYPE = struct_dtype(rF2VehicleTelemetry, ("mID", "mFuel"))
+SCORING_DTYPE = struct_dtype(rF2VehicleScoring,
+                             ("mID", "mVehicleName", "mTotalLaps", "mLastLapTime"))
+
+# Offsets de los campos de cabecera que se leen junto a los arrays
+SCORING_INFO_OFFSET = rF2Scoring.mScoringInfo.offset
+MAX_LAPS_OFFSET = SCORING_INFO_OFFSET + rF2ScoringInfo.mMaxLaps.offset
+NUM_VEHICLES_OFFSET = SCORING_INFO_OFFSET + rF2ScoringInfo.mNumVehicles.offset
+
+
+class FieldSnapshot:
+    """Estado de combustible de todos los coches activos (arrays alineados)"""
+
+    def __init__(self, ids, names, fuel, laps, last_lap_time, consumption,
+                 laps_possible, laps_remaining, fuel_balance):
+        self.ids = ids
+        self.names = names
+        self.fuel = fuel
+        self.laps = laps
+        self.last_lap_time = last_lap_time
+        self.consumption = consumption  # Consumo medio por vuelta (NaN sin datos)
+        self.laps_possible = laps_possible
+        self.laps_remaining = laps_remaining
+        self.fuel_balance = fuel_balance
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class FieldFuelTracker:
+    """Calculadora de combustible vectorizada para todo el campo"""
+
+    def __init__(self, connector: RF2DirectConnector):
+        self.config = Config()
+        self.advanced = AdvancedConfig()
+        self.connector = connector
+        self.alpha = self.advanced.EWMA_ALPHA
+        self.torn_frames = 0
+
+        # Vistas NumPy sobre la memoria compartida (sin copia)
+        self._telemetry_view = None
+        self._scoring_view = None
+        self._header_view = None  # Contadores de versión de Scoring
+        self._telemetry_header_view = None
+
+        # Estado por posición del array de Scoring
+        n = MAX_VEHICLES
+        self.ids = np.full(n, -1, dtype=np.int32)
+        self.laps = np.zeros(n, dtype=np.int32)
+        self.last_fuel = np.full(n, np.nan)
+        self.lap_start_fuel = np.full(n, np.nan)  # NaN = cruce de meta no observado
+        self.consumption = np.full(n, np.nan)
+        self.samples = np.zeros(n, dtype=np.int32)
+
+    def attach(self) -> bool:
+        """Crea las vistas sobre los buffers del conector"""
+        if self.connector.telemetry_mem is None or self.connector.scoring_mem is None:
+            return False
+        self._telemetry_view = np.ndarray((MAX_VEHICLES,), TELEMETRY_DTYPE,
+                                          buffer=self.connector.telemetry_mem,
+                                          offset=rF2Telemetry.mVehicles.offset)
+        self._scoring_view = np.ndarray((MAX_VEHICLES,), SCORING_DTYPE,
+                                        buffer=self.connector.scoring_mem,
+                                        offset=rF2Scoring.mVehicles.offset)
+        self._header_view = np.ndarray((2,), np.uint32, buffer=self.connector.scoring_mem)
+        self._telemetry_header_view = np.ndarray((2,), np.uint32,
+                                                 buffer=self.connector.telemetry_mem)
+        return True
+
+    def detach(self):
+        """Suelta las vistas (necesario antes de cerrar los buffers)"""
+        self._telemetry_view = None
+        self._scoring_view = None
+        self._header_view = None
+        self._telemetry_header_view = None
+
+    def _read_arrays(self):
+        """
+        Copia consistente de los campos de todos los vehículos activos
+
+        Los dos buffers se escriben por separado: la copia vale si ninguno de
+        los dos cambió de versión (Begin/End) mientras se hacía.
+        """
+        mem = self.connector.scoring_mem
+        for _ in range(self.config.TORN_READ_RETRIES + 1):
+            version = int(self._header_view[1])  # mVersionUpdateEnd
+            telemetry_version = int(self._telemetry_header_view[1])
+            count = min(int.from_bytes(mem[NUM_VEHICLES_OFFSET:NUM_VEHICLES_OFFSET + 4],
+                                       "little", signed=True), MAX_VEHICLES)
+            max_laps = int.from_bytes(mem[MAX_LAPS_OFFSET:MAX_LAPS_OFFSET + 4],
+                                      "little", signed=True)
+            count = max(count, 0)
+            scoring = self._scoring_view[:count].copy()
+            telemetry = self._telemetry_view[:count].copy()
+            if int(self._header_view[0]) == version and \
+                    int(self._telemetry_header_view[0]) == telemetry_version:  # mVersionUpdateBegin
+                return scoring, telemetry, max_laps
+            self.torn_frames += 1
+        return None
+
+    def update(self) -> Optional[FieldSnapshot]:
+        """Lee todo el campo y actualiza los consumos de cada coche"""
+        if self._scoring_view is None and not self.attach():
+            return None
+        arrays = self._read_arrays()
+        if arrays is None:
+            return None
+        scoring, telemetry, max_laps = arrays
+        n = len(scoring)
+
+        # Cruzar Scoring y Telemetría por mID (el orden puede ser distinto)
+        ids = scoring["mID"]
+        fuel = np.full(n, np.nan)
+        if len(telemetry):
+            order = np.argsort(telemetry["mID"])
+            sorted_ids = telemetry["mID"][order]
+            pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+            matched = sorted_ids[pos] == ids
+            fuel[matched] = telemetry["mFuel"][order[pos[matched]]]
+        laps = scoring["mTotalLaps"].astype(np.int32)
+
+        # Posiciones que ahora ocupa otro coche: se reinicia su estado
+        new_car = self.ids[:n] != ids
+        self.ids[:n] = ids
+        for state in (self.last_fuel, self.lap_start_fuel, self.consumption):
+            state[:n][new_car] = np.nan
+        self.samples[:n][new_car] = 0
+        self.laps[:n][new_car] = laps[new_car]
+
+        # Repostaje: la vuelta en curso deja de ser válida
+        refuel = fuel > self.last_fuel[:n] + self.advanced.REFUEL_THRESHOLD
+        self.lap_start_fuel[:n][refuel] = np.nan
+
+        # Cruce de meta: consumo de línea a línea
+        crossed = (laps > self.laps[:n]) & ~new_car
+        lap_consumption = self.lap_start_fuel[:n] - fuel
+        valid = crossed & (laps == self.laps[:n] + 1) & (lap_consumption > 0)
+        first = valid & (self.samples[:n] == 0)
+        current = self.consumption[:n]
+        current[first] = lap_consumption[first]
+        rest = valid & ~first
+        current[rest] += self.alpha * (lap_consumption[rest] - current[rest])
+        self.samples[:n] += valid
+
+        # Empieza vuelta: solo es "combustible en la línea" si ya teníamos lectura previa
+        seen_before = ~np.isnan(self.last_fuel[:n])
+        self.lap_start_fuel[:n][crossed] = np.where(seen_before[crossed], fuel[crossed], np.nan)
+        self.laps[:n] = laps
+        self.last_fuel[:n] = fuel
+
+        # Análisis de todo el campo
+        consumption = current.copy()
+        laps_remaining = np.maximum(max_laps - laps, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            laps_possible = fuel / consumption
+        fuel_balance = fuel - (consumption * laps_remaining + self.config.SAFETY_MARGIN)
+
+        return FieldSnapshot(
+            ids=ids.copy(),
+            names=scoring["mVehicleName"],
+            fuel=fuel,
+            laps=laps,
+            last_lap_time=scoring["mLastLapTime"].copy(),
+            consumption=consumption,
+            laps_possible=laps_possible,
+            laps_remaining=laps_remaining,
+            fuel_balance=fuel_balance,
+        )
+
+
+def format_table(snapshot: FieldSnapshot) -> str:
+    """Tabla de texto ordenada por balance (los más justos primero)"""
+    lines = [f"{'Coche':24s} {'Vuelta':>6s} {'Comb.':>7s} {'Cons.':>6s} "
+             f"{'V.pos':>6s} {'Balance':>8s}"]
+    order = np.argsort(np.nan_to_num(snapshot.fuel_balance, nan=np.inf))
+    for i in order:
+        name = snapshot.names[i].decode("utf-8", "replace")[:24]
+        if np.isnan(snapshot.consumption[i]):
+            lines.append(f"{name:24s} {snapshot.laps[i]:6d} {snapshot.fuel[i]:7.2f} "
+                         f"{'--':>6s} {'--':>6s} {'--':>8s}")
+        else:
+            lines.append(f"{name:24s} {snapshot.laps[i]:6d} {snapshot.fuel[i]:7.2f} "
+                         f"{snapshot.consumption[i]:6.2f} {snapshot.laps_possible[i]:6.1f} "
+                         f"{snapshot.fuel_balance[i]:+8.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    connector = RF2DirectConnector()
+    while not connector.connect():
+        print("Esperando juego... (Reintentando en 3s)")
+        time.sleep(3)
+    tracker = FieldFuelTracker(connector)
+    try:
+        while True:
+            snapshot = tracker.update()
+            if snapshot is not None:
+                # Cursor al inicio y borrar hasta el final: sin parpadeo
+                print("\033[H\033[J" + format_table(snapshot), flush=True)
+            time.sleep(connector.config.DISPLAY_UPDATE_RATE)
+    except KeyboardInterrupt:
+        print("\nSeguimiento detenido")
+    finally:
+        tracker.detach()
+        connector.disconnect()
+
+
+if __name__ == "__main__":
+    main()
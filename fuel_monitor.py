@@ -3,44 +3,76 @@ Le Mans Ultimate - Monitor de Combustible
 Monitoriza el consumo de combustible y calcula el balance para terminar la carrera
 """
 
-import struct
-import mmap
 import time
-from dataclasses import dataclass
 from typing import Optional
 from config import Config
+from advanced_config import AdvancedConfig
 from calculator import FuelCalculator
-from display import Display
-
-
-@dataclass
-class TelemetryData:
-    """Datos de telemetría del juego"""
-    fuel: float = 0.0
-    max_fuel: float = 0.0
-    lap: int = 0
-    total_laps: int = 0
-    session_time: float = 0.0
-    last_lap_time: float = 0.0
+from display import create_display
+from scheduler import AdaptiveScheduler
+from recorder import SessionRecorder, new_session_path
+from telemetry import TelemetryData, TelemetryFrame
+from layouts import (LAYOUT_PROFILES, LayoutProfile, detect_profile, load_profiles_file,
+                     profile_from_config)
+from rf2_connector import RF2DirectConnector
+from simhub import AsyncSimHubConnector, SimHubConnector
+from hub import HubConnector
+from shmem import open_shared_memory
+from consumption_cache import ConsumptionCache
+from pipeline import MonitorPipeline
+from dashboard import DashboardDisplay, DashboardServer
+from session_log import SessionLog
+from instrumentation import Instrumentation
 
 
 class LeMansUltimateConnector:
     """Conector para leer telemetría de Le Mans Ultimate mediante memoria compartida"""
     
+    # Lee datos en vivo: FuelMonitor marca el ritmo de sondeo
+    REALTIME = True
+    
     def __init__(self):
         self.shared_mem = None
         self.config = Config()
+        self.layout = None
+        self.read_errors = 0
+        self.last_error = ""
         
     def connect(self) -> bool:
         """Intenta conectar con la memoria compartida del juego"""
         try:
             # Le Mans Ultimate usa el mismo sistema que rFactor 2
-            self.shared_mem = mmap.mmap(-1, self.config.SHARED_MEMORY_SIZE, 
-                                       self.config.SHARED_MEMORY_NAME)
-            return True
+            self.shared_mem = open_shared_memory(self.config.SHARED_MEMORY_NAME,
+                                                 self.config.SHARED_MEMORY_SIZE,
+                                                 self.config.SHARED_MEMORY_DIR)
         except Exception as e:
             print(f"Error al conectar: {e}")
             return False
+        
+        self.layout = self.select_layout()
+        return True
+    
+    def select_layout(self) -> LayoutProfile:
+        """Elige el perfil de layout según Config.LAYOUT_PROFILE"""
+        load_profiles_file(self.config.CUSTOM_LAYOUTS_FILE)
+        config_profile = profile_from_config(self.config)
+        name = self.config.LAYOUT_PROFILE
+        
+        if name == "config":
+            return config_profile
+        if name != "auto":
+            return LAYOUT_PROFILES[name]
+        
+        # Detección automática: primero los offsets de config.py, luego el registro
+        candidates = [config_profile] + list(LAYOUT_PROFILES.values())
+        profile = detect_profile(lambda: self.shared_mem[:self.config.SHARED_MEMORY_SIZE],
+                                 candidates)
+        if profile is None:
+            print("Aviso: ningún perfil de memoria es coherente, usando offsets de config.py")
+            return config_profile
+        
+        print(f"Perfil de memoria detectado: {profile.name} ({profile.description})")
+        return profile
     
     def read_telemetry(self) -> Optional[TelemetryData]:
         """Lee los datos de telemetría actuales"""
@@ -48,49 +80,86 @@ class LeMansUltimateConnector:
             return None
         
         try:
-            self.shared_mem.seek(0)
-            data = TelemetryData()
-            
-            # Offsets para rFactor 2 / Le Mans Ultimate
-            # Estos son aproximados y pueden necesitar ajuste
-            self.shared_mem.seek(self.config.OFFSET_FUEL)
-            data.fuel = struct.unpack('f', self.shared_mem.read(4))[0]
-            
-            self.shared_mem.seek(self.config.OFFSET_MAX_FUEL)
-            data.max_fuel = struct.unpack('f', self.shared_mem.read(4))[0]
-            
-            self.shared_mem.seek(self.config.OFFSET_LAP)
-            data.lap = struct.unpack('i', self.shared_mem.read(4))[0]
-            
-            self.shared_mem.seek(self.config.OFFSET_TOTAL_LAPS)
-            data.total_laps = struct.unpack('i', self.shared_mem.read(4))[0]
-            
-            self.shared_mem.seek(self.config.OFFSET_SESSION_TIME)
-            data.session_time = struct.unpack('d', self.shared_mem.read(8))[0]
-            
-            self.shared_mem.seek(self.config.OFFSET_LAST_LAP_TIME)
-            data.last_lap_time = struct.unpack('f', self.shared_mem.read(4))[0]
-            
-            return data
+            # Todos los campos se decodifican con una sola llamada a unpack
+            return self.layout.decode(self.shared_mem)
         except Exception as e:
-            print(f"Error leyendo telemetría: {e}")
+            self._read_error(e)
             return None
     
+    def read_telemetry_into(self, frame: TelemetryFrame) -> bool:
+        """Como read_telemetry, pero rellena un TelemetryFrame existente"""
+        if not self.shared_mem:
+            return False
+        
+        try:
+            self.layout.decode_into(self.shared_mem, frame)
+            return True
+        except Exception as e:
+            self._read_error(e)
+            return False
+    
+    def _read_error(self, error: Exception):
+        """Se cuentan (ver instrumentation.py); solo se avisa del primero"""
+        self.read_errors += 1
+        self.last_error = str(error)
+        if self.read_errors == 1:
+            print(f"Error leyendo telemetría: {error}")
+    
+    def read_raw(self) -> bytes:
+        """Copia cruda del mapa de memoria compartida"""
+        return self.shared_mem[:self.config.SHARED_MEMORY_SIZE]
+    
+    def read_update_counter(self) -> Optional[int]:
+        """El layout por offsets no publica contador de actualización"""
+        return None
+    
     def disconnect(self):
         """Cierra la conexión"""
         if self.shared_mem:
             self.shared_mem.close()
 
 
+def create_connector(config: Config):
+    """Crea el conector según Config.CONNECTOR_MODE"""
+    if config.CONNECTOR_MODE == "ctypes":
+        return RF2DirectConnector()
+    if config.CONNECTOR_MODE == "simhub":
+        return SimHubConnector()
+    if config.CONNECTOR_MODE == "simhub_async":
+        return AsyncSimHubConnector()
+    if config.CONNECTOR_MODE == "hub":
+        return HubConnector()
+    return LeMansUltimateConnector()
+
+
 class FuelMonitor:
     """Monitor principal del programa"""
     
-    def __init__(self):
-        self.connector = LeMansUltimateConnector()
+    def __init__(self, connector=None, display=None):
+        self.config = Config()
+        self.advanced = AdvancedConfig()
+        self.connector = connector if connector is not None else create_connector(self.config)
         self.calculator = FuelCalculator()
-        self.display = Display()
+        # Frame reutilizable del modo de baja asignación (None = un objeto por lectura)
+        self.frame: Optional[TelemetryFrame] = None
+        if self.config.LOW_ALLOCATION_MODE:
+            self.enable_low_allocation()
+        self.display = display if display is not None else create_display(self.config)
+        self.scheduler = AdaptiveScheduler()
+        self.recorder: Optional[SessionRecorder] = None
+        self.last_dump_time = 0.0
+        self.cache: Optional[ConsumptionCache] = None
+        self.session_key = None  # (circuito, coche) cuando el conector los da
+        self.dashboard: Optional[DashboardServer] = None
+        self.session_log: Optional[SessionLog] = None
+        self.instrumentation: Optional[Instrumentation] = None
         self.running = False
         
+    def enable_low_allocation(self):
+        """Un frame reutilizable y el análisis rellenado en sitio (LOW_ALLOCATION_MODE)"""
+        self.frame = TelemetryFrame()
+        self.calculator.reuse_analysis = True
+        
     def start(self):
         """Inicia el monitor"""
         print("Iniciando Le Mans Ultimate Fuel Monitor...")
@@ -101,42 +170,179 @@ class FuelMonitor:
             return
         
         print("Conectado! Monitorizando combustible...")
+        # Solo se graban fuentes en vivo (nunca una reproducción)
+        if self.connector.REALTIME and \
+                (self.advanced.RECORD_SESSIONS or self.advanced.SAVE_MEMORY_DUMPS):
+            path = new_session_path(self.advanced.RECORDINGS_DIR)
+            self.recorder = SessionRecorder(path, self.advanced.RECORDING_CHUNK_FRAMES)
+            print(f"Grabando sesión en {path}")
+        
+        # Consumo de sesiones anteriores (solo fuentes en vivo)
+        if self.connector.REALTIME and self.advanced.CONSUMPTION_CACHE_ENABLED:
+            self.cache = ConsumptionCache(
+                self.advanced.CONSUMPTION_CACHE_PATH,
+                max_entries=self.advanced.CONSUMPTION_CACHE_MAX_ENTRIES,
+                max_age_days=self.advanced.CONSUMPTION_CACHE_MAX_AGE_DAYS,
+            ).load()
+        
+        # Log de sesión y CSV de vueltas (se escriben en un hilo aparte)
+        self.session_log = SessionLog.from_config(self.advanced)
+        if self.session_log is not None:
+            self.session_log.start()
+        
+        # Dashboard web: recibe lo mismo que la consola, sin frenar el bucle
+        if self.advanced.DASHBOARD_ENABLED:
+            self.dashboard = DashboardServer()
+            if self.dashboard.start():
+                # El frame y el análisis reutilizables no cruzan al hilo del servidor
+                self.display = DashboardDisplay(self.dashboard, self.display,
+                                                copy_frames=self.frame is not None)
+                print(f"Dashboard en http://{self.dashboard.host}:{self.dashboard.port}/")
+            else:
+                self.dashboard = None
+        
+        # Instrumentación: envuelve las etapas solo en modo debug
+        if self.advanced.DEBUG_MODE:
+            sink = self.session_log.event if self.session_log is not None else print
+            self.instrumentation = Instrumentation(
+                report_interval=self.advanced.DEBUG_REPORT_INTERVAL,
+                dump_path=self.advanced.DEBUG_DUMP_PATH,
+                show_raw=self.advanced.SHOW_RAW_MEMORY_VALUES,
+                sink=sink,
+            ).attach(self)
+            self.instrumentation.start()
+        
         self.running = True
-        self.run_loop()
+        # Las reproducciones se quedan en un solo hilo: marcan su propio ritmo.
+        # El frame reutilizable no puede cruzar hilos: baja asignación = un hilo
+        if self.connector.REALTIME and self.config.THREADED_PIPELINE and self.frame is None:
+            self.run_pipeline()
+        else:
+            self.run_loop()
+    
+    def run_pipeline(self):
+        """Bucle en hilos: lector, análisis y render (ver pipeline.py)"""
+        try:
+            MonitorPipeline(self).run()
+        except KeyboardInterrupt:
+            print("\nDeteniendo monitor...")
+        finally:
+            self.stop()
     
     def run_loop(self):
         """Bucle principal del programa"""
         try:
             while self.running:
-                telemetry = self.connector.read_telemetry()
+                self.tick()
                 
-                if telemetry and telemetry.lap > 0:
-                    # Actualizar calculadora con datos actuales
-                    self.calculator.update(
-                        current_fuel=telemetry.fuel,
-                        max_fuel=telemetry.max_fuel,
-                        current_lap=telemetry.lap,
-                        total_laps=telemetry.total_laps,
-                        last_lap_time=telemetry.last_lap_time
-                    )
-                    
-                    # Obtener análisis
-                    analysis = self.calculator.get_analysis()
-                    
-                    # Mostrar información
-                    self.display.update(telemetry, analysis)
+                # Las fuentes grabadas se agotan; marcan su propio ritmo
+                if getattr(self.connector, "finished", False):
+                    break
                 
-                time.sleep(0.1)  # Actualizar 10 veces por segundo
+                # Espera adaptativa: rápida cerca de meta, lenta en pausa/menús
+                if self.connector.REALTIME:
+                    time.sleep(self.scheduler.next_interval())
                 
         except KeyboardInterrupt:
             print("\nDeteniendo monitor...")
         finally:
             self.stop()
     
+    def tick(self):
+        """Un sondeo: lee, procesa si hay frame nuevo y dibuja lo pendiente"""
+        # Solo se procesa cuando el juego ha publicado un frame nuevo
+        counter = self.connector.read_update_counter()
+        if self.scheduler.is_new_frame(counter):
+            telemetry = self.read_frame()
+            
+            if self.scheduler.observe(telemetry):
+                if self.recorder:
+                    self.record(telemetry)
+                if telemetry.lap > 0:
+                    self.process(telemetry)
+        
+        # Dibujar el frame retenido por el límite de FPS, si lo hay
+        self.display.flush()
+    
+    def read_frame(self):
+        """Frame actual: en modo de baja asignación, el mismo objeto rellenado"""
+        if self.frame is None or not hasattr(self.connector, "read_telemetry_into"):
+            return self.connector.read_telemetry()
+        return self.frame if self.connector.read_telemetry_into(self.frame) else None
+    
+    def process(self, telemetry: TelemetryData):
+        """Actualiza cálculos y display con un frame nuevo"""
+        self.display.update(telemetry, self.analyze(telemetry))
+    
+    def analyze(self, telemetry: TelemetryData):
+        """Actualiza la calculadora con un frame nuevo y devuelve el análisis"""
+        if self.session_key is None and telemetry.track_name and telemetry.vehicle_name:
+            self.identify_session(telemetry)
+        
+        # Actualizar calculadora con datos actuales
+        self.calculator.update(
+            current_fuel=telemetry.fuel,
+            max_fuel=telemetry.max_fuel,
+            current_lap=telemetry.lap,
+            total_laps=telemetry.total_laps,
+            last_lap_time=telemetry.last_lap_time,
+            lap_dist=telemetry.lap_dist,
+            track_length=telemetry.track_length,
+            in_pits=telemetry.in_pits
+        )
+        
+        # Obtener análisis
+        analysis = self.calculator.get_analysis()
+        if self.session_log is not None:
+            self.session_log.observe(telemetry, analysis, self.calculator.last_lap_consumption,
+                                     self.calculator.last_lap_class)
+        return analysis
+    
+    def identify_session(self, telemetry: TelemetryData):
+        """Circuito y coche conocidos: consumo de referencia y metadatos"""
+        self.session_key = (telemetry.track_name, telemetry.vehicle_name)
+        if self.cache is not None:
+            stats = self.cache.get(*self.session_key)
+            if stats is not None:
+                self.calculator.set_prior(stats.mean, self.advanced.PRIOR_WEIGHT_LAPS)
+        if self.session_log is not None:
+            self.session_log.event(f"Circuito: {telemetry.track_name} | Coche: {telemetry.vehicle_name}")
+        if self.recorder:
+            self.recorder.set_metadata(track=telemetry.track_name,
+                                       vehicle=telemetry.vehicle_name)
+    
+    def record(self, telemetry: TelemetryData):
+        """Graba el frame y, si toca, un dump crudo de la memoria"""
+        if self.advanced.RECORD_SESSIONS:
+            self.recorder.record(telemetry)
+        if self.advanced.SAVE_MEMORY_DUMPS:
+            now = time.monotonic()
+            if now - self.last_dump_time >= self.advanced.MEMORY_DUMP_INTERVAL:
+                self.recorder.snapshot(self.connector.read_raw())
+                self.last_dump_time = now
+    
     def stop(self):
         """Detiene el monitor"""
         self.running = False
+        if self.instrumentation is not None:
+            report = self.instrumentation.stop()
+            self.instrumentation = None
+            print(report)
         self.connector.disconnect()
+        if self.cache is not None and self.session_key is not None:
+            # Solo vueltas limpias; se guarda en segundo plano aunque el programa salga
+            self.cache.store(*self.session_key, self.calculator.clean_stats)
+            self.cache.save_async()
+            self.cache = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        if self.session_log is not None:
+            self.session_log.close()
+            self.session_log = None
+        if self.dashboard is not None:
+            self.dashboard.stop()
+            self.dashboard = None
         print("Monitor detenido")
 
 
@@ -0,0 +1,319 @@
+"""
+Hub de telemetría: una sola lectura del juego para varios consumidores
+
+El hub lee el juego una vez (con el conector de CONNECTOR_MODE), calcula el
+análisis y publica cada frame con su FuelAnalysis en un buffer circular de
+memoria compartida propio ("$LMUFuelHub$"). Cualquier número de procesos
+locales (consola, logger, overlay, dashboard) se conecta en solo lectura con
+HubConnector sin hacer lecturas extra del juego.
+
+Formato (little-endian):
+
+    Cabecera (64 bytes): magic, versión, nº de huecos, tamaño de hueco,
+                         secuencia del último frame publicado
+    Huecos: [secuencia inicio][frame][secuencia fin]
+
+Cada hueco usa el mismo protocolo que rF2 (mVersionUpdateBegin/End): el
+escritor pone la secuencia de inicio, escribe el frame y pone la de fin; el
+lector lee fin, frame e inicio y el frame es íntegro si coinciden.
+
+Uso:
+    python hub.py            # publica (lee el juego)
+    python hub.py --view     # consola alimentada por el hub
+"""
+
+import argparse
+import struct
+import time
+from typing import Iterator, Optional, Tuple
+from config import Config
+from calculator import FuelAnalysis
+from display import Display, NullDisplay, create_display
+from telemetry import TelemetryData
+from shmem import open_shared_memory
+
+HUB_MAGIC = b"LMUHUB01"
+HUB_VERSION = 2  # 2: in_pits en el frame
+
+HEADER = struct.Struct("<8sHHIQ40x")  # 64 bytes
+SEQ = struct.Struct("<Q")
+
+# Offset en la cabecera de la secuencia del último frame publicado (el Q de HEADER)
+LAST_SEQ_OFFSET = struct.calcsize("<8sHHI")
+
+STATUS_CODES = ("OK", "WARNING", "CRITICAL")
+
+# Frame: telemetría + análisis (has_analysis = 0 si solo hay telemetría)
+FRAME = struct.Struct(
+    "<d"          # wall_time
+    "6d"          # fuel, max_fuel, session_time, last_lap_time, lap_dist, track_length
+    "2i"          # lap, total_laps
+    "64s64s"      # track_name, vehicle_name
+    "7d"          # avg_consumption, fuel_needed, fuel_balance, laps_possible,
+                  # fuel_to_save_per_lap, next_pit_fuel, projected_consumption
+    "3i"          # laps_remaining, pit_stops, next_pit_lap
+    "BBB5x"       # has_analysis, status, in_pits
+    "128s"        # message
+)
+SLOT_SIZE = SEQ.size + FRAME.size + SEQ.size
+
+
+def hub_size(slots: int) -> int:
+    return HEADER.size + slots * SLOT_SIZE
+
+
+def _text(raw: bytes) -> str:
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+class HubPublisher:
+    """Escritor del buffer circular del hub (un solo proceso)"""
+
+    def __init__(self, slots: Optional[int] = None):
+        self.config = Config()
+        self.slots = slots if slots is not None else self.config.HUB_SLOTS
+        self.mem = None
+        self.seq = 0
+
+    def open(self):
+        self.mem = open_shared_memory(self.config.HUB_MEMORY_NAME, hub_size(self.slots),
+                                      self.config.SHARED_MEMORY_DIR, create=True)
+        # La secuencia sigue desde la anterior ejecución para que los lectores
+        # conectados no confundan frames nuevos con viejos
+        magic, version, slots, slot_size, last_seq = HEADER.unpack_from(self.mem, 0)
+        if magic == HUB_MAGIC and slots == self.slots and slot_size == SLOT_SIZE:
+            self.seq = last_seq
+        HEADER.pack_into(self.mem, 0, HUB_MAGIC, HUB_VERSION, self.slots, SLOT_SIZE, self.seq)
+
+    def publish(self, telemetry: TelemetryData, analysis: Optional[FuelAnalysis] = None,
+                wall_time: Optional[float] = None):
+        """Publica un frame en el siguiente hueco"""
+        self.seq += 1
+        seq = self.seq
+        offset = HEADER.size + (seq % self.slots) * SLOT_SIZE
+        mem = self.mem
+
+        if analysis is None:
+            analysis = FuelAnalysis()
+            has_analysis = 0
+        else:
+            has_analysis = 1
+        status = STATUS_CODES.index(analysis.status) if analysis.status in STATUS_CODES else 0
+
+        SEQ.pack_into(mem, offset, seq)  # Inicio: el hueco está en escritura
+        FRAME.pack_into(
+            mem, offset + SEQ.size,
+            time.time() if wall_time is None else wall_time,
+            telemetry.fuel, telemetry.max_fuel, telemetry.session_time,
+            telemetry.last_lap_time, telemetry.lap_dist, telemetry.track_length,
+            telemetry.lap, telemetry.total_laps,
+            telemetry.track_name.encode("utf-8")[:64], telemetry.vehicle_name.encode("utf-8")[:64],
+            analysis.avg_consumption, analysis.fuel_needed, analysis.fuel_balance,
+            analysis.laps_possible, analysis.fuel_to_save_per_lap, analysis.next_pit_fuel,
+            analysis.projected_consumption,
+            analysis.laps_remaining, analysis.pit_stops, analysis.next_pit_lap,
+            has_analysis, status, telemetry.in_pits,
+            analysis.message.encode("utf-8")[:128],
+        )
+        SEQ.pack_into(mem, offset + SEQ.size + FRAME.size, seq)  # Fin: hueco íntegro
+        # La cabecera se actualiza al final: los lectores nunca ven un hueco a medias
+        SEQ.pack_into(mem, LAST_SEQ_OFFSET, seq)
+
+    def close(self):
+        if self.mem is not None:
+            self.mem.close()
+            self.mem = None
+
+
+class HubDisplay(Display):
+    """Display que publica cada frame analizado en el hub (y opcionalmente lo dibuja)"""
+
+    def __init__(self, publisher: HubPublisher, display: Optional[Display] = None):
+        super().__init__()
+        self.publisher = publisher
+        self.display = display if display is not None else NullDisplay()
+
+    def update(self, telemetry, analysis):
+        self.publisher.publish(telemetry, analysis)
+        self.display.update(telemetry, analysis)
+
+    def flush(self):
+        self.display.flush()
+
+
+class HubConnector:
+    """Conector de solo lectura sobre el hub (misma interfaz que los demás conectores)"""
+
+    REALTIME = True
+
+    def __init__(self):
+        self.config = Config()
+        self.mem = None
+        self.slots = 0
+        self.torn_frames = 0
+        self.last_analysis: Optional[FuelAnalysis] = None
+
+    def connect(self) -> bool:
+        """Se conecta si hay un hub publicando"""
+        try:
+            # Primero solo la cabecera, para saber el tamaño real
+            probe = open_shared_memory(self.config.HUB_MEMORY_NAME, HEADER.size,
+                                       self.config.SHARED_MEMORY_DIR, readonly=True)
+        except (FileNotFoundError, OSError):
+            return False
+        magic, version, slots, slot_size, _ = HEADER.unpack_from(probe, 0)
+        probe.close()
+        if magic != HUB_MAGIC or version != HUB_VERSION or slot_size != SLOT_SIZE:
+            return False
+        try:
+            self.mem = open_shared_memory(self.config.HUB_MEMORY_NAME, hub_size(slots),
+                                          self.config.SHARED_MEMORY_DIR, readonly=True)
+        except (FileNotFoundError, OSError):
+            return False
+        self.slots = slots
+        return True
+
+    def latest_seq(self) -> int:
+        return SEQ.unpack_from(self.mem, LAST_SEQ_OFFSET)[0]
+
+    def read_slot(self, seq: int) -> Optional[Tuple[float, TelemetryData, Optional[FuelAnalysis]]]:
+        """Frame con secuencia `seq` (None si ya se sobrescribió o está a medias)"""
+        offset = HEADER.size + (seq % self.slots) * SLOT_SIZE
+        mem = self.mem
+        if SEQ.unpack_from(mem, offset + SEQ.size + FRAME.size)[0] != seq:
+            return None
+        values = FRAME.unpack_from(mem, offset + SEQ.size)
+        if SEQ.unpack_from(mem, offset)[0] != seq:
+            self.torn_frames += 1
+            return None
+
+        (wall_time, fuel, max_fuel, session_time, last_lap_time, lap_dist, track_length,
+         lap, total_laps, track_name, vehicle_name,
+         avg_consumption, fuel_needed, fuel_balance, laps_possible, fuel_to_save_per_lap,
+         next_pit_fuel, projected_consumption, laps_remaining, pit_stops, next_pit_lap,
+         has_analysis, status, in_pits, message) = values
+
+        telemetry = TelemetryData(
+            fuel=fuel, max_fuel=max_fuel, lap=lap, total_laps=total_laps,
+            session_time=session_time, last_lap_time=last_lap_time,
+            lap_dist=lap_dist, track_length=track_length, in_pits=bool(in_pits),
+            track_name=_text(track_name), vehicle_name=_text(vehicle_name),
+        )
+        analysis = None
+        if has_analysis:
+            analysis = FuelAnalysis(
+                avg_consumption=avg_consumption, fuel_needed=fuel_needed,
+                fuel_balance=fuel_balance, laps_remaining=laps_remaining,
+                laps_possible=laps_possible, fuel_to_save_per_lap=fuel_to_save_per_lap,
+                status=STATUS_CODES[status] if status < len(STATUS_CODES) else "OK",
+                message=_text(message), pit_stops=pit_stops, next_pit_lap=next_pit_lap,
+                next_pit_fuel=next_pit_fuel, projected_consumption=projected_consumption,
+            )
+        return wall_time, telemetry, analysis
+
+    def read_frames(self, after_seq: int) -> Iterator[Tuple[int, TelemetryData, Optional[FuelAnalysis]]]:
+        """
+        Frames publicados después de `after_seq`, en orden
+
+        Para consumidores que no quieren perder frames (loggers): los que ya
+        salieron del buffer circular se saltan.
+        """
+        latest = self.latest_seq()
+        first = max(after_seq + 1, latest - self.slots + 1)
+        for seq in range(first, latest + 1):
+            frame = self.read_slot(seq)
+            if frame is not None:
+                yield seq, frame[1], frame[2]
+
+    def read_telemetry(self) -> Optional[TelemetryData]:
+        """Último frame publicado"""
+        if self.mem is None:
+            return None
+        for _ in range(self.config.TORN_READ_RETRIES + 1):
+            seq = self.latest_seq()
+            if seq == 0:
+                return None
+            frame = self.read_slot(seq)
+            if frame is not None:
+                self.last_analysis = frame[2]
+                return frame[1]
+        return None
+
+    def read_analysis(self) -> Optional[FuelAnalysis]:
+        """Análisis del hub que acompañaba al último frame leído"""
+        return self.last_analysis
+
+    def read_raw(self) -> bytes:
+        return self.mem[:]
+
+    def read_update_counter(self) -> Optional[int]:
+        """Secuencia del último frame: cambia con cada publicación"""
+        if self.mem is None:
+            return None
+        return self.latest_seq()
+
+    def disconnect(self):
+        if self.mem is not None:
+            self.mem.close()
+            self.mem = None
+
+
+def run_hub(show: bool = False):
+    """Lee el juego y publica en el hub"""
+    from fuel_monitor import FuelMonitor
+
+    config = Config()
+    if config.CONNECTOR_MODE == "hub":
+        print("El hub no puede leer de sí mismo: elige otro CONNECTOR_MODE")
+        return
+    publisher = HubPublisher()
+    publisher.open()
+    display = HubDisplay(publisher, create_display(config) if show else None)
+    monitor = FuelMonitor(display=display)
+    # Cada frame analizado se publica: sin hilo de render limitado en FPS
+    monitor.config.THREADED_PIPELINE = False
+    print(f"Hub publicando en {config.HUB_MEMORY_NAME} ({publisher.slots} huecos)")
+    try:
+        monitor.start()
+    finally:
+        publisher.close()
+
+
+def view_hub():
+    """Consola alimentada por el hub, sin leer el juego"""
+    connector = HubConnector()
+    while not connector.connect():
+        print("Esperando al hub... (Reintentando en 3s)")
+        time.sleep(3)
+    display = create_display(connector.config)
+    last_seq = 0
+    try:
+        while True:
+            seq = connector.read_update_counter()
+            if seq != last_seq:
+                telemetry = connector.read_telemetry()
+                analysis = connector.read_analysis()
+                if telemetry is not None and analysis is not None:
+                    display.update(telemetry, analysis)
+                last_seq = seq
+            display.flush()
+            time.sleep(connector.config.DISPLAY_UPDATE_RATE)
+    except KeyboardInterrupt:
+        print("\nVisor detenido")
+    finally:
+        connector.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub de telemetría compartida")
+    parser.add_argument("--view", action="store_true", help="Consola alimentada por el hub")
+    parser.add_argument("--show", action="store_true", help="El hub también dibuja la consola")
+    args = parser.parse_args()
+    if args.view:
+        view_hub()
+    else:
+        run_hub(show=args.show)
+
+
+if __name__ == "__main__":
+    main()
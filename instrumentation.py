@@ -0,0 +1,314 @@
+"""
+Instrumentación del bucle del monitor (DEBUG_MODE)
+
+Mide, sin tocar el código del bucle, las etapas de cada tick:
+
+    read      conector.read_telemetry (lectura de memoria compartida)
+    update    FuelCalculator.update
+    analysis  FuelCalculator.get_analysis
+    display   Display.update
+
+Cada etapa tiene un histograma de latencias log-lineal al estilo HDR
+(enteros en nanosegundos, error relativo ~3%, memoria fija). Además se
+cuentan lecturas vacías, frames a medio escribir y perdidos, y errores de
+lectura, y se mide el jitter del sondeo (cuánto se pasa cada espera del
+intervalo pedido al planificador).
+
+Se activa envolviendo los métodos de las instancias al arrancar; con
+DEBUG_MODE = False no se envuelve nada y el coste es cero. Cada
+DEBUG_REPORT_INTERVAL segundos se escribe un JSON (DEBUG_DUMP_PATH) y un
+resumen de una línea; al parar, el resumen completo.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional
+from layouts import FIELDS
+
+STAGES = ("read", "update", "analysis", "display")
+
+# Contadores que publican los conectores (el asíncrono de SimHub usa "errors")
+CONNECTOR_COUNTERS = {
+    "torn_frames": ("torn_frames",),
+    "dropped_frames": ("dropped_frames",),
+    "read_errors": ("read_errors", "errors"),
+}
+
+
+class LatencyHistogram:
+    """
+    Histograma log-lineal de enteros (nanosegundos)
+
+    Los valores menores que 2^precision van en cubos de ancho 1; a partir de
+    ahí cada potencia de dos se divide en 2^(precision-1) cubos, así que el
+    error relativo es como mucho 2^-(precision-1).
+    """
+
+    def __init__(self, precision: int = 5, max_bits: int = 40):
+        self.precision = precision
+        self.linear = 1 << precision
+        self.half = self.linear >> 1
+        self.size = self.linear + (max_bits - precision) * self.half
+        self.counts = [0] * self.size
+        self.count = 0
+        self.total = 0
+        self.minimum = 0
+        self.maximum = 0
+
+    def index(self, value: int) -> int:
+        if value < self.linear:
+            return value if value > 0 else 0
+        shift = value.bit_length() - self.precision
+        index = self.linear + (shift - 1) * self.half + (value >> shift) - self.half
+        return index if index < self.size else self.size - 1
+
+    def bucket_value(self, index: int) -> int:
+        """Valor representativo (punto medio) de un cubo"""
+        if index < self.linear:
+            return index
+        k = index - self.linear
+        shift = k // self.half + 1
+        mantissa = self.half + k % self.half
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, value: int):
+        self.counts[self.index(value)] += 1
+        if self.count == 0 or value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> int:
+        """Valor del percentil q (0-100)"""
+        if self.count == 0:
+            return 0
+        target = max(1, int(q / 100.0 * self.count + 0.999999))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucket_value(index), self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict:
+        """Resumen en microsegundos"""
+        return {
+            "count": self.count,
+            "mean_us": self.mean / 1000.0,
+            "min_us": self.minimum / 1000.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p90_us": self.percentile(90) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "p999_us": self.percentile(99.9) / 1000.0,
+            "max_us": self.maximum / 1000.0,
+        }
+
+    def buckets(self) -> Dict[int, int]:
+        """Cubos no vacíos {valor representativo en ns: frecuencia}"""
+        return {self.bucket_value(i): c for i, c in enumerate(self.counts) if c}
+
+
+class Instrumentation:
+    """Histogramas por etapa, contadores y jitter de un FuelMonitor"""
+
+    def __init__(self, report_interval: float = 10.0, dump_path: Optional[str] = None,
+                 show_raw: bool = False, sink: Optional[Callable[[str], None]] = None):
+        self.stages: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in STAGES}
+        self.jitter = LatencyHistogram()
+        self.counters: Dict[str, int] = {"ticks": 0, "empty_reads": 0}
+        self.report_interval = report_interval
+        self.dump_path = dump_path
+        self.show_raw = show_raw
+        self.sink = sink or print
+        self.connector = None
+        self.started = time.monotonic()
+
+        self._sleep_start = 0
+        self._sleep_interval = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Envoltorios ---
+
+    def _timed(self, stage: str, func: Callable) -> Callable:
+        perf = time.perf_counter_ns
+        record = self.stages[stage].record
+
+        def wrapper(*args, **kwargs):
+            start = perf()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(perf() - start)
+        return wrapper
+
+    def _timed_read(self, func: Callable) -> Callable:
+        perf = time.perf_counter_ns
+        record = self.stages["read"].record
+        counters = self.counters
+
+        def read_telemetry(*args):
+            start = perf()
+            result = func(*args)
+            record(perf() - start)
+            if not result:  # None, o False en read_telemetry_into
+                counters["empty_reads"] += 1
+            return result
+        return read_telemetry
+
+    def _tick(self, func: Callable) -> Callable:
+        """Cada sondeo empieza con read_update_counter: mide lo que se pasó la espera"""
+        perf = time.perf_counter_ns
+        record = self.jitter.record
+        counters = self.counters
+
+        def read_update_counter():
+            now = perf()
+            if self._sleep_start:
+                late = now - self._sleep_start - self._sleep_interval
+                record(late if late > 0 else 0)
+                self._sleep_start = 0
+            counters["ticks"] += 1
+            return func()
+        return read_update_counter
+
+    def _interval(self, func: Callable) -> Callable:
+        perf = time.perf_counter_ns
+
+        def next_interval():
+            interval = func()
+            self._sleep_interval = int(interval * 1e9)
+            self._sleep_start = perf()
+            return interval
+        return next_interval
+
+    def attach(self, monitor) -> "Instrumentation":
+        """Envuelve los métodos de las instancias del monitor (conector, calculadora...)"""
+        connector = monitor.connector
+        self.connector = connector
+        connector.read_telemetry = self._timed_read(connector.read_telemetry)
+        if hasattr(connector, "read_telemetry_into"):
+            connector.read_telemetry_into = self._timed_read(connector.read_telemetry_into)
+        connector.read_update_counter = self._tick(connector.read_update_counter)
+        monitor.scheduler.next_interval = self._interval(monitor.scheduler.next_interval)
+        monitor.calculator.update = self._timed("update", monitor.calculator.update)
+        monitor.calculator.get_analysis = self._timed("analysis", monitor.calculator.get_analysis)
+        monitor.display.update = self._timed("display", monitor.display.update)
+        return self
+
+    # --- Informes ---
+
+    def connector_counters(self) -> Dict[str, int]:
+        result = {}
+        for name, attributes in CONNECTOR_COUNTERS.items():
+            for attribute in attributes:
+                if hasattr(self.connector, attribute):
+                    result[name] = getattr(self.connector, attribute)
+                    break
+            else:
+                result[name] = 0
+        return result
+
+    def raw_values(self) -> Dict[str, str]:
+        """Bytes crudos de cada campo del perfil de offsets (o el inicio del mapa)"""
+        connector = self.connector
+        try:
+            raw = connector.read_raw()
+        except Exception as e:  # Diagnóstico: nunca debe tumbar el monitor
+            return {"error": str(e)}
+        layout = getattr(connector, "layout", None)
+        if layout is None:
+            return {"head": bytes(raw[:64]).hex(" ")}
+        result = {}
+        for field in FIELDS:
+            if field not in layout.offsets:
+                continue
+            offset = layout.offsets[field]
+            size = struct.calcsize("=" + layout.types[field])
+            result[field] = f"@{offset}: {bytes(raw[offset:offset + size]).hex(' ')}"
+        return result
+
+    def snapshot(self) -> dict:
+        """Estado completo, serializable a JSON"""
+        data = {
+            "timestamp": time.time(),
+            "uptime_s": time.monotonic() - self.started,
+            "counters": {**self.counters, **self.connector_counters()},
+            "stages": {name: h.summary() for name, h in self.stages.items()},
+            "jitter": self.jitter.summary(),
+            "histograms_ns": {name: h.buckets() for name, h in self.stages.items()},
+        }
+        data["histograms_ns"]["jitter"] = self.jitter.buckets()
+        if self.show_raw and self.connector is not None:
+            data["raw"] = self.raw_values()
+        return data
+
+    def summary_line(self, data: Optional[dict] = None) -> str:
+        """Resumen de una línea: p50/p99 por etapa, contadores y jitter"""
+        data = data or self.snapshot()
+        parts = [f"{name} {s['p50_us']:.0f}/{s['p99_us']:.0f}µs"
+                 for name, s in data["stages"].items() if s["count"]]
+        counters = data["counters"]
+        parts.append(f"torn {counters['torn_frames']} perdidos {counters['dropped_frames']} "
+                     f"errores {counters['read_errors']} vacías {counters['empty_reads']}")
+        parts.append(f"jitter p99 {data['jitter']['p99_us'] / 1000.0:.1f}ms")
+        return "[debug] " + " | ".join(parts)
+
+    def format_report(self, data: Optional[dict] = None) -> str:
+        """Informe completo en texto"""
+        data = data or self.snapshot()
+        lines = ["Instrumentación (µs)          n       p50       p90       p99     p99.9       max"]
+        for name, s in list(data["stages"].items()) + [("jitter", data["jitter"])]:
+            lines.append(f"  {name:20s} {s['count']:9d} {s['p50_us']:9.1f} {s['p90_us']:9.1f} "
+                         f"{s['p99_us']:9.1f} {s['p999_us']:9.1f} {s['max_us']:9.1f}")
+        lines.append("  " + ", ".join(f"{k}={v}" for k, v in data["counters"].items()))
+        for field, value in data.get("raw", {}).items():
+            lines.append(f"  raw {field}: {value}")
+        return "\n".join(lines)
+
+    def dump(self, data: Optional[dict] = None):
+        """Escribe el JSON de forma atómica"""
+        if not self.dump_path:
+            return
+        data = data or self.snapshot()
+        tmp_path = f"{self.dump_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.dump_path)
+
+    def start(self):
+        """Informe periódico en un hilo aparte"""
+        self._thread = threading.Thread(target=self._report_loop, name="instrumentation",
+                                        daemon=True)
+        self._thread.start()
+
+    def _report_loop(self):
+        while not self._stop.wait(self.report_interval):
+            data = self.snapshot()
+            try:
+                self.dump(data)
+            except OSError:
+                pass
+            self.sink(self.summary_line(data))
+
+    def stop(self) -> str:
+        """Detiene el informe periódico, escribe el JSON final y devuelve el informe"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        data = self.snapshot()
+        try:
+            self.dump(data)
+        except OSError as e:
+            print(f"Aviso: no se pudo guardar la instrumentación: {e}")
+        return self.format_report(data)
@@ -0,0 +1,188 @@
+"""
+Modelo de consumo por distancia recorrida en la vuelta
+
+Divide la vuelta en tramos de igual longitud (arrays preasignados) y reparte
+el combustible gastado entre lecturas según la distancia (mLapDist del
+Scoring de rF2). Con lo recorrido de la vuelta en curso proyecta el consumo
+de la vuelta completa en cualquier punto del circuito:
+
+- Sin perfil aprendido, extrapola de forma uniforme (litros por metro).
+- Con perfil, escala el consumo esperado de la vuelta por la relación entre
+  lo gastado y lo esperado en los tramos ya recorridos, así que un cambio de
+  mezcla se ve en el mismo sector en que ocurre.
+
+El perfil de cada tramo se aprende (EWMA) al cerrar cada vuelta, también
+con vueltas parciales como la de salida de boxes.
+"""
+
+from array import array
+from typing import Optional
+
+
+class LapDistanceFuelModel:
+    """Combustible gastado por tramo de vuelta y proyección de la vuelta en curso"""
+
+    def __init__(self, bins: int = 100, alpha: float = 0.3, min_coverage: float = 0.1,
+                 refuel_threshold: float = 1.0):
+        self.bins = bins
+        self.alpha = alpha
+        self.min_coverage = min_coverage  # Fracción de vuelta mínima para proyectar
+        self.refuel_threshold = refuel_threshold
+
+        zeros = bytes(8 * bins)
+        self._zeros = array("d", zeros)
+
+        # Perfil aprendido: litros gastados en cada tramo (EWMA entre vueltas)
+        self.profile = array("d", zeros)
+        self.learned = bytearray(bins)
+        self.learned_count = 0
+        # Consumo esperado por tramo (perfil, o la media donde aún no hay datos)
+        self.template = array("d", zeros)
+        self.template_total = 0.0
+
+        # Vuelta en curso
+        self.lap_burn = array("d", zeros)  # Litros gastados en cada tramo
+        self.lap_cover = array("d", zeros)  # Fracción recorrida de cada tramo
+        self.observed = 0.0  # Litros gastados en lo recorrido
+        self.expected = 0.0  # Litros esperados según el perfil en lo recorrido
+        self.covered = 0.0  # Fracción de vuelta recorrida
+
+        self.last_lap: Optional[int] = None
+        self.last_position = 0.0
+        self.last_fuel: Optional[float] = None
+        self.laps_learned = 0
+        # Proyección al cerrar la vuelta anterior (se usa al principio de la nueva)
+        self.previous_projection: Optional[float] = None
+
+    def reset_lap(self):
+        """Descarta lo acumulado en la vuelta en curso (sin asignar memoria)"""
+        self.lap_burn[:] = self._zeros
+        self.lap_cover[:] = self._zeros
+        self.observed = 0.0
+        self.expected = 0.0
+        self.covered = 0.0
+
+    def update(self, lap: int, position: float, fuel: float):
+        """
+        Añade una lectura
+
+        position es la fracción de vuelta recorrida (mLapDist / longitud).
+        """
+        position = min(max(position, 0.0), 1.0)
+        last_fuel = self.last_fuel
+        last_position = self.last_position
+
+        if last_fuel is None:
+            pass
+        elif fuel > last_fuel + self.refuel_threshold:
+            # Repostaje: lo acumulado de esta vuelta ya no es comparable
+            self.reset_lap()
+        elif lap == self.last_lap and position >= last_position:
+            self._accumulate(last_position, position, last_fuel - fuel)
+        elif lap == self.last_lap + 1 and position < last_position:
+            # Cruce de meta: el gasto se reparte a ambos lados de la línea
+            burn = last_fuel - fuel
+            span = (1.0 - last_position) + position
+            before = burn * (1.0 - last_position) / span if span > 0 else burn
+            self._accumulate(last_position, 1.0, before)
+            self.finish_lap()
+            self._accumulate(0.0, position, burn - before)
+        else:
+            # Salto de vuelta, vuelta al garaje o retroceso: no se puede repartir
+            self.reset_lap()
+
+        self.last_lap = lap
+        self.last_position = position
+        self.last_fuel = fuel
+
+    def _accumulate(self, start: float, end: float, burn: float):
+        """Reparte `burn` litros entre los tramos de [start, end] según la distancia"""
+        if burn <= 0:
+            return
+        self.observed += burn
+        bins = self.bins
+        if end <= start:
+            # Parado (por ejemplo, al ralentí): se apunta al tramo actual
+            self.lap_burn[min(int(start * bins), bins - 1)] += burn
+            return
+
+        per_distance = burn / (end - start)
+        first = min(int(start * bins), bins - 1)
+        last = min(int(end * bins), bins - 1)
+        lap_burn = self.lap_burn
+        lap_cover = self.lap_cover
+        template = self.template
+        for b in range(first, last + 1):
+            overlap = min(end, (b + 1) / bins) - max(start, b / bins)
+            if overlap <= 0:
+                continue
+            lap_burn[b] += per_distance * overlap
+            fraction = overlap * bins
+            lap_cover[b] += fraction
+            self.expected += template[b] * fraction
+            self.covered += overlap
+
+    def finish_lap(self):
+        """Aprende los tramos recorridos por completo y empieza una vuelta nueva"""
+        projection = self.projected_consumption()
+        if projection is not None:
+            self.previous_projection = projection
+        alpha = self.alpha
+        learned_any = False
+        for b in range(self.bins):
+            if self.lap_cover[b] < 0.999:
+                continue
+            burn = self.lap_burn[b]
+            if self.learned[b]:
+                self.profile[b] += alpha * (burn - self.profile[b])
+            else:
+                self.profile[b] = burn
+                self.learned[b] = 1
+                self.learned_count += 1
+            learned_any = True
+        if learned_any:
+            self.laps_learned += 1
+            self._rebuild_template()
+        self.reset_lap()
+
+    def _rebuild_template(self):
+        """Consumo esperado por tramo; los tramos sin datos usan la media"""
+        learned_total = sum(p for p, seen in zip(self.profile, self.learned) if seen)
+        mean = learned_total / self.learned_count
+        for b in range(self.bins):
+            self.template[b] = self.profile[b] if self.learned[b] else mean
+        self.template_total = learned_total + mean * (self.bins - self.learned_count)
+
+    def projected_consumption(self) -> Optional[float]:
+        """
+        Consumo proyectado de la vuelta en curso
+
+        Hasta recorrer min_coverage de la vuelta devuelve la proyección con que
+        terminó la anterior (None si no la hay).
+        """
+        if self.covered < self.min_coverage or self.observed <= 0:
+            return self.previous_projection
+        if self.learned_count == 0 or self.expected <= 0:
+            # Sin perfil: mismo gasto por metro en toda la vuelta
+            return self.observed / self.covered
+        return self.observed / self.expected * self.template_total
+
+    def remaining_consumption(self, lap_consumption: float) -> float:
+        """
+        Litros que faltan hasta la línea si la vuelta gasta `lap_consumption`
+
+        Reparte el consumo de la vuelta según el perfil aprendido (de forma
+        uniforme sin perfil) y cuenta los tramos por delante de la posición.
+        """
+        position = self.last_position
+        if self.learned_count == 0 or self.template_total <= 0:
+            return lap_consumption * (1.0 - position)
+        bins = self.bins
+        b = min(int(position * bins), bins - 1)
+        ahead = self.template[b] * (b + 1 - position * bins) + sum(self.template[b + 1:])
+        return lap_consumption * ahead / self.template_total
+
+    @property
+    def learned_lap_consumption(self) -> float:
+        """Consumo de una vuelta según el perfil aprendido (0 si no hay)"""
+        return self.template_total
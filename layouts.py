@@ -0,0 +1,265 @@
+"""
+Perfiles de layout de la memoria compartida para el conector por offsets
+
+Cada perfil se compila una sola vez en un struct.Struct que decodifica todos
+los campos de un frame en una única llamada. Al conectar se elige el perfil
+comprobando los candidatos contra reglas de coherencia de los datos.
+"""
+
+import json
+import math
+import os
+import struct
+import time
+from typing import Callable, Dict, List, Optional
+from config import Config
+from telemetry import TelemetryData
+
+# Campos de TelemetryData que decodifica un perfil
+FIELDS = ("fuel", "max_fuel", "lap", "total_laps", "session_time", "last_lap_time")
+
+# Tipo struct por defecto de cada campo
+FIELD_TYPES = {
+    "fuel": "f",
+    "max_fuel": "f",
+    "lap": "i",
+    "total_laps": "i",
+    "session_time": "d",
+    "last_lap_time": "f",
+}
+
+# Valor de los campos que un perfil no incluye (solo "fuel" es obligatorio)
+FIELD_DEFAULTS = {
+    "fuel": 0.0,
+    "max_fuel": Config.DEFAULT_MAX_FUEL,
+    "lap": 0,
+    "total_laps": 0,
+    "session_time": 0.0,
+    "last_lap_time": 0.0,
+}
+
+# Límites de las reglas de coherencia
+MAX_PLAUSIBLE_FUEL = 500.0  # Litros
+MAX_PLAUSIBLE_LAPS = 10000
+MAX_PLAUSIBLE_SESSION_TIME = 7 * 24 * 3600.0  # Segundos
+MAX_PLAUSIBLE_LAP_TIME = 3600.0  # Segundos
+
+
+class LayoutProfile:
+    """Perfil de offsets compilado en un único struct.Struct"""
+
+    def __init__(self, name: str, offsets: Dict[str, int],
+                 types: Optional[Dict[str, str]] = None, description: str = ""):
+        self.name = name
+        self.description = description
+        self.offsets = dict(offsets)
+        self.types = dict(FIELD_TYPES)
+        if types:
+            self.types.update(types)
+
+        if "fuel" not in self.offsets:
+            raise ValueError(f"Perfil {name}: falta el offset del combustible")
+        
+        # Compilar: campos ordenados por offset con relleno entre ellos
+        ordered = sorted((f for f in FIELDS if f in self.offsets), key=lambda f: self.offsets[f])
+        fmt = "="
+        position = 0
+        for field_name in ordered:
+            offset = self.offsets[field_name]
+            if offset < position:
+                raise ValueError(f"Perfil {name}: el campo {field_name} se solapa con el anterior")
+            if offset > position:
+                fmt += f"{offset - position}x"
+            fmt += self.types[field_name]
+            position = offset + struct.calcsize("=" + self.types[field_name])
+
+        self.struct = struct.Struct(fmt)
+        self.size = position
+
+        # Los campos que faltan se añaden al final de la tupla decodificada
+        missing = [f for f in FIELDS if f not in self.offsets]
+        self._defaults = tuple(FIELD_DEFAULTS[f] for f in missing)
+        
+        # Posición de cada campo dentro de la tupla decodificada
+        index = {field_name: i for i, field_name in enumerate(ordered + missing)}
+        self._i_fuel = index["fuel"]
+        self._i_max_fuel = index["max_fuel"]
+        self._i_lap = index["lap"]
+        self._i_total_laps = index["total_laps"]
+        self._i_session_time = index["session_time"]
+        self._i_last_lap_time = index["last_lap_time"]
+
+    def decode(self, buffer) -> TelemetryData:
+        """Decodifica un frame completo con una sola llamada a unpack"""
+        values = self.struct.unpack_from(buffer)
+        if self._defaults:
+            values += self._defaults
+        return TelemetryData(
+            fuel=values[self._i_fuel],
+            max_fuel=values[self._i_max_fuel],
+            lap=values[self._i_lap],
+            total_laps=values[self._i_total_laps],
+            session_time=values[self._i_session_time],
+            last_lap_time=values[self._i_last_lap_time],
+        )
+
+    def decode_into(self, buffer, frame):
+        """Como decode, pero rellena un TelemetryFrame existente"""
+        values = self.struct.unpack_from(buffer)
+        if self._defaults:
+            values += self._defaults
+        frame.fuel = values[self._i_fuel]
+        frame.max_fuel = values[self._i_max_fuel]
+        frame.lap = values[self._i_lap]
+        frame.total_laps = values[self._i_total_laps]
+        frame.session_time = values[self._i_session_time]
+        frame.last_lap_time = values[self._i_last_lap_time]
+
+    def to_dict(self) -> dict:
+        """Representación JSON (ver load_profiles_file)"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "offsets": self.offsets,
+            "types": {f: self.types[f] for f in self.offsets},
+        }
+    
+    def __repr__(self) -> str:
+        return f"LayoutProfile({self.name!r}, {self.offsets!r})"
+
+
+# ============================================================
+# REGISTRO DE PERFILES
+# ============================================================
+
+LAYOUT_PROFILES: Dict[str, LayoutProfile] = {}
+
+
+def register_profile(profile: LayoutProfile) -> LayoutProfile:
+    """Añade un perfil al registro (sustituye al del mismo nombre)"""
+    LAYOUT_PROFILES[profile.name] = profile
+    return profile
+
+
+register_profile(LayoutProfile("v1", {
+    "fuel": 100, "max_fuel": 104, "lap": 200, "total_laps": 204,
+    "session_time": 300, "last_lap_time": 400,
+}, description="Versión 1 (predeterminada)"))
+
+register_profile(LayoutProfile("v2", {
+    "fuel": 120, "max_fuel": 124, "lap": 220, "total_laps": 224,
+    "session_time": 300, "last_lap_time": 400,
+}, description="Versión 2 (alternativa)"))
+
+register_profile(LayoutProfile("v3", {
+    "fuel": 150, "max_fuel": 154, "lap": 250, "total_laps": 254,
+    "session_time": 300, "last_lap_time": 400,
+}, description="Versión 3 (builds más recientes)"))
+
+
+def profile_from_config(config: Config) -> LayoutProfile:
+    """Construye el perfil definido por los OFFSET_* de Config"""
+    return LayoutProfile("config", {
+        "fuel": config.OFFSET_FUEL,
+        "max_fuel": config.OFFSET_MAX_FUEL,
+        "lap": config.OFFSET_LAP,
+        "total_laps": config.OFFSET_TOTAL_LAPS,
+        "session_time": config.OFFSET_SESSION_TIME,
+        "last_lap_time": config.OFFSET_LAST_LAP_TIME,
+    }, description="Offsets de config.py")
+
+
+def load_profiles_file(path: str) -> List[LayoutProfile]:
+    """
+    Registra los perfiles de un JSON generado por sintonizador.py
+    
+    Devuelve los perfiles cargados (ninguno si el fichero no existe).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"Aviso: no se pudieron leer los perfiles de {path}: {e}")
+        return []
+    
+    profiles = []
+    for entry in data.get("profiles", []):
+        try:
+            profile = LayoutProfile(entry["name"],
+                                    {f: int(offset) for f, offset in entry["offsets"].items()},
+                                    entry.get("types"), entry.get("description", ""))
+        except (KeyError, TypeError, ValueError, struct.error) as e:
+            print(f"Aviso: perfil inválido en {path}: {e}")
+            continue
+        profiles.append(register_profile(profile))
+    return profiles
+
+
+def save_profiles_file(path: str, profiles: List[LayoutProfile]):
+    """Añade (o sustituye por nombre) perfiles en el JSON de perfiles propios"""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            entries = {entry["name"]: entry for entry in json.load(f).get("profiles", [])}
+    for profile in profiles:
+        entries[profile.name] = profile.to_dict()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"profiles": list(entries.values())}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# DETECCIÓN AUTOMÁTICA
+# ============================================================
+
+def is_plausible(samples: List[TelemetryData]) -> bool:
+    """Comprueba si una secuencia de frames decodificados tiene sentido"""
+    previous = None
+    for data in samples:
+        values = (data.fuel, data.max_fuel, data.session_time, data.last_lap_time)
+        if not all(math.isfinite(v) for v in values):
+            return False
+        if not 0 < data.max_fuel <= MAX_PLAUSIBLE_FUEL:
+            return False
+        if not 0 <= data.fuel <= data.max_fuel:
+            return False
+        if not 0 <= data.lap <= MAX_PLAUSIBLE_LAPS:
+            return False
+        if not 0 <= data.total_laps <= MAX_PLAUSIBLE_LAPS:
+            return False
+        if not 0 <= data.session_time <= MAX_PLAUSIBLE_SESSION_TIME:
+            return False
+        if not 0 <= data.last_lap_time <= MAX_PLAUSIBLE_LAP_TIME:
+            return False
+        # Vueltas y tiempo de sesión no pueden ir hacia atrás
+        if previous is not None:
+            if data.lap < previous.lap or data.session_time < previous.session_time:
+                return False
+        previous = data
+    return True
+
+
+def detect_profile(read_snapshot: Callable[[], bytes],
+                   candidates: List[LayoutProfile],
+                   samples: int = 5, interval: float = 0.05) -> Optional[LayoutProfile]:
+    """
+    Toma varias capturas del buffer y devuelve el primer perfil candidato
+    cuyas lecturas cumplen todas las reglas de coherencia
+    """
+    snapshots = []
+    for i in range(samples):
+        if i:
+            time.sleep(interval)
+        snapshots.append(read_snapshot())
+
+    for profile in candidates:
+        try:
+            decoded = [profile.decode(snapshot) for snapshot in snapshots]
+        except struct.error:
+            continue  # El perfil no cabe en el buffer
+        if is_plausible(decoded):
+            return profile
+    return None
@@ -0,0 +1,412 @@
+"""
+Lift & coast: dónde levantar antes para ahorrar combustible
+
+Muestrea el frame de físicas del jugador (mFuel, mUnfilteredThrottle,
+mUnfilteredBrake) a la frecuencia a la que lo publica el plugin y acumula,
+por tramos de distancia de la vuelta (arrays preasignados), tiempo,
+combustible gastado, acelerador y freno. Al cerrar cada vuelta se integra en
+el perfil (EWMA por tramo) y se recalcula el ranking de frenadas:
+
+- Frenada: tramo en que el freno pasa del umbral tras tramos sin frenar.
+- Antes de cada frenada se busca la recta a fondo (hasta LIFTCOAST_MAX_LIFT
+  metros): es lo que se puede sustituir por inercia.
+- Levantar t segundos antes ahorra (consumo a fondo - consumo sin gas) * t
+  y, con una deceleración por inercia a, cuesta unos a*t²/(2v) segundos a
+  velocidad v (aproximación conservadora: no descuenta la frenada más corta).
+- Cada frenada se puntúa con los litros que ahorra levantar antes gastando
+  como mucho una décima: las de recta rápida y larga salen primero.
+
+La posición solo llega con el Scoring (~5 Hz): entre actualizaciones se
+interpola con la velocidad media de las dos últimas. Si el muestreo se
+retrasa no se encola nada: siempre se procesa el último frame, y como el
+combustible es absoluto el gasto del frame perdido cae en el siguiente.
+
+Requiere CONNECTOR_MODE = "ctypes" (memoria compartida de rF2/LMU).
+
+Uso:
+    python liftcoast.py
+    python liftcoast.py --objetivo 0.15   # Litros a ahorrar por vuelta
+"""
+
+import argparse
+import math
+import time
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional
+from advanced_config import AdvancedConfig
+from calculator import is_refuel, is_slow_lap
+from rf2_connector import RF2DirectConnector
+from telemetry import TelemetryFrame
+
+# Presupuesto de tiempo con que se puntúa cada frenada (segundos)
+TIME_BUDGET = 0.1
+
+# Tramos con el acelerador por debajo de esto cuentan como "sin gas"
+COAST_THROTTLE = 0.05
+
+
+@dataclass
+class BrakingZone:
+    """Frenada del perfil y lo que se gana levantando antes"""
+    distance: float  # Metros desde la línea hasta el inicio de la frenada
+    speed: float  # Velocidad media en la recta previa (m/s)
+    straight: float  # Metros a fondo antes de la frenada
+    full_rate: float  # Consumo a fondo en la recta (L/s)
+    lift_distance: float  # Metros antes de la frenada en que levantar
+    fuel_saved: float  # Litros por vuelta ahorrados al levantar
+    time_lost: float  # Segundos por vuelta perdidos (como mucho TIME_BUDGET)
+
+
+class LiftCoastAnalyzer:
+    """Perfil de acelerador, freno y consumo por tramos y ranking de frenadas"""
+
+    def __init__(self, track_length: float, segment_length: float = 10.0,
+                 alpha: float = 0.3, full_throttle: float = 0.95,
+                 brake_threshold: float = 0.1, max_lift: float = 200.0,
+                 coast_deceleration: float = 1.5, min_coverage: float = 0.95,
+                 slow_lap_tolerance: float = 0.07):
+        self.track_length = track_length
+        self.segments = max(1, int(math.ceil(track_length / segment_length)))
+        self.segment_length = track_length / self.segments
+        self._inverse_length = 1.0 / self.segment_length
+        self.alpha = alpha
+        self.full_throttle = full_throttle
+        self.brake_threshold = brake_threshold
+        self.max_lift = max_lift
+        self.coast_deceleration = coast_deceleration
+        self.min_coverage = min_coverage
+        self.slow_lap_tolerance = slow_lap_tolerance
+
+        zeros = bytes(8 * self.segments)
+        self._zeros = array("d", zeros)
+
+        # Vuelta en curso: segundos, litros, acelerador*s y freno*s por tramo
+        self.lap_time = array("d", zeros)
+        self.lap_fuel = array("d", zeros)
+        self.lap_throttle = array("d", zeros)
+        self.lap_brake = array("d", zeros)
+
+        # Perfil aprendido (EWMA entre vueltas limpias)
+        self.time = array("d", zeros)
+        self.fuel = array("d", zeros)
+        self.throttle = array("d", zeros)
+        self.brake = array("d", zeros)
+        self.learned = bytearray(self.segments)
+
+        self.lap: Optional[int] = None
+        self.laps_learned = 0
+        self.best_lap_time = 0.0
+        self.last_lap_accepted = False
+        self.coast_rate = 0.0  # Consumo sin gas (L/s)
+        self.zones: List[BrakingZone] = []
+
+    def reset_lap(self):
+        """Descarta la vuelta en curso (repostaje, pausa, salto de posición)"""
+        self.lap_time[:] = self._zeros
+        self.lap_fuel[:] = self._zeros
+        self.lap_throttle[:] = self._zeros
+        self.lap_brake[:] = self._zeros
+
+    def add(self, lap: int, distance: float, dt: float, burn: float,
+            throttle: float, brake: float):
+        """Añade un frame de físicas: O(1) y sin crear objetos"""
+        if lap != self.lap:
+            if self.lap is not None and lap == self.lap + 1:
+                self.finish_lap()
+            else:
+                self.reset_lap()
+            self.lap = lap
+        segment = int(distance * self._inverse_length)
+        if segment >= self.segments:
+            segment = self.segments - 1
+        elif segment < 0:
+            segment = 0
+        self.lap_time[segment] += dt
+        self.lap_fuel[segment] += burn
+        self.lap_throttle[segment] += throttle * dt
+        self.lap_brake[segment] += brake * dt
+
+    def finish_lap(self):
+        """Integra la vuelta en el perfil si es completa y limpia, y recalcula el ranking"""
+        lap_time = self.lap_time
+        covered = sum(1 for t in lap_time if t > 0)
+        total = sum(lap_time)
+        accepted = covered >= self.min_coverage * self.segments and not (
+            self.best_lap_time and is_slow_lap(total, self.best_lap_time, self.slow_lap_tolerance))
+        self.last_lap_accepted = accepted
+
+        if accepted:
+            if not self.best_lap_time or total < self.best_lap_time:
+                self.best_lap_time = total
+            alpha = self.alpha
+            for s in range(self.segments):
+                t = lap_time[s]
+                if t <= 0:
+                    continue
+                if self.learned[s]:
+                    self.time[s] += alpha * (t - self.time[s])
+                    self.fuel[s] += alpha * (self.lap_fuel[s] - self.fuel[s])
+                    self.throttle[s] += alpha * (self.lap_throttle[s] - self.throttle[s])
+                    self.brake[s] += alpha * (self.lap_brake[s] - self.brake[s])
+                else:
+                    self.time[s] = t
+                    self.fuel[s] = self.lap_fuel[s]
+                    self.throttle[s] = self.lap_throttle[s]
+                    self.brake[s] = self.lap_brake[s]
+                    self.learned[s] = 1
+            self.laps_learned += 1
+            self.zones = self.rank()
+        self.reset_lap()
+
+    def rank(self) -> List[BrakingZone]:
+        """Frenadas del perfil ordenadas por litros ahorrados por décima perdida"""
+        segments = self.segments
+        time_, fuel, throttle, brake = self.time, self.fuel, self.throttle, self.brake
+        learned = self.learned
+
+        # Consumo sin gas: media de los tramos con el acelerador cerrado
+        coast_time = coast_fuel = 0.0
+        for s in range(segments):
+            if learned[s] and throttle[s] < COAST_THROTTLE * time_[s]:
+                coast_time += time_[s]
+                coast_fuel += fuel[s]
+        self.coast_rate = coast_fuel / coast_time if coast_time > 0 else 0.0
+
+        def braking(s):
+            return learned[s] and brake[s] >= self.brake_threshold * time_[s]
+
+        def full(s):
+            return learned[s] and time_[s] > 0 and throttle[s] >= self.full_throttle * time_[s]
+
+        max_straight = min(int(self.max_lift * self._inverse_length), segments - 1)
+        zones = []
+        for s in range(segments):
+            if not braking(s) or braking(s - 1):
+                continue
+            # Recta a fondo justo antes de la frenada
+            straight_time = straight_fuel = 0.0
+            count = 0
+            k = s - 1
+            while count < max_straight and full(k % segments):
+                straight_time += time_[k % segments]
+                straight_fuel += fuel[k % segments]
+                count += 1
+                k -= 1
+            if count < 2:
+                continue
+            straight = count * self.segment_length
+            speed = straight / straight_time
+            full_rate = straight_fuel / straight_time
+            saving_rate = full_rate - self.coast_rate
+            if saving_rate <= 0:
+                continue
+            # Segundos de inercia que cuestan TIME_BUDGET, limitados por la recta
+            lift_time = min(math.sqrt(2.0 * TIME_BUDGET * speed / self.coast_deceleration),
+                            straight_time)
+            zones.append(BrakingZone(
+                distance=s * self.segment_length,
+                speed=speed,
+                straight=straight,
+                full_rate=full_rate,
+                lift_distance=speed * lift_time,
+                fuel_saved=saving_rate * lift_time,
+                time_lost=self.coast_deceleration * lift_time * lift_time / (2.0 * speed),
+            ))
+        zones.sort(key=lambda zone: zone.fuel_saved, reverse=True)
+        return zones
+
+    def guidance(self, target: float) -> List[BrakingZone]:
+        """Frenadas (de mejor a peor) con las que se ahorran `target` litros por vuelta"""
+        plan = []
+        saved = 0.0
+        for zone in self.zones:
+            if saved >= target:
+                break
+            plan.append(zone)
+            saved += zone.fuel_saved
+        return plan
+
+
+class LiftCoastSampler:
+    """Lee el frame de físicas del jugador a su frecuencia y alimenta el analizador"""
+
+    def __init__(self, connector: RF2DirectConnector):
+        self.connector = connector
+        self.advanced = AdvancedConfig()
+        self.retries = connector.config.TORN_READ_RETRIES
+        self.frame = TelemetryFrame()
+        self.analyzer: Optional[LiftCoastAnalyzer] = None
+        self.clock = time.perf_counter  # Reloj de los frames (sustituible al reproducir)
+
+        self._telemetry = None
+        self._phys = None
+        self._telemetry_version = None
+        self._scoring_version = None
+        self._last_time = 0.0
+        self._last_fuel = 0.0
+
+        # Última posición del Scoring y velocidad con que se interpola
+        self._anchor_lap: Optional[int] = None
+        self._anchor_distance = 0.0
+        self._anchor_time = 0.0
+        self._speed = 0.0
+
+        self.frames = 0
+        self.missed_frames = 0  # Frames publicados que no llegamos a leer
+        self.torn_frames = 0
+
+    def detach(self):
+        """Suelta las vistas (necesario antes de cerrar los buffers)"""
+        self._telemetry = None
+        self._phys = None
+
+    def _new_analyzer(self, track_length: float) -> LiftCoastAnalyzer:
+        advanced = self.advanced
+        return LiftCoastAnalyzer(
+            track_length,
+            segment_length=advanced.LIFTCOAST_SEGMENT_LENGTH,
+            alpha=advanced.EWMA_ALPHA,
+            full_throttle=advanced.LIFTCOAST_FULL_THROTTLE,
+            brake_threshold=advanced.LIFTCOAST_BRAKE_THRESHOLD,
+            max_lift=advanced.LIFTCOAST_MAX_LIFT,
+            coast_deceleration=advanced.LIFTCOAST_COAST_DECELERATION,
+            slow_lap_tolerance=advanced.LAP_TIME_OUTLIER,
+        )
+
+    def _update_position(self, now: float):
+        """Nueva lectura del Scoring: ancla la posición y estima la velocidad"""
+        frame = self.frame
+        length = frame.track_length
+        if length <= 0:
+            return
+        if self.analyzer is None or abs(self.analyzer.track_length - length) > 1.0:
+            self.analyzer = self._new_analyzer(length)
+            self._anchor_lap = None
+        if self._anchor_lap is not None:
+            elapsed = now - self._anchor_time
+            travelled = frame.lap_dist - self._anchor_distance + (frame.lap - self._anchor_lap) * length
+            if elapsed > 0 and 0 <= travelled <= elapsed * self.advanced.LIFTCOAST_MAX_SPEED:
+                self._speed = travelled / elapsed
+            else:
+                # Garaje, reinicio o salto de posición
+                self._speed = 0.0
+                self.analyzer.reset_lap()
+        self._anchor_lap = frame.lap
+        self._anchor_distance = frame.lap_dist
+        self._anchor_time = now
+
+    def poll(self) -> bool:
+        """Procesa el último frame de físicas; False si no hay ninguno nuevo"""
+        connector = self.connector
+        telemetry = connector.telemetry
+        if telemetry is None:
+            return False
+        if telemetry is not self._telemetry:
+            self._telemetry = telemetry
+            self._phys = telemetry.mVehicles[0]
+        if telemetry.mVersionUpdateEnd == self._telemetry_version:
+            return False
+
+        phys = self._phys
+        for _ in range(self.retries + 1):
+            version = telemetry.mVersionUpdateEnd
+            fuel = phys.mFuel
+            throttle = phys.mUnfilteredThrottle
+            brake = phys.mUnfilteredBrake
+            if telemetry.mVersionUpdateBegin == version:
+                break
+            self.torn_frames += 1
+        else:
+            return False
+        now = self.clock()
+
+        scoring = connector.scoring
+        scoring_version = scoring.mVersionUpdateEnd if scoring is not None else None
+        if scoring_version is None or scoring_version != self._scoring_version:
+            if connector.read_telemetry_into(self.frame):
+                self._scoring_version = scoring_version
+                self._update_position(now)
+
+        analyzer = self.analyzer
+        if self._last_time and analyzer is not None and self._anchor_lap is not None:
+            dt = now - self._last_time
+            if dt > self.advanced.LIFTCOAST_MAX_GAP:
+                analyzer.reset_lap()  # Pausa o bloqueo: no se puede repartir
+            elif is_refuel(self._last_fuel, fuel, self.advanced.REFUEL_THRESHOLD):
+                analyzer.reset_lap()
+            else:
+                length = analyzer.track_length
+                lap = self._anchor_lap
+                position = self._anchor_distance + self._speed * (now - self._anchor_time)
+                if position >= length:
+                    # Ya cruzó la meta aunque el Scoring aún no lo diga
+                    position -= length
+                    lap += 1
+                analyzer.add(lap, position, dt, self._last_fuel - fuel, throttle, brake)
+
+        if self._telemetry_version is not None:
+            # El plugin suma 1 a mVersionUpdateEnd por frame publicado
+            self.missed_frames += ((version - self._telemetry_version) & 0xFFFFFFFF) - 1
+        self._telemetry_version = version
+        self._last_time = now
+        self._last_fuel = fuel
+        self.frames += 1
+        return True
+
+
+def format_ranking(analyzer: LiftCoastAnalyzer, target: float = 0.0, top: int = 8) -> str:
+    """Tabla de frenadas por ahorro y, con objetivo, dónde levantar para cumplirlo"""
+    lines = [f"Lift & coast: {analyzer.laps_learned} vueltas en el perfil, "
+             f"sin gas {analyzer.coast_rate * 60:.2f} L/min",
+             f"{'#':>2} {'Frenada':>9} {'Vel.':>7} {'Recta':>7} {'Levantar':>9} "
+             f"{'Ahorro':>8} {'Pierdes':>8}"]
+    for i, zone in enumerate(analyzer.zones[:top], 1):
+        lines.append(f"{i:2d} {zone.distance:8.0f}m {zone.speed * 3.6:5.0f}kh "
+                     f"{zone.straight:6.0f}m {zone.lift_distance:8.0f}m "
+                     f"{zone.fuel_saved:7.3f}L {zone.time_lost:7.2f}s")
+    if target > 0:
+        plan = analyzer.guidance(target)
+        saved = sum(zone.fuel_saved for zone in plan)
+        lost = sum(zone.time_lost for zone in plan)
+        where = ", ".join(f"{zone.lift_distance:.0f}m antes de {zone.distance:.0f}m" for zone in plan)
+        status = "OK" if saved >= target else "NO ALCANZA"
+        lines.append(f"Objetivo {target:.2f} L/vuelta: levanta {where or '-'} "
+                     f"→ {saved:.3f} L, {lost:.2f} s [{status}]")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dónde levantar antes para ahorrar combustible")
+    parser.add_argument("--objetivo", type=float, default=0.0,
+                        help="Litros a ahorrar por vuelta (DEBES AHORRAR del monitor)")
+    parser.add_argument("--top", type=int, default=8, help="Frenadas a mostrar")
+    args = parser.parse_args()
+
+    connector = RF2DirectConnector()
+    while not connector.connect():
+        print("Esperando juego... (Reintentando en 3s)")
+        time.sleep(3)
+    sampler = LiftCoastSampler(connector)
+    poll_interval = sampler.advanced.LIFTCOAST_POLL_INTERVAL
+    shown = -1
+    try:
+        while True:
+            if not sampler.poll():
+                time.sleep(poll_interval)
+                continue
+            analyzer = sampler.analyzer
+            if analyzer is not None and analyzer.laps_learned != shown:
+                shown = analyzer.laps_learned
+                print("\033[H\033[J" + format_ranking(analyzer, args.objetivo, args.top)
+                      + f"\nFrames {sampler.frames}, perdidos {sampler.missed_frames}",
+                      flush=True)
+    except KeyboardInterrupt:
+        print("\nAnálisis detenido")
+    finally:
+        sampler.detach()
+        connector.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Simulador Monte Carlo vectorizado de carreras
+
+Simula decenas de miles de carreras a la vez con NumPy (una operación por
+vuelta para todas las carreras) y reproduce la lógica de FuelCalculator:
+mediana de las últimas LAPS_FOR_AVERAGE vueltas limpias (sin repostaje ni
+más lentas que la mediana de tiempos en LAP_TIME_OUTLIER, como las de coche
+de seguridad), SAFETY_MARGIN y umbrales THRESHOLD_WARNING/THRESHOLD_CRITICAL. Sirve para ajustar esos parámetros
+estadísticamente antes de la carrera.
+
+Requiere numpy (pip install numpy).
+
+Uso:
+    python montecarlo.py --laps 30 --fuel 90 --consumption 3.1 --races 50000
+    python montecarlo.py --sweep-margin 0 0.5 1 1.5 2
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+from config import Config
+from advanced_config import AdvancedConfig
+from calculator import is_slow_lap
+
+# Percentiles del margen de combustible al terminar
+MARGIN_PERCENTILES = (1, 5, 25, 50, 75, 95)
+
+REFUEL_POLICIES = ("none", "threshold", "calculator")
+
+
+@dataclass
+class RaceScenario:
+    """Distribuciones y política de repostaje de la carrera simulada"""
+    total_laps: int = 20
+    max_fuel: float = 80.0
+    start_fuel: float = 75.0
+
+    # Consumo: media, variación entre carreras y ruido vuelta a vuelta
+    base_consumption: float = 3.5
+    consumption_bias_std: float = 0.1  # Litros, fijo durante cada carrera
+    consumption_lap_std: float = 0.15  # Litros, independiente en cada vuelta
+
+    # Tiempo de vuelta: media y ruido vuelta a vuelta (segundos)
+    lap_time: float = 90.0
+    lap_time_std: float = 0.5
+
+    # Coche de seguridad
+    safety_car_prob: float = 0.03  # Probabilidad por vuelta de que salga
+    safety_car_laps: int = 3
+    safety_car_factor: float = 0.5  # Fracción del consumo normal bajo SC
+    safety_car_pace: float = 1.4  # Tiempo de vuelta bajo SC respecto al normal
+
+    # Respuesta del piloto cuando el monitor pide ahorrar
+    save_capacity: float = 0.05  # Fracción máxima del consumo que puede ahorrar
+
+    # Repostaje: "none", "threshold" (por debajo de refuel_threshold litros)
+    # o "calculator" (cuando no llega a otra vuelta con el promedio actual)
+    refuel_policy: str = "none"
+    refuel_threshold: float = 5.0
+
+
+@dataclass
+class SimulationParams:
+    """Parámetros del monitor que se quieren ajustar"""
+    safety_margin: float = Config.SAFETY_MARGIN
+    threshold_warning: float = Config.THRESHOLD_WARNING
+    threshold_critical: float = Config.THRESHOLD_CRITICAL
+    laps_for_average: int = AdvancedConfig.LAPS_FOR_AVERAGE
+    lap_time_outlier: float = AdvancedConfig.LAP_TIME_OUTLIER
+    lap_time_min_reference: int = AdvancedConfig.LAP_TIME_MIN_REFERENCE
+
+
+@dataclass
+class SimulationResult:
+    """Resumen estadístico de la simulación"""
+    races: int
+    params: SimulationParams
+    dry_probability: float  # Carreras en las que el coche se queda sin combustible
+    margin_percentiles: Dict[int, float] = field(default_factory=dict)  # Litros al terminar (negativo = faltó)
+    critical_probability: float = 0.0  # Carreras con al menos una alerta CRÍTICO
+    warning_probability: float = 0.0  # Carreras con al menos una ADVERTENCIA
+    missed_alert_probability: float = 0.0  # Sin combustible sin ningún CRÍTICO previo
+    false_alarm_probability: float = 0.0  # CRÍTICO pero terminó con margen > THRESHOLD_WARNING
+    mean_stops: float = 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"Carreras simuladas: {self.races}",
+            f"  SAFETY_MARGIN={self.params.safety_margin:.2f}L  "
+            f"THRESHOLD_WARNING={self.params.threshold_warning:.2f}L  "
+            f"THRESHOLD_CRITICAL={self.params.threshold_critical:.2f}L",
+            f"  Probabilidad de quedarse sin combustible: {self.dry_probability * 100:.2f}%",
+            f"  Alertas CRÍTICO: {self.critical_probability * 100:.1f}%  "
+            f"ADVERTENCIA: {self.warning_probability * 100:.1f}%",
+            f"  Sin combustible sin aviso CRÍTICO: {self.missed_alert_probability * 100:.2f}%",
+            f"  CRÍTICO innecesario: {self.false_alarm_probability * 100:.1f}%",
+            f"  Paradas medias: {self.mean_stops:.2f}",
+            "  Margen al terminar (percentiles): " + "  ".join(
+                f"p{p}={v:+.2f}L" for p, v in self.margin_percentiles.items()),
+        ]
+        return "\n".join(lines)
+
+
+def _window_median(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Mediana por fila de las ventanas (huecos a NaN) de las filas `rows`"""
+    median = np.zeros(len(values))
+    if rows.any():
+        median[rows] = np.nanmedian(values[rows], axis=1)
+    return median
+
+
+def _push(values: np.ndarray, pos: np.ndarray, count: np.ndarray,
+          idx: np.ndarray, new: np.ndarray):
+    """Añade new[idx] a las ventanas circulares de las filas idx"""
+    window = values.shape[1]
+    values[idx, pos[idx]] = new[idx]
+    pos[idx] = (pos[idx] + 1) % window
+    count[idx] = np.minimum(count[idx] + 1, window)
+
+
+def simulate(scenario: RaceScenario, params: Optional[SimulationParams] = None,
+             races: int = 20000, seed: Optional[int] = None) -> SimulationResult:
+    """Simula `races` carreras a la vez y devuelve el resumen"""
+    if params is None:
+        params = SimulationParams()
+    if scenario.refuel_policy not in REFUEL_POLICIES:
+        raise ValueError(f"Política de repostaje desconocida: {scenario.refuel_policy}")
+
+    rng = np.random.default_rng(seed)
+    n = races
+    window = params.laps_for_average
+    rows = np.arange(n)
+
+    fuel = np.full(n, scenario.start_fuel)
+    bias = rng.normal(0.0, scenario.consumption_bias_std, n)
+    safety_car_left = np.zeros(n, dtype=np.int32)
+    dry = np.zeros(n, dtype=bool)
+    stops = np.zeros(n, dtype=np.int32)
+    saw_critical = np.zeros(n, dtype=bool)
+    saw_warning = np.zeros(n, dtype=bool)
+    critical_before_dry = np.zeros(n, dtype=bool)
+
+    # Ventanas por carrera de consumos de vueltas limpias (consumption_median)
+    # y de tiempos de vuelta (lap_time_median); los huecos son NaN
+    history = np.full((n, window), np.nan)
+    history_pos = np.zeros(n, dtype=np.int32)
+    history_count = np.zeros(n, dtype=np.int32)
+    lap_times = np.full((n, window), np.nan)
+    lap_times_pos = np.zeros(n, dtype=np.int32)
+    lap_times_count = np.zeros(n, dtype=np.int32)
+
+    for lap in range(scenario.total_laps):
+        laps_remaining = scenario.total_laps - lap
+
+        # --- Análisis del monitor al inicio de la vuelta ---
+        has_data = history_count > 0
+        avg = _window_median(history, has_data)
+        needed = avg * laps_remaining + params.safety_margin
+        balance = fuel - needed
+        critical = has_data & (balance < -params.threshold_critical)
+        warning = has_data & ~critical & (balance < params.threshold_warning)
+        saw_critical |= critical
+        saw_warning |= warning
+        to_save = np.where(has_data & (balance < 0), -balance / laps_remaining, 0.0)
+
+        # --- Consumo de la vuelta ---
+        new_sc = (safety_car_left == 0) & (rng.random(n) < scenario.safety_car_prob)
+        safety_car_left[new_sc] = scenario.safety_car_laps
+        under_sc = safety_car_left > 0
+        safety_car_left[under_sc] -= 1
+
+        consumption = scenario.base_consumption + bias + \
+            rng.normal(0.0, scenario.consumption_lap_std, n)
+        consumption = np.maximum(consumption, 0.0)
+        consumption[under_sc] *= scenario.safety_car_factor
+        # El piloto ahorra lo que pide el monitor, hasta su capacidad
+        consumption -= np.minimum(to_save, consumption * scenario.save_capacity)
+
+        alive = ~dry
+        fuel = np.where(alive, fuel - consumption, fuel)
+        new_dry = alive & (fuel < 0)
+        critical_before_dry |= new_dry & saw_critical
+        dry |= new_dry
+
+        # --- Repostaje al cruzar la línea (no en la última vuelta) ---
+        refuel = np.zeros(n, dtype=bool)
+        if scenario.refuel_policy != "none" and laps_remaining > 1:
+            if scenario.refuel_policy == "threshold":
+                refuel = ~dry & (fuel < scenario.refuel_threshold)
+                target = np.full(n, scenario.max_fuel)
+            else:
+                # Usa el promedio del monitor (o el consumo de esta vuelta si aún no hay)
+                estimate = np.where(has_data, avg, consumption)
+                refuel = ~dry & (fuel < estimate + params.safety_margin)
+                target = np.minimum(estimate * (laps_remaining - 1) + params.safety_margin,
+                                    scenario.max_fuel)
+            fuel = np.where(refuel, np.maximum(fuel, target), fuel)
+            stops += refuel
+
+        # La vuelta del repostaje no se registra (igual que FuelCalculator)
+        valid = ~dry & ~refuel & (consumption > 0)
+
+        # Clasificación de FuelCalculator.classify_lap: lenta frente a la
+        # mediana de tiempos (si hay referencia suficiente), que sigue todas
+        # las vueltas válidas; solo las limpias entran en la mediana de consumo
+        lap_time = scenario.lap_time + rng.normal(0.0, scenario.lap_time_std, n)
+        lap_time[under_sc] *= scenario.safety_car_pace
+        has_reference = lap_times_count >= params.lap_time_min_reference
+        reference = _window_median(lap_times, has_reference)
+        slow = has_reference & is_slow_lap(lap_time, reference, params.lap_time_outlier)
+        _push(lap_times, lap_times_pos, lap_times_count, rows[valid], lap_time)
+        _push(history, history_pos, history_count, rows[valid & ~slow], consumption)
+
+    finished = ~dry
+    return SimulationResult(
+        races=n,
+        params=params,
+        dry_probability=float(dry.mean()),
+        margin_percentiles={p: float(v) for p, v in
+                            zip(MARGIN_PERCENTILES, np.percentile(fuel, MARGIN_PERCENTILES))},
+        critical_probability=float(saw_critical.mean()),
+        warning_probability=float(saw_warning.mean()),
+        missed_alert_probability=float((dry & ~critical_before_dry).mean()),
+        false_alarm_probability=float(
+            (saw_critical & finished & (fuel > params.threshold_warning)).mean()),
+        mean_stops=float(stops.mean()),
+    )
+
+
+def sweep(scenario: RaceScenario, margins: List[float], races: int = 20000,
+          seed: Optional[int] = None) -> List[SimulationResult]:
+    """Simula el mismo escenario con varios SAFETY_MARGIN"""
+    results = []
+    for margin in margins:
+        params = SimulationParams(safety_margin=margin)
+        results.append(simulate(scenario, params, races, seed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de combustible")
+    parser.add_argument("--races", type=int, default=20000)
+    parser.add_argument("--laps", type=int, default=20)
+    parser.add_argument("--fuel", type=float, default=75.0, help="Combustible inicial")
+    parser.add_argument("--max-fuel", type=float, default=80.0)
+    parser.add_argument("--consumption", type=float, default=3.5, help="Consumo medio por vuelta")
+    parser.add_argument("--lap-std", type=float, default=0.15)
+    parser.add_argument("--bias-std", type=float, default=0.1)
+    parser.add_argument("--sc-prob", type=float, default=0.03)
+    parser.add_argument("--refuel", choices=REFUEL_POLICIES, default="none")
+    parser.add_argument("--margin", type=float, default=Config.SAFETY_MARGIN)
+    parser.add_argument("--warning", type=float, default=Config.THRESHOLD_WARNING)
+    parser.add_argument("--critical", type=float, default=Config.THRESHOLD_CRITICAL)
+    parser.add_argument("--sweep-margin", type=float, nargs="+",
+                        help="Lista de SAFETY_MARGIN a comparar")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    scenario = RaceScenario(
+        total_laps=args.laps, max_fuel=args.max_fuel, start_fuel=args.fuel,
+        base_consumption=args.consumption, consumption_lap_std=args.lap_std,
+        consumption_bias_std=args.bias_std, safety_car_prob=args.sc_prob,
+        refuel_policy=args.refuel,
+    )
+
+    if args.sweep_margin:
+        for result in sweep(scenario, args.sweep_margin, args.races, args.seed):
+            print(result.summary())
+            print()
+        return
+
+    params = SimulationParams(safety_margin=args.margin, threshold_warning=args.warning,
+                              threshold_critical=args.critical)
+    print(simulate(scenario, params, args.races, args.seed).summary())
+
+
+if __name__ == "__main__":
+    main()
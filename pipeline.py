@@ -0,0 +1,164 @@
+"""
+Bucle del monitor en tres etapas con hilos
+
+    lector  --(último frame)-->  análisis  --(último análisis)-->  render
+       \\--(cola de cruces de meta, sin pérdidas)--/
+
+- Lector: sondea la memoria compartida al ritmo del planificador adaptativo
+  y graba; nunca espera a la consola ni a la calculadora.
+- Análisis: FuelCalculator.update/get_analysis con el frame más reciente.
+  Los frames de cruce de meta llegan además por una cola, así que ninguna
+  vuelta se pierde aunque el análisis vaya retrasado.
+- Render: hilo principal, limitado a DISPLAY_MAX_FPS. Ctrl+C llega aquí y
+  detiene las otras etapas antes de cerrar el conector.
+
+Los buffers de un solo hueco (LatestValue) no usan locks para los datos:
+publicar es una sola asignación de una tupla (atómica en CPython).
+"""
+
+import queue
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class LatestValue:
+    """Buffer de un solo hueco: el productor sobrescribe, el consumidor lee lo último"""
+
+    def __init__(self):
+        self._item: Tuple[int, object] = (0, None)  # (secuencia, valor)
+        self._event = threading.Event()
+
+    def put(self, seq: int, value):
+        self._item = (seq, value)
+        self._event.set()
+
+    def get(self) -> Tuple[int, object]:
+        return self._item
+
+    def wait(self, timeout: float) -> Tuple[int, object]:
+        """Espera a que haya un valor publicado desde la última espera"""
+        self._event.wait(timeout)
+        # Si se publica justo después de limpiar, el evento queda activo
+        # para la siguiente espera y el valor leído ya es el nuevo
+        self._event.clear()
+        return self._item
+
+
+class MonitorPipeline:
+    """Ejecuta las etapas de un FuelMonitor en hilos separados"""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.frames = LatestValue()  # Telemetría más reciente
+        self.analyses = LatestValue()  # (telemetría, análisis) más reciente
+        self.lap_events: "queue.Queue" = queue.Queue()  # (secuencia, telemetría)
+        self.stop_event = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.threads = []
+
+        # Estadísticas
+        self.frames_read = 0
+        self.lap_crossings = 0
+        self.frames_analyzed = 0
+        self.frames_rendered = 0
+
+    # --- Etapas ---
+
+    def _reader(self):
+        monitor = self.monitor
+        connector = monitor.connector
+        scheduler = monitor.scheduler
+        seq = 0
+        last_lap = None
+        while not self.stop_event.is_set():
+            counter = connector.read_update_counter()
+            if scheduler.is_new_frame(counter):
+                telemetry = connector.read_telemetry()
+                if scheduler.observe(telemetry):
+                    seq += 1
+                    self.frames_read += 1
+                    if monitor.recorder:
+                        monitor.record(telemetry)
+                    # El cruce de meta va a la cola antes de publicarse como último frame
+                    if telemetry.lap != last_lap:
+                        self.lap_events.put((seq, telemetry))
+                        self.lap_crossings += 1
+                        last_lap = telemetry.lap
+                    self.frames.put(seq, telemetry)
+            self.stop_event.wait(scheduler.next_interval())
+
+    def _analysis(self):
+        monitor = self.monitor
+        processed = 0
+        timeout = monitor.config.DISPLAY_UPDATE_RATE
+        while not self.stop_event.is_set():
+            seq, telemetry = self.frames.wait(timeout)
+            # Primero los cruces de meta pendientes, en orden
+            while True:
+                try:
+                    event_seq, event = self.lap_events.get_nowait()
+                except queue.Empty:
+                    break
+                if event_seq > processed:
+                    self._analyze(event_seq, event)
+                    processed = event_seq
+            if seq > processed:
+                self._analyze(seq, telemetry)
+                processed = seq
+
+    def _analyze(self, seq: int, telemetry):
+        if telemetry.lap <= 0:
+            return
+        analysis = self.monitor.analyze(telemetry)
+        self.frames_analyzed += 1
+        self.analyses.put(seq, (telemetry, analysis))
+
+    def _run_stage(self, target):
+        try:
+            target()
+        except BaseException as e:  # Cualquier fallo detiene todo el pipeline
+            self.error = e
+            self.stop_event.set()
+
+    def _render(self):
+        """Etapa de render en el hilo principal"""
+        display = self.monitor.display
+        interval = 1.0 / self.monitor.config.DISPLAY_MAX_FPS
+        rendered = 0
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            seq, item = self.analyses.wait(interval)
+            if seq > rendered:
+                telemetry, analysis = item
+                display.update(telemetry, analysis)
+                self.frames_rendered += 1
+                rendered = seq
+            display.flush()
+            # Límite de FPS: la consola nunca frena a las otras etapas
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+
+    # --- Control ---
+
+    def run(self):
+        """Arranca lector y análisis y renderiza hasta Ctrl+C o error"""
+        for name, target in (("reader", self._reader), ("analysis", self._analysis)):
+            thread = threading.Thread(target=self._run_stage, args=(target,),
+                                      name=f"monitor-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        try:
+            self._render()
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout: float = 2.0):
+        """Detiene las etapas y espera a que terminen"""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
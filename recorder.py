@@ -0,0 +1,389 @@
+"""
+Grabación binaria de sesiones de telemetría
+
+Formato de fichero (.lmurec, little-endian):
+
+    Cabecera (64 bytes): magic, versión, nº de columnas, frames por chunk
+    Chunks: cabecera de 32 bytes (tipo, tamaño, nº de frames, t inicial, t final)
+            seguida del payload, rellenado a múltiplo de 8 bytes
+        TELE: frames en columnas de ancho fijo (todas las float64 y después las int32)
+        SNAP: copia cruda del mapa de memoria compartida
+        META: diccionario JSON (circuito, coche, perfil...)
+        INDX: índice de chunks (se escribe al cerrar)
+    Trailer (16 bytes): offset del índice + magic del índice
+
+Las columnas de cada chunk están alineadas, así que el fichero se puede
+mapear en memoria y leer por rangos sin parsearlo entero. Si la grabación
+se corta sin trailer, el índice se reconstruye recorriendo las cabeceras.
+"""
+
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+from telemetry import TelemetryData
+
+FILE_MAGIC = b"LMUREC01"
+INDEX_MAGIC = b"LMUIDX01"
+FORMAT_VERSION = 2
+
+FILE_HEADER = struct.Struct("<8sHHI48x")  # 64 bytes
+CHUNK_HEADER = struct.Struct("<4sIIdd4x")  # 32 bytes
+INDEX_ENTRY = struct.Struct("<4sQIdd")
+TRAILER = struct.Struct("<Q8s")
+
+KIND_TELEMETRY = b"TELE"
+KIND_SNAPSHOT = b"SNAP"
+KIND_METADATA = b"META"
+KIND_INDEX = b"INDX"
+
+# Columnas de un chunk TELE: primero las de 8 bytes para mantener la alineación
+COLUMNS_BY_VERSION: Dict[int, Tuple[Tuple[str, str], ...]] = {
+    1: (
+        ("wall_time", "d"),
+        ("fuel", "d"),
+        ("max_fuel", "d"),
+        ("session_time", "d"),
+        ("last_lap_time", "d"),
+        ("lap", "i"),
+        ("total_laps", "i"),
+    ),
+    # v2: distancia en la vuelta y longitud del circuito
+    2: (
+        ("wall_time", "d"),
+        ("fuel", "d"),
+        ("max_fuel", "d"),
+        ("session_time", "d"),
+        ("last_lap_time", "d"),
+        ("lap_dist", "d"),
+        ("track_length", "d"),
+        ("lap", "i"),
+        ("total_laps", "i"),
+    ),
+}
+COLUMNS = COLUMNS_BY_VERSION[FORMAT_VERSION]
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+# Segundos que close() espera al hilo escritor; si el disco no responde, el
+# fichero queda sin índice y SessionReader lo reconstruye desde los chunks
+CLOSE_TIMEOUT = 5.0
+
+
+def _padding(size: int) -> int:
+    """Bytes de relleno para alinear a 8"""
+    return -size % 8
+
+
+class ChunkInfo:
+    """Entrada del índice de chunks"""
+    __slots__ = ("kind", "offset", "count", "t_first", "t_last")
+
+    def __init__(self, kind: bytes, offset: int, count: int, t_first: float, t_last: float):
+        self.kind = kind
+        self.offset = offset  # Offset de la cabecera del chunk
+        self.count = count
+        self.t_first = t_first
+        self.t_last = t_last
+
+
+class SessionRecorder:
+    """
+    Grabador de sesión con escritura en segundo plano
+
+    record() solo añade valores a buffers en memoria; los chunks llenos se
+    pasan a un hilo escritor, de modo que el bucle de lectura nunca espera al disco.
+    """
+
+    def __init__(self, path: str, chunk_frames: int = 4096, max_pending_chunks: int = 64):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.frames_recorded = 0
+        self.dropped_chunks = 0  # Chunks descartados por cola llena (disco muy lento)
+        self.error: Optional[str] = None  # Error de escritura (la grabación se detiene)
+
+        self._columns = self._new_columns()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending_chunks)
+        self._file = open(path, "wb", buffering=1024 * 1024)
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, len(COLUMNS), chunk_frames))
+        self._index: List[ChunkInfo] = []
+        self._thread = threading.Thread(target=self._writer_loop, name="session-recorder",
+                                        daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _new_columns() -> Dict[str, array]:
+        return {name: array(typecode) for name, typecode in COLUMNS}
+
+    # --- Hilo del bucle principal ---
+
+    def record(self, telemetry: TelemetryData, wall_time: Optional[float] = None):
+        """Añade un frame decodificado a la grabación"""
+        columns = self._columns
+        columns["wall_time"].append(time.time() if wall_time is None else wall_time)
+        columns["fuel"].append(telemetry.fuel)
+        columns["max_fuel"].append(telemetry.max_fuel)
+        columns["session_time"].append(telemetry.session_time)
+        columns["last_lap_time"].append(telemetry.last_lap_time)
+        columns["lap_dist"].append(telemetry.lap_dist)
+        columns["track_length"].append(telemetry.track_length)
+        columns["lap"].append(telemetry.lap)
+        columns["total_laps"].append(telemetry.total_laps)
+        self.frames_recorded += 1
+        if len(columns["fuel"]) >= self.chunk_frames:
+            self._flush_columns()
+
+    def snapshot(self, raw: bytes, wall_time: Optional[float] = None):
+        """Añade una copia cruda del mapa de memoria compartida"""
+        self._enqueue((KIND_SNAPSHOT, time.time() if wall_time is None else wall_time, raw))
+
+    def set_metadata(self, **metadata):
+        """Añade metadatos de la sesión (circuito, coche...)"""
+        payload = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+        self._enqueue((KIND_METADATA, time.time(), payload))
+
+    def _flush_columns(self):
+        """Entrega el chunk actual al hilo escritor y empieza uno nuevo"""
+        if not len(self._columns["fuel"]):
+            return
+        columns, self._columns = self._columns, self._new_columns()
+        self._enqueue((KIND_TELEMETRY, 0.0, columns))
+
+    def _enqueue(self, item):
+        if self.error is not None:
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    def close(self):
+        """Vuelca lo pendiente, escribe el índice y cierra el fichero"""
+        if self._thread is None:
+            return
+        self._flush_columns()
+        # Nunca se bloquea: con la cola llena o el hilo atascado se abandona
+        try:
+            if self._thread.is_alive():
+                self._queue.put(None, timeout=CLOSE_TIMEOUT)
+                self._thread.join(CLOSE_TIMEOUT)
+        except queue.Full:
+            pass
+        if self._thread.is_alive():
+            print(f"Aviso: la grabación {self.path} no se cerró a tiempo (sin índice)")
+        self._thread = None
+
+    # --- Hilo escritor ---
+
+    def _writer_loop(self):
+        # Tras un error se sigue vaciando la cola (sin escribir) hasta el cierre
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            kind, wall_time, payload = item
+            try:
+                if kind == KIND_TELEMETRY:
+                    self._write_telemetry(payload)
+                else:
+                    self._write_chunk(kind, 1, wall_time, wall_time, payload)
+            except OSError as e:
+                self._fail(e)
+        try:
+            if self.error is None:
+                self._write_index()
+            self._file.close()
+        except OSError as e:
+            self._fail(e)
+
+    def _fail(self, error: OSError):
+        if self.error is None:
+            self.error = str(error)
+            print(f"Aviso: error escribiendo la grabación {self.path}: {error}")
+
+    def _write_chunk(self, kind: bytes, count: int, t_first: float, t_last: float,
+                     *payloads: bytes):
+        size = sum(len(p) for p in payloads)
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(kind, size, count, t_first, t_last))
+        for payload in payloads:
+            self._file.write(payload)
+        self._file.write(b"\0" * _padding(size))
+        if kind != KIND_INDEX:
+            self._index.append(ChunkInfo(kind, offset, count, t_first, t_last))
+
+    def _write_telemetry(self, columns: Dict[str, array]):
+        wall_time = columns["wall_time"]
+        payloads = [columns[name].tobytes() for name in COLUMN_NAMES]
+        self._write_chunk(KIND_TELEMETRY, len(wall_time), wall_time[0], wall_time[-1], *payloads)
+
+    def _write_index(self):
+        entries = b"".join(INDEX_ENTRY.pack(c.kind, c.offset, c.count, c.t_first, c.t_last)
+                           for c in self._index)
+        index_offset = self._file.tell()
+        self._write_chunk(KIND_INDEX, len(self._index), 0.0, 0.0, entries)
+        self._file.write(TRAILER.pack(index_offset, INDEX_MAGIC))
+
+
+class SessionReader:
+    """Lector de grabaciones: mapea el fichero y accede a los chunks por índice"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mem = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_columns, self.chunk_frames = FILE_HEADER.unpack_from(self._mem, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} no es una grabación de sesión")
+        self.columns = COLUMNS_BY_VERSION.get(version)
+        if self.columns is None or n_columns != len(self.columns):
+            raise ValueError(f"Versión de grabación no soportada: {version}")
+
+        self.chunks = self._read_index()
+        self.telemetry_chunks = [c for c in self.chunks if c.kind == KIND_TELEMETRY]
+
+        # Frame inicial de cada chunk de telemetría, para buscar por rango
+        self._starts = []
+        total = 0
+        for chunk in self.telemetry_chunks:
+            self._starts.append(total)
+            total += chunk.count
+        self.frame_count = total
+
+    def _read_index(self) -> List[ChunkInfo]:
+        """Lee el índice del trailer o lo reconstruye recorriendo los chunks"""
+        mem = self._mem
+        if len(mem) >= FILE_HEADER.size + TRAILER.size:
+            index_offset, magic = TRAILER.unpack_from(mem, len(mem) - TRAILER.size)
+            if magic == INDEX_MAGIC:
+                kind, size, count, _, _ = CHUNK_HEADER.unpack_from(mem, index_offset)
+                start = index_offset + CHUNK_HEADER.size
+                return [ChunkInfo(*INDEX_ENTRY.unpack_from(mem, start + i * INDEX_ENTRY.size))
+                        for i in range(count)]
+
+        # Grabación interrumpida: se recorren solo las cabeceras
+        chunks = []
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= len(mem):
+            kind, size, count, t_first, t_last = CHUNK_HEADER.unpack_from(mem, offset)
+            end = offset + CHUNK_HEADER.size + size + _padding(size)
+            if kind not in (KIND_TELEMETRY, KIND_SNAPSHOT, KIND_METADATA) or end > len(mem):
+                break
+            chunks.append(ChunkInfo(kind, offset, count, t_first, t_last))
+            offset = end
+        return chunks
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def column_chunks(self, name: str) -> List[memoryview]:
+        """Vistas sin copia de una columna, una por chunk de telemetría"""
+        views = []
+        for chunk in self.telemetry_chunks:
+            offset = chunk.offset + CHUNK_HEADER.size
+            for column, typecode in self.columns:
+                size = chunk.count * struct.calcsize(typecode)
+                if column == name:
+                    views.append(memoryview(self._mem)[offset:offset + size].cast(typecode))
+                    break
+                offset += size
+            else:
+                raise KeyError(name)
+        return views
+
+    def column(self, name: str) -> array:
+        """Columna completa concatenada en un array"""
+        typecode = dict(self.columns)[name]
+        result = array(typecode)
+        for view in self.column_chunks(name):
+            result.frombytes(view.tobytes())
+            view.release()
+        return result
+
+    def frames(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[float, TelemetryData]]:
+        """Itera (wall_time, TelemetryData) en el rango [start, stop)"""
+        if stop is None or stop > self.frame_count:
+            stop = self.frame_count
+        if start >= stop:
+            return
+        chunk_index = bisect_right(self._starts, start) - 1
+        position = start
+        while position < stop:
+            chunk = self.telemetry_chunks[chunk_index]
+            first = position - self._starts[chunk_index]
+            last = min(chunk.count, stop - self._starts[chunk_index])
+            values = self._decode_chunk(chunk)
+            # Las grabaciones v1 no tienen distancia en la vuelta
+            zeros = [0.0] * chunk.count
+            lap_dist = values.get("lap_dist", zeros)
+            track_length = values.get("track_length", zeros)
+            for i in range(first, last):
+                yield values["wall_time"][i], TelemetryData(
+                    fuel=values["fuel"][i],
+                    max_fuel=values["max_fuel"][i],
+                    lap=values["lap"][i],
+                    total_laps=values["total_laps"][i],
+                    session_time=values["session_time"][i],
+                    last_lap_time=values["last_lap_time"][i],
+                    lap_dist=lap_dist[i],
+                    track_length=track_length[i],
+                )
+            position += last - first
+            chunk_index += 1
+
+    def _decode_chunk(self, chunk: ChunkInfo) -> Dict[str, array]:
+        """Copia las columnas de un chunk a arrays"""
+        values = {}
+        offset = chunk.offset + CHUNK_HEADER.size
+        for name, typecode in self.columns:
+            column = array(typecode)
+            size = chunk.count * column.itemsize
+            column.frombytes(self._mem[offset:offset + size])
+            values[name] = column
+            offset += size
+        return values
+
+    def snapshots(self) -> List[Tuple[float, bytes]]:
+        """Capturas crudas de memoria (wall_time, bytes)"""
+        result = []
+        for chunk in self.chunks:
+            if chunk.kind == KIND_SNAPSHOT:
+                size = CHUNK_HEADER.unpack_from(self._mem, chunk.offset)[1]
+                start = chunk.offset + CHUNK_HEADER.size
+                result.append((chunk.t_first, self._mem[start:start + size]))
+        return result
+
+    @property
+    def metadata(self) -> dict:
+        """Metadatos de la sesión (los chunks META posteriores sobrescriben)"""
+        result = {}
+        for chunk in self.chunks:
+            if chunk.kind == KIND_METADATA:
+                size = CHUNK_HEADER.unpack_from(self._mem, chunk.offset)[1]
+                start = chunk.offset + CHUNK_HEADER.size
+                result.update(json.loads(self._mem[start:start + size].decode("utf-8")))
+        return result
+
+    def close(self):
+        self._mem.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def new_session_path(directory: str) -> str:
+    """Ruta de una grabación nueva con fecha y hora"""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("session_%Y%m%d_%H%M%S.lmurec"))
@@ -0,0 +1,116 @@
+"""
+Reproducción de sesiones grabadas (.lmurec)
+
+ReplayConnector sustituye al conector del juego en FuelMonitor y entrega los
+frames grabados a velocidad real, N veces más rápido o lo más rápido posible,
+para probar cambios de la calculadora contra datos reales sin conducir.
+
+Uso:
+    python replay.py sessions/session_X.lmurec [--speed 10] [--headless]
+"""
+
+import argparse
+import time
+from typing import Optional
+from config import Config
+from display import NullDisplay, create_display
+from fuel_monitor import FuelMonitor
+from recorder import SessionReader
+from telemetry import TelemetryData
+
+
+class ReplayConnector:
+    """Conector que lee frames de una grabación en lugar del juego"""
+
+    # Marca su propio ritmo: FuelMonitor no debe dormir entre lecturas
+    REALTIME = False
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed  # 1.0 = tiempo real, N = N veces más rápido, 0 = sin esperas
+        self.reader: Optional[SessionReader] = None
+        self.frames_read = 0
+        self.finished = False
+        self._frames = None
+        self._first_wall_time: Optional[float] = None
+        self._start = 0.0
+
+    def connect(self) -> bool:
+        """Abre la grabación"""
+        try:
+            self.reader = SessionReader(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Error al abrir la grabación: {e}")
+            return False
+        self._frames = self.reader.frames()
+        self._start = time.perf_counter()
+        return True
+
+    def read_telemetry(self) -> Optional[TelemetryData]:
+        """Devuelve el siguiente frame, esperando si hace falta para respetar la velocidad"""
+        if self._frames is None or self.finished:
+            return None
+        try:
+            wall_time, telemetry = next(self._frames)
+        except StopIteration:
+            self.finished = True
+            return None
+
+        if self._first_wall_time is None:
+            self._first_wall_time = wall_time
+        if self.speed > 0:
+            due = (wall_time - self._first_wall_time) / self.speed
+            wait = due - (time.perf_counter() - self._start)
+            if wait > 0:
+                time.sleep(wait)
+
+        self.frames_read += 1
+        return telemetry
+
+    def read_update_counter(self) -> Optional[int]:
+        """Cada lectura entrega un frame nuevo"""
+        return None
+
+    def read_raw(self) -> bytes:
+        return b""
+
+    def disconnect(self):
+        """Cierra la grabación"""
+        self._frames = None
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+
+
+def replay_session(path: str, speed: float = 0.0, display=None) -> FuelMonitor:
+    """Reproduce una grabación completa y devuelve el monitor con el estado final"""
+    connector = ReplayConnector(path, speed)
+    monitor = FuelMonitor(connector=connector,
+                          display=display if display is not None else NullDisplay())
+    monitor.start()
+    return monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una sesión grabada")
+    parser.add_argument("path", help="Fichero .lmurec")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = tiempo real, N = N veces más rápido, 0 = lo más rápido posible")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin display (solo resumen final)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    display = NullDisplay() if args.headless else create_display(Config())
+    monitor = replay_session(args.path, args.speed, display)
+    elapsed = time.perf_counter() - start
+
+    frames = monitor.connector.frames_read
+    analysis = monitor.calculator.get_analysis()
+    print(f"\nFrames reproducidos: {frames} en {elapsed:.2f}s "
+          f"({frames / elapsed if elapsed > 0 else 0:.0f} frames/s)")
+    print(f"Consumo promedio: {analysis.avg_consumption:.3f}L | Estado final: {analysis.message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Conector sin copias para la memoria compartida de rFactor 2 / Le Mans Ultimate
+
+Mapea las estructuras ctypes directamente sobre el mmap con from_buffer,
+de modo que cada lectura accede solo a los campos necesarios. Los contadores
+mVersionUpdateBegin/mVersionUpdateEnd permiten detectar frames a medio
+escribir por el plugin y reintentar la lectura.
+"""
+
+import ctypes
+import time
+from typing import Optional
+from config import Config
+from telemetry import TelemetryData
+from rf2_structs import MAX_VEHICLES, rF2Telemetry, rF2Scoring
+from shmem import open_shared_memory
+
+
+class RF2DirectConnector:
+    """Conector ctypes con vistas directas (sin copias) sobre la memoria compartida"""
+
+    # Lee datos en vivo: FuelMonitor marca el ritmo de sondeo
+    REALTIME = True
+
+    def __init__(self):
+        self.config = Config()
+        self.telemetry_mem = None
+        self.scoring_mem = None
+
+        # Vistas ctypes sobre los buffers (no copian datos)
+        self.telemetry = None
+        self.scoring = None
+        self._player_phys = None
+        self._player_scoring = None
+        self._scoring_info = None
+        self._last_scoring_attempt = 0.0
+
+        # Nombres de circuito y coche: solo se decodifican cuando cambian los bytes
+        self._names_version = None
+        self._track_raw = b""
+        self._vehicle_raw = b""
+        self.track_name = ""
+        self.vehicle_name = ""
+
+        # Estadísticas de lecturas inconsistentes
+        self.torn_frames = 0  # Intentos descartados por frame a medio escribir
+        self.dropped_frames = 0  # Frames perdidos tras agotar los reintentos
+
+    def connect(self) -> bool:
+        """Intenta conectar con los buffers de memoria compartida"""
+        try:
+            self.telemetry_mem = open_shared_memory(self.config.SHARED_MEMORY_NAME,
+                                                    ctypes.sizeof(rF2Telemetry),
+                                                    self.config.SHARED_MEMORY_DIR)
+        except FileNotFoundError:
+            # Si falla la telemetría principal, el juego no está listo
+            return False
+        except Exception as e:
+            print(f"Error al conectar: {e}")
+            return False
+
+        self.telemetry = rF2Telemetry.from_buffer(self.telemetry_mem)
+        # El jugador local es el índice 0 en la vista de telemetría
+        self._player_phys = self.telemetry.mVehicles[0]
+
+        # Scoring tarda a veces en inicializarse, se reintenta en read_telemetry
+        self._open_scoring()
+        return True
+
+    def _open_scoring(self):
+        """Intenta abrir el buffer de Scoring"""
+        self._last_scoring_attempt = time.monotonic()
+        try:
+            self.scoring_mem = open_shared_memory(self.config.SCORING_MEMORY_NAME,
+                                                  ctypes.sizeof(rF2Scoring),
+                                                  self.config.SHARED_MEMORY_DIR)
+        except (FileNotFoundError, OSError):
+            return
+        self.scoring = rF2Scoring.from_buffer(self.scoring_mem)
+        # Cada acceso a un campo estructura crea un objeto: se guarda la vista
+        self._scoring_info = self.scoring.mScoringInfo
+
+    def _find_player_scoring(self, player_id: int):
+        """Busca el vehículo del jugador en el array de Scoring"""
+        vehicles = self.scoring.mVehicles
+        num_vehicles = min(self.scoring.mScoringInfo.mNumVehicles, MAX_VEHICLES)
+        for i in range(num_vehicles):
+            if vehicles[i].mID == player_id:
+                return vehicles[i]
+        return None
+
+    def read_telemetry(self) -> Optional[TelemetryData]:
+        """Lee los campos necesarios directamente de la memoria compartida"""
+        data = TelemetryData()
+        return data if self.read_telemetry_into(data) else None
+
+    def read_telemetry_into(self, data) -> bool:
+        """
+        Rellena `data` (TelemetryData o TelemetryFrame) sin crear objetos
+
+        Devuelve False si no hay frame íntegro que leer.
+        """
+        if self.telemetry is None:
+            return False
+
+        retries = self.config.TORN_READ_RETRIES
+        telemetry = self.telemetry
+        phys = self._player_phys
+
+        # --- FÍSICAS (COMBUSTIBLE) ---
+        # El plugin incrementa Begin antes de escribir y End al terminar:
+        # si End leído antes coincide con Begin leído después, el frame es íntegro
+        for _ in range(retries + 1):
+            version = telemetry.mVersionUpdateEnd
+            fuel = phys.mFuel
+            player_id = phys.mID
+            if telemetry.mVersionUpdateBegin == version:
+                break
+            self.torn_frames += 1
+        else:
+            self.dropped_frames += 1
+            return False
+
+        data.fuel = fuel
+        # LMU no exporta la capacidad del tanque en la telemetría
+        data.max_fuel = self.config.DEFAULT_MAX_FUEL
+
+        # --- SCORING (VUELTAS Y TIEMPOS) ---
+        if self.scoring is None:
+            if time.monotonic() - self._last_scoring_attempt > 1.0:
+                self._open_scoring()
+            return True
+
+        scoring = self.scoring
+        info = self._scoring_info
+        for _ in range(retries + 1):
+            version = scoring.mVersionUpdateEnd
+            player = self._player_scoring
+            if player is None or player.mID != player_id:
+                player = self._player_scoring = self._find_player_scoring(player_id)
+            session_time = info.mCurrentET
+            total_laps = info.mMaxLaps
+            track_length = info.mLapDist
+            if player is not None:
+                lap = player.mTotalLaps
+                last_lap_time = player.mLastLapTime
+                lap_dist = player.mLapDist
+                in_pits = player.mInPits
+            else:
+                lap = 0
+                last_lap_time = 0.0
+                lap_dist = 0.0
+                in_pits = False
+            if scoring.mVersionUpdateBegin == version:
+                break
+            self.torn_frames += 1
+        else:
+            self.dropped_frames += 1
+            return False
+
+        data.session_time = session_time
+        data.total_laps = total_laps
+        data.lap = lap
+        data.last_lap_time = last_lap_time
+        data.lap_dist = lap_dist
+        data.track_length = track_length
+        data.in_pits = in_pits
+
+        if version != self._names_version:
+            self._update_names(info, player)
+            self._names_version = version
+        data.track_name = self.track_name
+        data.vehicle_name = self.vehicle_name
+        return True
+
+    def _update_names(self, info, player):
+        """Decodifica circuito y coche si han cambiado"""
+        track_raw = info.mTrackName
+        if track_raw != self._track_raw:
+            self._track_raw = track_raw
+            self.track_name = track_raw.decode("utf-8", "replace")
+        vehicle_raw = player.mVehicleName if player is not None else b""
+        if vehicle_raw != self._vehicle_raw:
+            self._vehicle_raw = vehicle_raw
+            self.vehicle_name = vehicle_raw.decode("utf-8", "replace")
+
+    def read_raw(self) -> bytes:
+        """Copia cruda del mapa de telemetría"""
+        return self.telemetry_mem[:]
+
+    def read_update_counter(self) -> Optional[int]:
+        """Contador que cambia cada vez que el plugin publica un frame"""
+        if self.telemetry is None:
+            return None
+        counter = self.telemetry.mVersionUpdateEnd
+        if self.scoring is not None:
+            counter += self.scoring.mVersionUpdateEnd
+        return counter
+
+    def disconnect(self):
+        """Libera las vistas y cierra los buffers"""
+        # Las vistas ctypes exportan el buffer: hay que soltarlas antes de cerrar
+        self._player_phys = None
+        self._player_scoring = None
+        self._scoring_info = None
+        self.telemetry = None
+        self.scoring = None
+        if self.telemetry_mem:
+            self.telemetry_mem.close()
+            self.telemetry_mem = None
+        if self.scoring_mem:
+            self.scoring_mem.close()
+            self.scoring_mem = None
@@ -0,0 +1,95 @@
+"""
+Estructuras ctypes de la memoria compartida de rFactor 2 / Le Mans Ultimate
+Basadas en el prototipo de cambio_prueba.txt
+"""
+
+import ctypes
+
+# Número máximo de vehículos publicados por el plugin
+MAX_VEHICLES = 64
+
+
+# 1. Estructura de Telemetría (Físicas, Combustible)
+class rF2VehicleTelemetry(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ("mID", ctypes.c_int),                    # 0
+        ("mDeltaTime", ctypes.c_double),          # 4
+        ("mEngineRPM", ctypes.c_double),          # 12
+        ("mEngineWaterTemp", ctypes.c_double),    # 20
+        ("mEngineOilTemp", ctypes.c_double),      # 28
+        ("mClutchRPM", ctypes.c_double),          # 36
+        ("mUnfilteredThrottle", ctypes.c_double), # 44
+        ("mUnfilteredBrake", ctypes.c_double),    # 52
+        ("mUnfilteredSteering", ctypes.c_double), # 60
+        ("mUnfilteredClutch", ctypes.c_double),   # 68
+        ("mSteeringArmForce", ctypes.c_double),   # 76
+        ("mFuel", ctypes.c_double),               # 84
+        ("mEngineMaxRPM", ctypes.c_double),       # 92
+        ("mScheduledStops", ctypes.c_byte),
+        ("mOverheating", ctypes.c_byte),
+        ("mDetached", ctypes.c_byte),
+        ("mHeadlights", ctypes.c_byte),
+        ("mPadding", ctypes.c_byte * 4)           # Relleno para alineación
+    ]
+
+
+class rF2Telemetry(ctypes.Structure):
+    _fields_ = [
+        ("mVersionUpdateBegin", ctypes.c_uint),  # Se incrementa ANTES de escribir
+        ("mVersionUpdateEnd", ctypes.c_uint),    # Se incrementa DESPUÉS de escribir
+        ("mLoadSessionBegin", ctypes.c_int),
+        ("mLoadSessionEnd", ctypes.c_int),
+        ("mNumVehicles", ctypes.c_int),
+        ("mVehicles", rF2VehicleTelemetry * MAX_VEHICLES)
+    ]
+
+
+# 2. Estructura de Scoring (Vueltas, Tiempo, Info de Sesión)
+class rF2VehicleScoring(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ("mID", ctypes.c_int),
+        ("mDriverName", ctypes.c_char * 32),
+        ("mVehicleName", ctypes.c_char * 64),
+        ("mTotalLaps", ctypes.c_short),           # Vueltas completadas
+        ("mSector", ctypes.c_byte),
+        ("mFinishStatus", ctypes.c_byte),
+        ("mLapDist", ctypes.c_double),
+        ("mPathLat", ctypes.c_double),
+        ("mRelevantTrackEdge", ctypes.c_double),
+        ("mFastestLapTime", ctypes.c_double),
+        ("mLastLapTime", ctypes.c_double),        # Último tiempo de vuelta
+        ("mBestSector1", ctypes.c_double),
+        ("mBestSector2", ctypes.c_double),
+        ("mBestSector3", ctypes.c_double),
+        ("mKPH", ctypes.c_double),
+        ("mMaxKPH", ctypes.c_double),
+        ("mPortable", ctypes.c_byte),
+        ("mInPits", ctypes.c_bool)                # En el pit lane (entre entrada y salida)
+    ]
+
+
+class rF2ScoringInfo(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ("mTrackName", ctypes.c_char * 64),
+        ("mSession", ctypes.c_int),
+        ("mCurrentET", ctypes.c_double),          # Tiempo de sesión actual
+        ("mEndET", ctypes.c_double),
+        ("mMaxLaps", ctypes.c_int),               # Total de vueltas de la carrera
+        ("mLapDist", ctypes.c_double),            # Longitud de la pista
+        ("mNumVehicles", ctypes.c_int),
+    ]
+
+
+class rF2Scoring(ctypes.Structure):
+    """Buffer de Scoring completo: contadores de versión + info + vehículos"""
+    _pack_ = 4
+    _fields_ = [
+        ("mVersionUpdateBegin", ctypes.c_uint),
+        ("mVersionUpdateEnd", ctypes.c_uint),
+        ("mBytesUpdatedHint", ctypes.c_int),
+        ("mScoringInfo", rF2ScoringInfo),
+        ("mVehicles", rF2VehicleScoring * MAX_VEHICLES)
+    ]
@@ -0,0 +1,96 @@
+"""
+Planificador adaptativo del bucle principal
+
+Solo se procesan frames nuevos (según el contador de actualización de la
+memoria compartida o, si el conector no lo tiene, según los datos leídos).
+El intervalo de sondeo se alarga cuando la sesión está en pausa o en menús
+y se acorta cerca del cruce de meta, donde se muestrea el combustible.
+"""
+
+from typing import Optional
+from config import Config
+
+
+class AdaptiveScheduler:
+    """Calcula cuándo volver a leer la memoria compartida"""
+
+    def __init__(self):
+        self.config = Config()
+        self.normal_interval = self.config.DISPLAY_UPDATE_RATE
+        self.fast_interval = self.config.POLL_INTERVAL_FAST
+        self.idle_interval_max = self.config.POLL_INTERVAL_IDLE_MAX
+
+        self.last_counter: Optional[int] = None
+        self.idle_polls = 0  # Sondeos consecutivos sin datos nuevos
+
+        # Último frame observado
+        self.last_fuel: Optional[float] = None
+        self.last_lap = 0
+        self.last_total_laps = 0
+        self.last_session_time: Optional[float] = None
+        self.last_lap_time = 0.0
+
+        # Tiempo de sesión en el que empezó la vuelta actual
+        self.lap_start_time: Optional[float] = None
+
+    def is_new_frame(self, counter: Optional[int]) -> bool:
+        """Indica si el juego ha publicado un frame desde el último sondeo"""
+        if counter is None:
+            # Sin contador: hay que leer y comparar los datos (observe)
+            return True
+        if counter == self.last_counter:
+            self.idle_polls += 1
+            return False
+        self.last_counter = counter
+        return True
+
+    def observe(self, telemetry) -> bool:
+        """
+        Registra un frame leído; devuelve True si trae datos nuevos
+
+        Una lectura vacía (None: juego cerrado, menús de SimHub, frame roto)
+        cuenta como sondeo sin datos, igual que un frame repetido.
+        """
+        if telemetry is None:
+            self.idle_polls += 1
+            return False
+        changed = (
+            telemetry.session_time != self.last_session_time
+            or telemetry.fuel != self.last_fuel
+            or telemetry.lap != self.last_lap
+            or telemetry.total_laps != self.last_total_laps
+            or telemetry.last_lap_time != self.last_lap_time
+        )
+        if not changed:
+            # Sesión en pausa o en menús: el juego no avanza
+            self.idle_polls += 1
+            return False
+
+        self.idle_polls = 0
+        if telemetry.lap != self.last_lap:
+            self.lap_start_time = telemetry.session_time
+
+        self.last_fuel = telemetry.fuel
+        self.last_lap = telemetry.lap
+        self.last_total_laps = telemetry.total_laps
+        self.last_session_time = telemetry.session_time
+        self.last_lap_time = telemetry.last_lap_time
+        return True
+
+    def near_lap_crossing(self) -> bool:
+        """Indica si se espera un cruce de meta en breve"""
+        if self.lap_start_time is None or self.last_lap_time <= 0 \
+                or self.last_session_time is None:
+            return False
+        expected = self.lap_start_time + self.last_lap_time
+        return abs(expected - self.last_session_time) <= self.config.LAP_CROSSING_WINDOW
+
+    def next_interval(self) -> float:
+        """Segundos a esperar antes del siguiente sondeo"""
+        if self.idle_polls > self.config.IDLE_POLLS_BEFORE_BACKOFF:
+            # Retroceso exponencial mientras no haya frames nuevos
+            exponent = min(self.idle_polls - self.config.IDLE_POLLS_BEFORE_BACKOFF, 10)
+            return min(self.normal_interval * (2 ** exponent), self.idle_interval_max)
+        if self.near_lap_crossing():
+            return self.fast_interval
+        return self.normal_interval
@@ -0,0 +1,268 @@
+"""
+Log de sesión y CSV con el histórico de vueltas
+
+- CSV: una fila por vuelta completada (vuelta, combustible en la línea,
+  consumo, tiempo de vuelta, estado, balance...).
+- Log: eventos de la sesión (inicio, circuito y coche, repostajes, cambios
+  de estado, fin).
+
+Ninguna escritura ocurre en el hilo que llama: las líneas se encolan y un
+hilo escritor las agrupa, vuelca cada LOG_FLUSH_INTERVAL segundos y hace
+fsync cada LOG_FSYNC_INTERVAL. Cada fichero rota al superar LOG_MAX_BYTES y
+se conservan LOG_BACKUP_COUNT copias, así que el disco usado está acotado
+aunque la carrera dure 24 horas.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+from advanced_config import AdvancedConfig
+
+CSV_COLUMNS = ("timestamp", "lap", "fuel_at_line", "consumption", "lap_time",
+               "avg_consumption", "fuel_balance", "laps_remaining", "status", "lap_class")
+
+
+class RotatingFile:
+    """Fichero de texto que rota por tamaño (fichero.1, fichero.2...)"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int, header: str = ""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.header = header  # Se repite al principio de cada fichero (CSV)
+        self.file = None
+        self.size = 0
+
+    def open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8", newline="")
+        self.size = self.file.tell()
+        if self.size == 0 and self.header:
+            self._write(self.header)
+
+    def _write(self, text: str):
+        self.file.write(text)
+        self.size += len(text.encode("utf-8"))
+
+    def write_lines(self, lines: List[str]):
+        """Escribe un lote de líneas, rotando entre ellas si se supera el tamaño"""
+        chunk: List[str] = []
+        size = self.size
+        for line in lines:
+            length = len(line.encode("utf-8"))
+            if size + length > self.max_bytes and size > len(self.header):
+                self._write("".join(chunk))
+                chunk = []
+                self.rotate()
+                size = self.size
+            chunk.append(line)
+            size += length
+        self._write("".join(chunk))
+
+    def rotate(self):
+        """Cierra el fichero actual, desplaza las copias y empieza uno nuevo"""
+        self.file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.open()
+
+    def flush(self, fsync: bool = False):
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.flush(fsync=True)
+            self.file.close()
+            self.file = None
+
+
+class BackgroundWriter:
+    """Hilo que escribe por lotes en varios RotatingFile"""
+
+    def __init__(self, flush_interval: float = 1.0, fsync_interval: float = 10.0,
+                 batch_size: int = 512):
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.files: List[RotatingFile] = []
+        self.thread: Optional[threading.Thread] = None
+        self.errors = 0
+
+    def add(self, target: RotatingFile) -> RotatingFile:
+        self.files.append(target)
+        return target
+
+    def start(self):
+        for target in self.files:
+            target.open()
+        # No daemon: al salir se vacía la cola antes de terminar
+        self.thread = threading.Thread(target=self._run, name="session-log")
+        self.thread.start()
+
+    def write(self, target: RotatingFile, text: str):
+        """Encola texto para `target` (nunca toca el disco)"""
+        self.queue.put((target, text))
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        last_fsync = time.monotonic()
+        stopping = False
+        while not stopping:
+            batch: Dict[RotatingFile, List[str]] = {}
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            # Se recoge lo pendiente en un solo lote
+            count = 0
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                if item:
+                    target, text = item
+                    batch.setdefault(target, []).append(text)
+                    count += 1
+                    if count >= self.batch_size:
+                        break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            now = time.monotonic()
+            fsync = stopping or now - last_fsync >= self.fsync_interval
+            try:
+                for target, lines in batch.items():
+                    target.write_lines(lines)
+                for target in self.files:
+                    target.flush(fsync)
+            except OSError as e:
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"Aviso: error escribiendo el log de sesión: {e}")
+            if fsync:
+                last_fsync = now
+
+        for target in self.files:
+            try:
+                target.close()
+            except OSError:
+                pass
+
+
+class SessionLog:
+    """Eventos de la sesión y filas por vuelta, escritos en segundo plano"""
+
+    def __init__(self, log_path: Optional[str] = None, csv_path: Optional[str] = None,
+                 max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5,
+                 flush_interval: float = 1.0, fsync_interval: float = 10.0,
+                 refuel_threshold: float = 1.0):
+        self.writer = BackgroundWriter(flush_interval, fsync_interval)
+        self.log = self.writer.add(RotatingFile(log_path, max_bytes, backup_count)) \
+            if log_path else None
+        self.csv = self.writer.add(RotatingFile(csv_path, max_bytes, backup_count,
+                                                header=",".join(CSV_COLUMNS) + "\n")) \
+            if csv_path else None
+        self.refuel_threshold = refuel_threshold
+
+        self.last_lap: Optional[int] = None
+        self.last_fuel: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.laps_logged = 0
+
+    @classmethod
+    def from_config(cls, advanced: AdvancedConfig) -> Optional["SessionLog"]:
+        """SessionLog según ENABLE_LOGGING / SAVE_LAP_HISTORY_CSV (None si ambos están desactivados)"""
+        if not advanced.ENABLE_LOGGING and not advanced.SAVE_LAP_HISTORY_CSV:
+            return None
+        return cls(
+            log_path=advanced.LOG_FILE_PATH if advanced.ENABLE_LOGGING else None,
+            csv_path=advanced.CSV_FILE_PATH if advanced.SAVE_LAP_HISTORY_CSV else None,
+            max_bytes=advanced.LOG_MAX_BYTES,
+            backup_count=advanced.LOG_BACKUP_COUNT,
+            flush_interval=advanced.LOG_FLUSH_INTERVAL,
+            fsync_interval=advanced.LOG_FSYNC_INTERVAL,
+            refuel_threshold=advanced.REFUEL_THRESHOLD,
+        )
+
+    def start(self):
+        self.writer.start()
+        self.event("Sesión iniciada")
+
+    def event(self, message: str):
+        if self.log is not None:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.writer.write(self.log, f"{stamp} | {message}\n")
+
+    def lap_row(self, lap: int, fuel_at_line: float, consumption: Optional[float],
+                lap_time: float, analysis, lap_class: str = ""):
+        if self.csv is None:
+            return
+        row = (
+            time.strftime("%Y-%m-%dT%H:%M:%S"),
+            str(lap),
+            f"{fuel_at_line:.3f}",
+            f"{consumption:.3f}" if consumption is not None else "",
+            f"{lap_time:.3f}" if lap_time > 0 else "",
+            f"{analysis.avg_consumption:.3f}",
+            f"{analysis.fuel_balance:.3f}",
+            str(analysis.laps_remaining),
+            analysis.status,
+            lap_class,
+        )
+        self.writer.write(self.csv, ",".join(row) + "\n")
+        self.laps_logged += 1
+
+    def observe(self, telemetry, analysis, lap_consumption: Optional[float],
+                lap_class: str = ""):
+        """
+        Registra un frame analizado
+
+        lap_consumption es el consumo de la última vuelta completada según la
+        calculadora (None si no fue válida, por ejemplo con repostaje) y
+        lap_class su clasificación (FuelCalculator.last_lap_class).
+        """
+        if self.last_lap is None:
+            self.last_lap = telemetry.lap
+            self.last_fuel = telemetry.fuel
+            self.last_status = analysis.status
+            return
+
+        if telemetry.fuel > self.last_fuel + self.refuel_threshold:
+            self.event(f"Repostaje: +{telemetry.fuel - self.last_fuel:.1f}L "
+                       f"(vuelta {telemetry.lap}, {telemetry.fuel:.1f}L)")
+
+        if telemetry.lap > self.last_lap:
+            consumption = lap_consumption if telemetry.lap == self.last_lap + 1 else None
+            self.lap_row(self.last_lap, telemetry.fuel, consumption,
+                         telemetry.last_lap_time, analysis, lap_class)
+
+        if analysis.status != self.last_status:
+            self.event(f"Estado {self.last_status} -> {analysis.status} "
+                       f"(vuelta {telemetry.lap}): {analysis.message}")
+
+        self.last_lap = telemetry.lap
+        self.last_fuel = telemetry.fuel
+        self.last_status = analysis.status
+
+    def close(self):
+        self.event(f"Sesión detenida ({self.laps_logged} vueltas registradas)")
+        self.writer.close()
@@ -0,0 +1,44 @@
+"""
+Apertura de mapas de memoria compartida
+
+En Windows el juego publica mapas con nombre ("$rFactor2SMMP_Telemetry$"...).
+En Linux (emulador, CI) se usan ficheros mapeados con el mismo nombre dentro
+de un directorio, normalmente /dev/shm.
+"""
+
+import mmap
+import os
+from typing import Optional
+
+
+def map_path(directory: str, name: str) -> str:
+    """Ruta del fichero que respalda el mapa `name` dentro de `directory`"""
+    return os.path.join(directory, name.strip("$").replace("$", "_"))
+
+
+def open_shared_memory(name: str, size: int, directory: Optional[str] = None,
+                       create: bool = False, readonly: bool = False) -> mmap.mmap:
+    """
+    Abre (o crea) un mapa de memoria compartida
+
+    Sin `directory` se usa el mapa con nombre de Windows. Con `directory` se
+    mapea un fichero; si no existe y no se pide crearlo lanza FileNotFoundError,
+    igual que un mapa con nombre que el juego aún no ha creado.
+    """
+    access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+
+    if directory is None:
+        return mmap.mmap(-1, size, name, access=access)
+
+    path = map_path(directory, name)
+    if create:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+
+    with open(path, "rb" if readonly else "r+b") as f:
+        if os.fstat(f.fileno()).st_size < size:
+            raise FileNotFoundError(f"El mapa {path} aún no tiene el tamaño esperado")
+        # mmap duplica el descriptor: el fichero se puede cerrar
+        return mmap.mmap(f.fileno(), size, access=access)
@@ -0,0 +1,325 @@
+"""
+Conector de telemetría vía SimHub
+
+Lee http://127.0.0.1:8888/api/getgamedata con una única conexión HTTP/1.1
+persistente (keep-alive) en lugar de abrir una conexión por muestra, y extrae
+solo los campos de NewData que necesita el monitor sin decodificar el
+documento JSON completo (NewData y OldData tienen cientos de propiedades).
+
+AsyncSimHubConnector hace el sondeo con asyncio en un hilo de fondo, con un
+número acotado de peticiones en vuelo, y el bucle principal solo recoge el
+último frame recibido.
+
+Modos: CONNECTOR_MODE = "simhub" o "simhub_async"
+"""
+
+import asyncio
+import http.client
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from config import Config
+from telemetry import TelemetryData
+
+# Campos de NewData que usa el monitor
+SIMHUB_FIELDS = ("Fuel", "MaxFuel", "CurrentLap", "TotalLaps", "LastLapTime", "IsInPit")
+
+# "Campo": valor  (cadena, número o literal), sin parsear el resto del documento
+_FIELD_RE = re.compile(
+    rb'"(' + b"|".join(f.encode() for f in SIMHUB_FIELDS) + rb')"\s*:\s*'
+    rb'("(?:[^"\\]|\\.)*"|-?[0-9][0-9.eE+-]*|true|false|null)'
+)
+_NEWDATA_RE = re.compile(rb'"NewData"\s*:\s*')
+
+
+def parse_timespan(value) -> float:
+    """Convierte un TimeSpan de .NET ("[d.]hh:mm:ss[.fffffff]") o número a segundos"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    days = 0
+    if value.count(".") == 2 or ("." in value and value.index(".") < value.index(":")):
+        day_part, value = value.split(".", 1)
+        days = int(day_part)
+    hours, minutes, seconds = value.split(":")
+    return days * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _convert(raw: bytes):
+    if raw.startswith(b'"'):
+        return raw[1:-1].decode("utf-8", "replace")
+    if raw == b"true":
+        return True
+    if raw == b"false":
+        return False
+    if raw == b"null":
+        return None
+    return float(raw)
+
+
+def extract_new_data(body: bytes) -> Optional[Dict[str, object]]:
+    """
+    Valores de SIMHUB_FIELDS dentro de NewData
+
+    Devuelve None si no hay juego en marcha (NewData ausente o null).
+    """
+    match = _NEWDATA_RE.search(body)
+    if match is None or body.startswith(b"null", match.end()):
+        return None
+    start = match.end()
+    end = body.find(b'"OldData"', start)
+    if end < 0:
+        end = len(body)
+
+    values = {}
+    for field in _FIELD_RE.finditer(body, start, end):
+        name = field.group(1).decode()
+        # La primera aparición es la propiedad de NewData, no de objetos anidados
+        if name not in values:
+            values[name] = _convert(field.group(2))
+            if len(values) == len(SIMHUB_FIELDS):
+                break
+    return values
+
+
+def telemetry_from_values(values: Dict[str, object], session_time: float) -> TelemetryData:
+    """Construye TelemetryData con los campos extraídos de NewData"""
+    return TelemetryData(
+        fuel=float(values.get("Fuel") or 0.0),
+        max_fuel=float(values.get("MaxFuel") or 0.0),
+        lap=int(values.get("CurrentLap") or 0),
+        total_laps=int(values.get("TotalLaps") or 0),
+        session_time=session_time,
+        last_lap_time=parse_timespan(values.get("LastLapTime")),
+        in_pits=bool(values.get("IsInPit")),
+    )
+
+
+def _split_url(url: str) -> Tuple[str, int, str]:
+    parts = urlsplit(url)
+    return parts.hostname or "127.0.0.1", parts.port or 80, parts.path or "/"
+
+
+class SimHubConnector:
+    """Conector SimHub con una conexión HTTP/1.1 persistente"""
+
+    # Lee datos en vivo: FuelMonitor marca el ritmo de sondeo
+    REALTIME = True
+
+    def __init__(self, url: Optional[str] = None):
+        self.config = Config()
+        self.host, self.port, self.path = _split_url(url or self.config.SIMHUB_URL)
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.last_body = b""
+        self.start_time = time.monotonic()
+        self.read_errors = 0
+        self.last_error = ""
+
+    def connect(self) -> bool:
+        """Abre la conexión y comprueba que SimHub responde"""
+        self.connection = http.client.HTTPConnection(self.host, self.port,
+                                                     timeout=self.config.SIMHUB_TIMEOUT)
+        try:
+            self._fetch()
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Error al conectar con SimHub: {e}")
+            self.disconnect()
+            return False
+        self.start_time = time.monotonic()
+        return True
+
+    def _fetch(self) -> bytes:
+        """GET sobre la conexión abierta; reconecta una vez si el servidor la cerró"""
+        for attempt in range(2):
+            try:
+                self.connection.request("GET", self.path)
+                response = self.connection.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(f"HTTP {response.status}")
+                self.last_body = body
+                return body
+            except (OSError, http.client.HTTPException):
+                # http.client reabre el socket en la siguiente petición
+                self.connection.close()
+                if attempt:
+                    raise
+        return b""
+
+    def read_telemetry(self) -> Optional[TelemetryData]:
+        """Lee los datos de telemetría actuales"""
+        if self.connection is None:
+            return None
+        try:
+            values = extract_new_data(self._fetch())
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            # Se cuentan (ver instrumentation.py); solo se avisa del primero
+            self.read_errors += 1
+            self.last_error = str(e)
+            if self.read_errors == 1:
+                print(f"Error leyendo telemetría: {e}")
+            return None
+        if values is None:
+            return None
+        return telemetry_from_values(values, time.monotonic() - self.start_time)
+
+    def read_raw(self) -> bytes:
+        """Última respuesta JSON recibida"""
+        return self.last_body
+
+    def read_update_counter(self) -> Optional[int]:
+        """SimHub no publica contador de actualización"""
+        return None
+
+    def disconnect(self):
+        """Cierra la conexión"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class AsyncSimHubConnector:
+    """
+    Conector SimHub con sondeo asyncio en segundo plano
+
+    Mantiene SIMHUB_MAX_IN_FLIGHT conexiones keep-alive, cada una con como mucho
+    una petición en vuelo, escalonadas para repartir las muestras. Solo se
+    conserva el frame más reciente (por orden de envío de la petición).
+    """
+
+    REALTIME = True
+
+    def __init__(self, url: Optional[str] = None):
+        self.config = Config()
+        self.host, self.port, self.path = _split_url(url or self.config.SIMHUB_URL)
+        self.request = (f"GET {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                        f"Connection: keep-alive\r\n\r\n").encode("ascii")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.latest: Optional[TelemetryData] = None
+        self.latest_seq = 0  # Número de petición del frame más reciente
+        self.frames = 0  # Frames aceptados (contador de actualización)
+        self.next_seq = 0
+        self.errors = 0
+        self.last_body = b""
+        self.start_time = time.monotonic()
+        self.connected = threading.Event()
+        self.stopping = False
+
+    def connect(self) -> bool:
+        """Arranca el hilo de sondeo y espera a la primera respuesta"""
+        self.stopping = False
+        self.start_time = time.monotonic()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        if not self.connected.wait(self.config.SIMHUB_TIMEOUT * 2):
+            print("Error al conectar con SimHub: sin respuesta")
+            self.disconnect()
+            return False
+        return True
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        workers = max(1, self.config.SIMHUB_MAX_IN_FLIGHT)
+        try:
+            self.loop.run_until_complete(asyncio.gather(
+                *(self._worker(i, workers) for i in range(workers))))
+        finally:
+            self.loop.close()
+
+    async def _worker(self, index: int, workers: int):
+        interval = self.config.SIMHUB_POLL_INTERVAL
+        await asyncio.sleep(interval * index / workers)
+        reader = writer = None
+        while not self.stopping:
+            started = time.monotonic()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        self.config.SIMHUB_TIMEOUT)
+                self.next_seq += 1
+                seq = self.next_seq
+                writer.write(self.request)
+                body = await asyncio.wait_for(self._read_response(reader),
+                                              self.config.SIMHUB_TIMEOUT)
+                self._accept(seq, body)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                self.errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+        if writer is not None:
+            writer.close()
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> bytes:
+        """Lee una respuesta HTTP/1.1 (Content-Length o chunked)"""
+        status = await reader.readline()
+        if not status.startswith(b"HTTP/1.") or b" 200 " not in status:
+            raise ValueError(f"Respuesta inesperada: {status!r}")
+        length = None
+        chunked = False
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding" and b"chunked" in value.lower():
+                chunked = True
+        if chunked:
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return b"".join(parts)
+                parts.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if length is None:
+            raise ValueError("Respuesta sin longitud")
+        return await reader.readexactly(length)
+
+    def _accept(self, seq: int, body: bytes):
+        values = extract_new_data(body)
+        self.connected.set()
+        if values is None:
+            return
+        telemetry = telemetry_from_values(values, time.monotonic() - self.start_time)
+        with self.lock:
+            # Una respuesta más antigua que la publicada se descarta
+            if seq > self.latest_seq:
+                self.latest = telemetry
+                self.latest_seq = seq
+                self.frames += 1
+                self.last_body = body
+
+    def read_telemetry(self) -> Optional[TelemetryData]:
+        """Último frame recibido (None si aún no hay juego en marcha)"""
+        with self.lock:
+            return self.latest
+
+    def read_raw(self) -> bytes:
+        """Última respuesta JSON aceptada"""
+        return self.last_body
+
+    def read_update_counter(self) -> Optional[int]:
+        """Número de frames aceptados: el bucle solo procesa frames nuevos"""
+        return self.frames
+
+    def disconnect(self):
+        """Detiene el sondeo y espera al hilo"""
+        self.stopping = True
+        if self.thread is not None:
+            self.thread.join(self.config.SIMHUB_TIMEOUT + self.config.SIMHUB_POLL_INTERVAL + 1.0)
+            self.thread = None
+        self.connected.clear()
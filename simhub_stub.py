@@ -0,0 +1,105 @@
+"""
+Servidor falso de SimHub para pruebas sin el juego
+
+Sirve /api/getgamedata con HTTP/1.1 keep-alive y un documento parecido al
+real (NewData y OldData con muchas propiedades de relleno). El coche gasta
+combustible de forma continua y la vuelta avanza cada --lap-time segundos.
+
+Uso:
+    python simhub_stub.py --port 8888 --lap-time 90 --consumption 3.2
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Propiedades de relleno para que el documento tenga un tamaño realista
+FILLER_FIELDS = 300
+
+
+class SimulatedSession:
+    """Estado del coche simulado en función del tiempo transcurrido"""
+
+    def __init__(self, lap_time: float = 90.0, consumption: float = 3.2,
+                 fuel: float = 90.0, max_fuel: float = 100.0, total_laps: int = 30):
+        self.lap_time = lap_time
+        self.consumption = consumption
+        self.start_fuel = fuel
+        self.max_fuel = max_fuel
+        self.total_laps = total_laps
+        self.start = time.monotonic()
+        self.filler = {f"Property{i}": i * 0.5 for i in range(FILLER_FIELDS)}
+
+    def document(self) -> bytes:
+        elapsed = time.monotonic() - self.start
+        laps_done = int(elapsed // self.lap_time)
+        fuel = max(0.0, self.start_fuel - elapsed / self.lap_time * self.consumption)
+        last = self.lap_time if laps_done else 0.0
+        new_data = dict(self.filler)
+        new_data.update({
+            "Fuel": fuel,
+            "MaxFuel": self.max_fuel,
+            "CurrentLap": laps_done + 1,
+            "CompletedLaps": laps_done,
+            "TotalLaps": self.total_laps,
+            "LastLapTime": time.strftime("%H:%M:%S", time.gmtime(last)) + f".{int(last % 1 * 1e7):07d}",
+            "IsInPit": 0,
+            "CarSettings": {"Fuel": 0.0},
+        })
+        doc = {"GameRunning": True, "GameName": "LMU", "NewData": new_data, "OldData": new_data}
+        return json.dumps(doc).encode("utf-8")
+
+
+def make_handler(session: SimulatedSession):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+        disable_nagle_algorithm = True  # Cabeceras y cuerpo van en escrituras separadas
+
+        def do_GET(self):
+            if self.path != "/api/getgamedata":
+                self.send_error(404)
+                return
+            body = session.document()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port: int = 0, **kwargs) -> ThreadingHTTPServer:
+    """Arranca el servidor en un hilo; port=0 elige un puerto libre"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(SimulatedSession(**kwargs)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de SimHub")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--lap-time", type=float, default=90.0)
+    parser.add_argument("--consumption", type=float, default=3.2)
+    parser.add_argument("--fuel", type=float, default=90.0)
+    parser.add_argument("--laps", type=int, default=30)
+    args = parser.parse_args()
+
+    server = start_stub(args.port, lap_time=args.lap_time, consumption=args.consumption,
+                        fuel=args.fuel, total_laps=args.laps)
+    print(f"SimHub falso en http://127.0.0.1:{server.server_address[1]}/api/getgamedata")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,67 @@
+"""
+Sintonizador: localiza los offsets de la telemetría en la memoria compartida
+
+Dos modos:
+
+- Descubrimiento (por defecto): captura unos miles de instantáneas de cada
+  mapa en una matriz de NumPy, interpreta de una vez cada offset alineado
+  como float32, float64, int32 e int16 y puntúa cada columna según se
+  parezca al combustible (baja de forma monótona, rango plausible), a la
+  vuelta (entero que sube de uno en uno, pocas veces), al tiempo de sesión
+  (crece al ritmo del reloj) o al tiempo de la última vuelta (solo cambia al
+  cruzar la meta). Con los mejores candidatos genera un perfil de layout y
+  lo guarda en Config.CUSTOM_LAYOUTS_FILE, que el conector por offsets
+  registra al conectar (LAYOUT_PROFILE = "auto" o el nombre del perfil).
+- Monitor (--monitor): el volcado hexadecimal en vivo de siempre.
+
+Para que la vuelta y el tiempo de vuelta se detecten, la captura debe cruzar
+la meta al menos dos veces (por defecto 3000 instantáneas cada 20 ms, un
+minuto): hay que estar rodando, no en boxes ni en menús.
+
+El descubrimiento requiere numpy (pip install numpy); el monitor no.
+
+Uso:
+    python sintonizador.py
+    python sintonizador.py --mapa '$rFactor2SMMP_Telemetry$' --mapa '$rFactor2SMMP_Scoring$'
+    python sintonizador.py --frames 6000 --nombre mi_coche --constantes
+    python sintonizador.py --monitor
+"""
+
+from __future__ import annotations  # Las anotaciones np.ndarray no se evalúan sin numpy
+import argparse
 import mmap
+import os
 import struct
 import time
 import ctypes
+from typing import Dict, List, Optional, Tuple
+try:
+    import numpy as np
+except ImportError:  # Solo el descubrimiento lo necesita; --monitor funciona sin numpy
+    np = None
+from config import Config
+from layouts import (FIELDS, MAX_PLAUSIBLE_FUEL, MAX_PLAUSIBLE_LAP_TIME, MAX_PLAUSIBLE_LAPS,
+                     MAX_PLAUSIBLE_SESSION_TIME, LayoutProfile, save_profiles_file)
+from shmem import map_path, open_shared_memory
+
+# Interpretaciones de cada offset: tipo de struct -> (dtype, alineación)
+# rF2 empaqueta a 4 bytes, así que los double también pueden estar en offsets 4 mod 8
+TIPOS = {
+    "d": ("<f8", 4),
+    "f": ("<f4", 4),
+    "i": ("<i4", 4),
+    "h": ("<i2", 2),
+}
+# Orden de preferencia en empates (p. ej. la mitad alta de un double leída como float)
+PREFERENCIA = {tipo: i for i, tipo in enumerate(TIPOS)}
+
+TAMAÑO_ESCANEO = 16384  # Bytes por mapa si no se indica (los vehículos propios van al principio)
+BLOQUE_COLUMNAS = 2048  # Columnas que se convierten a float64 de una vez (memoria acotada)
+VUELTA_MINIMA = 20.0  # Segundos: una vuelta más corta no es una vuelta
+UMBRAL_CONFIANZA = 0.5  # Puntuación mínima para entrar en el perfil
+UMBRAL_RANKING = 0.05  # Por debajo no se muestra como candidato
+ROLES_CONSTANTES = ("max_fuel", "total_laps")  # No cambian: se puntúan solo por rango
+
 
 def escanear_memoria():
     print("--- ESCÁNER DE FRECUENCIA LMU ---")
@@ -56,5 +116,363 @@ def escanear_memoria():
     except KeyboardInterrupt:
         print("\nEscaneo finalizado.")
 
+# ============================================================
+# DESCUBRIMIENTO DE OFFSETS
+# ============================================================
+
+def capturar(nombres: List[str], tamaños: List[int], frames: int, intervalo: float,
+             directorio: Optional[str] = None) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Captura `frames` instantáneas de cada mapa
+    
+    Devuelve una matriz uint8 (frames x tamaño) por mapa y los instantes de
+    captura (segundos, reloj monotónico). Todos los mapas se copian en la
+    misma iteración, así que las filas están alineadas en el tiempo.
+    """
+    mapas = [open_shared_memory(nombre, tamaño, directorio, readonly=True)
+             for nombre, tamaño in zip(nombres, tamaños)]
+    matrices = [np.empty((frames, tamaño), dtype=np.uint8) for tamaño in tamaños]
+    fuentes = [np.frombuffer(mapa, dtype=np.uint8, count=tamaño)
+               for mapa, tamaño in zip(mapas, tamaños)]
+    tiempos = np.empty(frames)
+    fuente = None
+    
+    try:
+        siguiente = time.perf_counter()
+        for i in range(frames):
+            tiempos[i] = time.perf_counter()
+            for matriz, fuente in zip(matrices, fuentes):
+                matriz[i] = fuente
+            if i % 500 == 0:
+                print(f"\rCapturando... {i}/{frames}", end="", flush=True)
+            siguiente += intervalo
+            espera = siguiente - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        print(f"\rCapturadas {frames} instantáneas en {tiempos[-1] - tiempos[0]:.1f}s")
+    finally:
+        fuentes = fuente = None  # Apuntan al mapa: hay que soltarlos antes de cerrarlo
+        for mapa in mapas:
+            mapa.close()
+    return matrices, tiempos
+
+
+def interpretar(matriz: np.ndarray, tipo: str):
+    """
+    Columnas de la matriz interpretadas como `tipo` en cada offset alineado
+    
+    Genera (offsets, valores) por bloques de BLOQUE_COLUMNAS columnas;
+    valores es float64 (frames x columnas), sin copiar más de un bloque.
+    """
+    dtype, alineacion = TIPOS[tipo]
+    ancho = np.dtype(dtype).itemsize
+    tamaño = matriz.shape[1]
+    # Con alineación menor que el ancho hay varias "fases" (double en 0 y 4 mod 8)
+    for fase in range(0, ancho, alineacion):
+        columnas = (tamaño - fase) // ancho
+        if columnas <= 0:
+            continue
+        vista = matriz[:, fase:fase + columnas * ancho].view(dtype)
+        for inicio in range(0, columnas, BLOQUE_COLUMNAS):
+            fin = min(inicio + BLOQUE_COLUMNAS, columnas)
+            offsets = fase + np.arange(inicio, fin) * ancho
+            with np.errstate(invalid="ignore"):
+                valores = vista[:, inicio:fin].astype(np.float64)
+            yield offsets, valores
+
+
+def estadisticas(valores: np.ndarray, tiempos: np.ndarray, tipo: str,
+                 pasos: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Estadísticos por columna de un bloque (todos vectorizados)
+    
+    pasos: frames (de np.diff) en los que sube la vuelta; si se da, cuenta
+    cuántos cambios de cada columna coinciden con un cruce de meta.
+    """
+    with np.errstate(all="ignore"):
+        validas = np.isfinite(valores).all(axis=0)
+        if tipo in ("f", "d"):
+            # Enteros leídos como float dan subnormales: no son magnitudes reales
+            validas &= ((valores == 0) | (np.abs(valores) > 1e-6)).all(axis=0)
+        valores = np.nan_to_num(valores, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        diferencias = np.diff(valores, axis=0)
+        cambia = diferencias != 0
+        duracion = tiempos[-1] - tiempos[0]
+        datos = {
+            "validas": validas,
+            "minimo": valores.min(axis=0),
+            "maximo": valores.max(axis=0),
+            "primero": valores[0],
+            "ultimo": valores[-1],
+            "cambios": cambia.sum(axis=0),
+            "sube": (diferencias > 0).sum(axis=0),
+            "baja": (diferencias < 0).sum(axis=0),
+            "paso_maximo": diferencias.max(axis=0),
+            "ritmo": (valores[-1] - valores[0]) / duracion if duracion > 0 else 0.0 * valores[0],
+        }
+        if pasos is not None:
+            datos["en_meta"] = cambia[pasos].sum(axis=0)
+    return datos
+
+
+def analizar(matriz: np.ndarray, tiempos: np.ndarray,
+             pasos: Optional[np.ndarray] = None, tipos=tuple(TIPOS)) -> Dict[str, np.ndarray]:
+    """Estadísticos de todas las interpretaciones de un mapa, en columnas"""
+    partes = []
+    for tipo in tipos:
+        for offsets, valores in interpretar(matriz, tipo):
+            datos = estadisticas(valores, tiempos, tipo, pasos)
+            datos["offset"] = offsets
+            datos["tipo"] = np.full(len(offsets), tipo)
+            partes.append(datos)
+    return {clave: np.concatenate([parte[clave] for parte in partes]) for clave in partes[0]}
+
+
+def puntuar_vuelta(datos: Dict[str, np.ndarray], duracion: float,
+                   vuelta_minima: float = VUELTA_MINIMA) -> np.ndarray:
+    """Entero no negativo que solo sube de uno en uno y pocas veces (una por vuelta)"""
+    entero = np.isin(datos["tipo"], ("i", "h"))
+    return (entero & (datos["minimo"] >= 0) & (datos["maximo"] <= MAX_PLAUSIBLE_LAPS)
+            & (datos["baja"] == 0) & (datos["sube"] >= 1) & (datos["paso_maximo"] == 1)
+            & (datos["sube"] <= duracion / vuelta_minima + 1)).astype(np.float64)
+
+
+def puntuar(datos: Dict[str, np.ndarray], frames: int) -> Dict[str, np.ndarray]:
+    """Puntuación (0-1) de cada columna para cada campo del perfil"""
+    validas = datos["validas"]
+    real = np.isin(datos["tipo"], ("f", "d")) & validas
+    entero = np.isin(datos["tipo"], ("i", "h")) & validas
+    minimo, maximo = datos["minimo"], datos["maximo"]
+    cambios = np.maximum(datos["cambios"], 1)
+    constante = datos["cambios"] == 0
+    
+    with np.errstate(all="ignore"):
+        # Combustible: baja casi siempre que cambia (solo sube al repostar) y
+        # cambia a menudo (la mitad alta de un double cambia mucho menos)
+        actividad = np.minimum(1.0, datos["cambios"] / (0.25 * (frames - 1)))
+        combustible = (real & (minimo >= 0) & (maximo >= 1) & (maximo <= MAX_PLAUSIBLE_FUEL)
+                       & (datos["baja"] > 0) & (datos["sube"] <= 2)) \
+            * (datos["baja"] / cambios) * (0.5 + 0.5 * actividad)
+        
+        # Tiempo de sesión: nunca baja y avanza al ritmo del reloj
+        ritmo = np.where(datos["ritmo"] > 0, datos["ritmo"], np.nan)
+        coherencia = np.nan_to_num(np.exp(-np.abs(np.log(ritmo))))
+        sesion = (real & (minimo >= 0) & (maximo <= MAX_PLAUSIBLE_SESSION_TIME)
+                  & (datos["baja"] == 0) & (datos["sube"] > 0)) * coherencia
+        
+        # Tiempo de la última vuelta: solo cambia al cruzar la meta
+        if "en_meta" in datos:
+            ultima = (real & (minimo >= 0) & (maximo > 0) & (maximo <= MAX_PLAUSIBLE_LAP_TIME)
+                      & (datos["cambios"] > 0)) * (datos["en_meta"] / cambios)
+        else:
+            ultima = np.zeros(len(minimo))
+        
+        # Constantes: solo se puede comprobar el rango (ver elegir_constantes)
+        deposito = (real & constante & (minimo >= 1) & (minimo <= MAX_PLAUSIBLE_FUEL)) * 0.5
+        total = (entero & constante & (minimo >= 1) & (minimo <= MAX_PLAUSIBLE_LAPS)) * 0.5
+    
+    return {
+        "fuel": combustible,
+        "session_time": sesion,
+        "last_lap_time": ultima,
+        "max_fuel": deposito,
+        "total_laps": total,
+    }
+
+
+def ranking(datos: Dict[str, np.ndarray], puntos: np.ndarray, top: int) -> List[int]:
+    """Índices de las `top` mejores columnas (empates: preferencia de tipo y offset)"""
+    candidatos = np.flatnonzero(puntos >= UMBRAL_RANKING)
+    preferencia = np.array([PREFERENCIA[t] for t in datos["tipo"][candidatos]])
+    orden = np.lexsort((datos["offset"][candidatos], preferencia, -puntos[candidatos]))
+    return candidatos[orden[:top]].tolist()
+
+
+def solapa(offset: int, tipo: str, elegidos: Dict[str, Tuple[int, str, float]]) -> bool:
+    fin = offset + np.dtype(TIPOS[tipo][0]).itemsize
+    for otro_offset, otro_tipo, _ in elegidos.values():
+        otro_fin = otro_offset + np.dtype(TIPOS[otro_tipo][0]).itemsize
+        if offset < otro_fin and otro_offset < fin:
+            return True
+    return False
+
+
+def descubrir(matrices: List[np.ndarray], tiempos: np.ndarray, nombres: List[str],
+              top: int = 5, vuelta_minima: float = VUELTA_MINIMA):
+    """
+    Puntúa todos los offsets de todos los mapas
+    
+    Devuelve, por mapa, {campo: [(puntuación, offset, tipo, primero, último)]}
+    ordenado de mejor a peor.
+    """
+    frames = len(tiempos)
+    duracion = tiempos[-1] - tiempos[0]
+    
+    # 1) La vuelta (solo enteros): sus subidas marcan los cruces de meta
+    mejor_vuelta = None
+    candidatos_vuelta = []
+    for indice, matriz in enumerate(matrices):
+        datos = analizar(matriz, tiempos, tipos=("i", "h"))
+        puntos = puntuar_vuelta(datos, duracion, vuelta_minima)
+        orden = ranking(datos, puntos, top)
+        candidatos_vuelta.append([(puntos[i], int(datos["offset"][i]), str(datos["tipo"][i]),
+                                   datos["primero"][i], datos["ultimo"][i]) for i in orden])
+        if orden and mejor_vuelta is None:
+            i = orden[0]
+            dtype = TIPOS[str(datos["tipo"][i])][0]
+            offset = int(datos["offset"][i])
+            columna = matriz[:, offset:offset + np.dtype(dtype).itemsize].copy().view(dtype)[:, 0]
+            mejor_vuelta = columna.astype(np.int64)
+    
+    pasos = None
+    if mejor_vuelta is not None:
+        pasos = np.diff(mejor_vuelta) > 0
+        # Tolerancia de un frame: el tiempo de vuelta puede publicarse justo antes o después
+        pasos = pasos | np.roll(pasos, 1) | np.roll(pasos, -1)
+    
+    # 2) Todas las interpretaciones, con los cruces de meta ya conocidos
+    resultado = []
+    for matriz, vuelta in zip(matrices, candidatos_vuelta):
+        datos = analizar(matriz, tiempos, pasos)
+        puntos = puntuar(datos, frames)
+        campos = {"lap": vuelta}
+        for campo, valores in puntos.items():
+            campos[campo] = [(valores[i], int(datos["offset"][i]), str(datos["tipo"][i]),
+                              datos["primero"][i], datos["ultimo"][i])
+                             for i in ranking(datos, valores, top if campo not in ROLES_CONSTANTES
+                                              else len(valores))]
+        resultado.append(campos)
+    return resultado, pasos is not None
+
+
+def elegir(candidatos: Dict[str, list], constantes: bool = False) -> Dict[str, Tuple[int, str, float]]:
+    """
+    Mejor candidato de cada campo sin solapes: {campo: (offset, tipo, puntuación)}
+    
+    Los campos constantes (depósito, vueltas totales) solo se pueden
+    distinguir por el rango, así que solo entran si se piden; se prefiere el
+    depósito más cercano al combustible y mayor que él, y unas vueltas
+    totales mayores que la vuelta actual.
+    """
+    elegidos: Dict[str, Tuple[int, str, float]] = {}
+    limites: Dict[str, float] = {}
+    for campo in ("fuel", "lap", "session_time", "last_lap_time"):
+        for puntos, offset, tipo, primero, ultimo in candidatos.get(campo, []):
+            if puntos >= UMBRAL_CONFIANZA and not solapa(offset, tipo, elegidos):
+                elegidos[campo] = (offset, tipo, puntos)
+                limites[campo] = max(primero, ultimo)
+                break
+    
+    if constantes and "fuel" in elegidos:
+        offset_combustible = elegidos["fuel"][0]
+        opciones = [c for c in candidatos.get("max_fuel", []) if c[3] >= limites["fuel"]]
+        opciones.sort(key=lambda c: abs(c[1] - offset_combustible))
+        for puntos, offset, tipo, _, _ in opciones:
+            if not solapa(offset, tipo, elegidos):
+                elegidos["max_fuel"] = (offset, tipo, puntos)
+                break
+    if constantes and "lap" in elegidos:
+        for puntos, offset, tipo, primero, _ in candidatos.get("total_laps", []):
+            if primero >= limites["lap"] and not solapa(offset, tipo, elegidos):
+                elegidos["total_laps"] = (offset, tipo, puntos)
+                break
+    return elegidos
+
+
+def crear_perfil(nombre: str, elegidos: Dict[str, Tuple[int, str, float]],
+                 mapa: str) -> LayoutProfile:
+    return LayoutProfile(
+        nombre,
+        {campo: offset for campo, (offset, _, _) in elegidos.items()},
+        {campo: tipo for campo, (_, tipo, _) in elegidos.items()},
+        f"Generado por sintonizador.py sobre {mapa} ({time.strftime('%Y-%m-%d')})",
+    )
+
+
+def imprimir_candidatos(nombre: str, campos: Dict[str, list], top: int):
+    print(f"\n=== {nombre} ===")
+    for campo in FIELDS:
+        lista = campos.get(campo, [])[:top]
+        if not lista:
+            print(f"  {campo:14s} sin candidatos")
+            continue
+        for puesto, (puntos, offset, tipo, primero, ultimo) in enumerate(lista):
+            etiqueta = campo if puesto == 0 else ""
+            dudoso = " (dudoso)" if campo in ROLES_CONSTANTES else ""
+            print(f"  {etiqueta:14s} @{offset:<6d} {tipo}  {puntos:4.2f}  "
+                  f"{primero:12.4f} -> {ultimo:12.4f}{dudoso}")
+
+
+def tamaño_mapa(nombre: str, tamaño: Optional[int], directorio: Optional[str]) -> int:
+    """Bytes a capturar: los pedidos o TAMAÑO_ESCANEO, sin pasar del fichero"""
+    tamaño = tamaño or TAMAÑO_ESCANEO
+    if directorio is not None:
+        tamaño = min(tamaño, os.path.getsize(map_path(directorio, nombre)))
+    return tamaño
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Descubre los offsets de la telemetría")
+    parser.add_argument("--mapa", action="append",
+                        help="Mapa a escanear (repetible; el perfil se genera para el primero)")
+    parser.add_argument("--tamaño", type=int, help=f"Bytes por mapa (por defecto {TAMAÑO_ESCANEO})")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--intervalo", type=float, default=0.02, help="Segundos entre instantáneas")
+    parser.add_argument("--vuelta-minima", type=float, default=VUELTA_MINIMA,
+                        help="Segundos; subidas más frecuentes no son vueltas")
+    parser.add_argument("--top", type=int, default=5, help="Candidatos mostrados por campo")
+    parser.add_argument("--nombre", default="scan", help="Nombre del perfil generado")
+    parser.add_argument("--salida", default=config.CUSTOM_LAYOUTS_FILE)
+    parser.add_argument("--constantes", action="store_true",
+                        help="Incluir depósito y vueltas totales (solo se comprueba su rango)")
+    parser.add_argument("--monitor", action="store_true", help="Volcado hexadecimal en vivo")
+    args = parser.parse_args()
+    
+    if args.monitor:
+        escanear_memoria()
+        return
+    
+    if np is None:
+        print("El descubrimiento de offsets requiere numpy: pip install numpy")
+        return
+    
+    nombres = args.mapa or [config.SHARED_MEMORY_NAME]
+    directorio = config.SHARED_MEMORY_DIR
+    try:
+        tamaños = [tamaño_mapa(nombre, args.tamaño, directorio) for nombre in nombres]
+        print(f"Capturando {', '.join(nombres)} ({sum(tamaños) * args.frames / 1e6:.0f} MB)")
+        matrices, tiempos = capturar(nombres, tamaños, args.frames, args.intervalo, directorio)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo abrir la memoria compartida: {e}")
+        return
+    
+    resultado, hubo_vuelta = descubrir(matrices, tiempos, nombres, args.top, args.vuelta_minima)
+    for nombre, campos in zip(nombres, resultado):
+        imprimir_candidatos(nombre, campos, args.top)
+    if not hubo_vuelta:
+        print("\nAviso: la captura no cruzó la meta; la vuelta y su tiempo no se pueden detectar")
+    
+    elegidos = elegir(resultado[0], args.constantes)
+    if "fuel" not in elegidos:
+        print(f"\nNo se encontró el combustible en {nombres[0]}: no se genera perfil")
+        return
+    try:
+        perfil = crear_perfil(args.nombre, elegidos, nombres[0])
+    except (ValueError, struct.error) as e:
+        print(f"\nLos candidatos no forman un perfil válido: {e}")
+        return
+    
+    save_profiles_file(args.salida, [perfil])
+    print(f"\nPerfil '{perfil.name}' guardado en {args.salida}:")
+    for campo, (offset, tipo, puntos) in sorted(elegidos.items(), key=lambda e: e[1][0]):
+        print(f"  {campo:14s} @{offset:<6d} {tipo}  ({puntos:.2f})")
+    faltan = [campo for campo in FIELDS if campo not in elegidos]
+    if faltan:
+        print(f"  Sin detectar (valor por defecto): {', '.join(faltan)}")
+    print(f"Para usarlo: LAYOUT_PROFILE = \"{perfil.name}\" (o \"auto\") en config.py")
+
+
 if __name__ == "__main__":
-    escanear_memoria()
+    main()
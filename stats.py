@@ -0,0 +1,245 @@
+"""
+Estructuras de estadística incremental para el cálculo de consumo
+Las actualizaciones son O(1) (la mediana, una búsqueda binaria y un
+desplazamiento en la ventana): el coste por vuelta no crece con el histórico
+"""
+
+import math
+from array import array
+from bisect import bisect_left, insort
+from typing import Iterator, List, Optional
+
+
+class RingBuffer:
+    """Buffer circular de capacidad fija con suma, varianza y EWMA incrementales"""
+
+    def __init__(self, capacity: int, ewma_alpha: float = 0.3):
+        if capacity < 1:
+            raise ValueError("La capacidad debe ser al menos 1")
+        self.capacity = capacity
+        self.ewma_alpha = ewma_alpha
+        self._data = array('d', [0.0]) * capacity
+        self._start = 0  # Índice del elemento más antiguo
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._ewma: Optional[float] = None
+
+    def append(self, value: float):
+        """Añade un valor, descartando el más antiguo si el buffer está lleno"""
+        data = self._data
+        full = self._count == self.capacity
+        if full:
+            old = data[self._start]
+            data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+            self._sum -= old
+            self._sum_sq -= old * old
+        else:
+            data[(self._start + self._count) % self.capacity] = value
+            self._count += 1
+
+        self._sum += value
+        self._sum_sq += value * value
+
+        if self._ewma is None:
+            self._ewma = value
+        else:
+            self._ewma += self.ewma_alpha * (value - self._ewma)
+
+        # Las sumas se recalculan en cada vuelta completa del buffer para evitar
+        # deriva numérica (amortizado O(1), sin contadores que crezcan)
+        if full and self._start == 0:
+            self._resync()
+
+    def _resync(self):
+        """Recalcula las sumas desde los datos (buffer lleno: todos los huecos valen)"""
+        total = 0.0
+        total_sq = 0.0
+        for value in self._data:
+            total += value
+            total_sq += value * value
+        self._sum = total
+        self._sum_sq = total_sq
+
+    def clear(self):
+        """Vacía el buffer y reinicia las estadísticas"""
+        self._start = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._ewma = None
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        """Media de la ventana (0.0 si está vacía)"""
+        if not self._count:
+            return 0.0
+        return self._sum / self._count
+
+    @property
+    def variance(self) -> float:
+        """Varianza muestral de la ventana"""
+        if self._count < 2:
+            return 0.0
+        variance = (self._sum_sq - self._sum * self._sum / self._count) / (self._count - 1)
+        return max(variance, 0.0)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def ewma(self) -> float:
+        """Media móvil exponencial de todos los valores añadidos"""
+        return self._ewma if self._ewma is not None else 0.0
+
+    def recent_mean(self, count: int) -> float:
+        """Media de los últimos `count` valores"""
+        count = min(count, self._count)
+        if not count:
+            return 0.0
+        total = 0.0
+        for i in range(self._count - count, self._count):
+            total += self._data[(self._start + i) % self.capacity]
+        return total / count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __getitem__(self, index: int) -> float:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("índice fuera del buffer")
+        return self._data[(self._start + index) % self.capacity]
+
+    def __iter__(self) -> Iterator[float]:
+        for i in range(self._count):
+            yield self._data[(self._start + i) % self.capacity]
+
+    def to_list(self) -> List[float]:
+        """Valores del más antiguo al más reciente"""
+        return list(self)
+
+
+class WindowedMedian:
+    """
+    Mediana de los últimos `capacity` valores en memoria fija
+
+    Cada valor se guarda en orden de llegada (buffer circular, para saber
+    cuál sale de la ventana) y en una lista ordenada que, una vez llena la
+    ventana, mantiene su longitud: cada inserción es una búsqueda binaria y
+    un desplazamiento hecho en C, sin crear ni liberar contenedores.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("La capacidad debe ser al menos 1")
+        self.capacity = capacity
+        self._window = array('d', [0.0]) * capacity
+        self._start = 0  # Índice del valor más antiguo
+        self._count = 0
+        self._sorted: List[float] = []
+
+    def append(self, value: float):
+        """Añade un valor, descartando el más antiguo si la ventana está llena"""
+        window = self._window
+        if self._count == self.capacity:
+            old = window[self._start]
+            window[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+            del self._sorted[bisect_left(self._sorted, old)]
+        else:
+            window[(self._start + self._count) % self.capacity] = value
+            self._count += 1
+        insort(self._sorted, value)
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+        self._sorted.clear()
+
+    @property
+    def median(self) -> float:
+        """Mediana de la ventana (0.0 si está vacía)"""
+        count = self._count
+        if not count:
+            return 0.0
+        middle = count // 2
+        if count % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __iter__(self) -> Iterator[float]:
+        for i in range(self._count):
+            yield self._window[(self._start + i) % self.capacity]
+
+
+class RunningStats:
+    """Estadísticas acumuladas sin ventana (algoritmo de Welford)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        """Añade un valor a las estadísticas"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def merge(self, other: "RunningStats"):
+        """Combina otras estadísticas en estas (algoritmo paralelo de Chan)"""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @classmethod
+    def from_summary(cls, count: int, mean: float, variance: float = 0.0,
+                     minimum: float = math.inf, maximum: float = -math.inf) -> "RunningStats":
+        """Reconstruye las estadísticas a partir de un resumen guardado"""
+        stats = cls()
+        stats.count = count
+        stats.mean = mean
+        stats._m2 = variance * (count - 1) if count > 1 else 0.0
+        stats.minimum = minimum
+        stats.maximum = maximum
+        return stats
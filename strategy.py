@@ -0,0 +1,158 @@
+"""
+Optimizador de estrategia de paradas en boxes
+
+Programación dinámica sobre (vueltas restantes, combustible en el tanque)
+que minimiza el tiempo perdido por paradas (pit lane + repostaje) y por
+llevar peso de combustible de más. El combustible se discretiza en
+STRATEGY_STEPS_PER_LAP unidades por vuelta de consumo.
+
+La tabla V(n, u) solo depende de los parámetros (consumo, capacidad,
+ritmo de repostaje, pérdida en boxes, penalización por peso), no del
+estado de la carrera: se memoriza por parámetros redondeados y se amplía
+fila a fila. Replanificar en cada vuelta es una consulta más reconstruir
+el plan, O(vueltas), sin volver a resolver.
+"""
+
+import math
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Optional
+
+INF = float("inf")
+
+
+@dataclass
+class PitStop:
+    """Una parada del plan"""
+    lap: int  # Entrar en boxes al terminar esta vuelta
+    fuel_to_add: float  # Litros a repostar
+    time_loss: float  # Segundos: pit lane + repostaje
+
+
+@dataclass
+class PitPlan:
+    """Plan de paradas más rápido para el resto de la carrera"""
+    stops: List[PitStop] = field(default_factory=list)
+    time_loss: float = 0.0  # Segundos perdidos en total (paradas + peso)
+    feasible: bool = True  # False si el tanque no da ni para una vuelta
+
+    @property
+    def next_stop(self) -> Optional[PitStop]:
+        return self.stops[0] if self.stops else None
+
+
+class StrategyTable:
+    """Tabla V(n, u) para unos parámetros fijos, ampliable por filas"""
+
+    def __init__(self, consumption: float, capacity: float, refuel_rate: float,
+                 pit_loss: float, weight_penalty: float, steps_per_lap: int):
+        self.steps = steps_per_lap
+        self.unit = consumption / steps_per_lap  # Litros por unidad de combustible
+        self.capacity_units = int(capacity / self.unit + 1e-9)
+        self.pit_loss = pit_loss
+        self.refuel_time = self.unit / refuel_rate  # Segundos por unidad repostada
+        # Tiempo por vuelta por llevar u unidades en el tanque
+        self.lap_weight = [weight_penalty * u * self.unit for u in range(self.capacity_units + 1)]
+        # values[n][u]: tiempo mínimo perdido con n vueltas restantes y u unidades
+        # choices[n][u]: unidades tras repostar en esa línea, o -1 si no se para
+        self.values = [[0.0] * (self.capacity_units + 1)]
+        self.choices: List[Optional[List[int]]] = [None]
+
+    def extend(self, laps: int):
+        """Calcula las filas que falten hasta `laps` vueltas restantes"""
+        while len(self.values) <= laps:
+            self._add_row()
+
+    def _add_row(self):
+        k = self.steps
+        top = self.capacity_units
+        prev = self.values[-1]
+        weight = self.lap_weight
+        refuel = self.refuel_time
+
+        # Coste de salir de boxes con t unidades (sin la parte que ya había)
+        exit_cost = [INF] * min(k, top + 1) + \
+            [t * refuel + weight[t] + prev[t - k] for t in range(k, top + 1)]
+
+        # Mejor destino de repostaje estrictamente por encima de u: mínimo de
+        # sufijo de (coste, destino), calculado en C con accumulate
+        suffix = list(accumulate(reversed(list(zip(exit_cost, range(top + 1)))), min))
+        suffix.reverse()
+        suffix.append((INF, -1))
+
+        row = []
+        choice = []
+        for u in range(top + 1):
+            stay = weight[u] + prev[u - k] if u >= k else INF
+            cost, target = suffix[u + 1]
+            pit = self.pit_loss - u * refuel + cost
+            if pit < stay:
+                row.append(pit)
+                choice.append(target)
+            else:
+                row.append(stay)
+                choice.append(-1)
+        self.values.append(row)
+        self.choices.append(choice)
+
+
+@lru_cache(maxsize=16)
+def get_table(consumption: float, capacity: float, refuel_rate: float,
+              pit_loss: float, weight_penalty: float, steps_per_lap: int) -> StrategyTable:
+    """Tabla memorizada para estos parámetros (ya redondeados)"""
+    return StrategyTable(consumption, capacity, refuel_rate, pit_loss,
+                         weight_penalty, steps_per_lap)
+
+
+def plan_stops(fuel: float, capacity: float, consumption: float, laps_remaining: int,
+               current_lap: int, refuel_rate: float, pit_loss: float,
+               weight_penalty: float, safety_margin: float = 0.0,
+               steps_per_lap: int = 2, consumption_step: float = 0.05,
+               remaining_burn: Optional[float] = None) -> PitPlan:
+    """
+    Plan de paradas más rápido desde el estado actual
+
+    `fuel` es el combustible ahora, en la vuelta en curso (una de las
+    `laps_remaining`), y `remaining_burn` lo que se gastará hasta la próxima
+    línea de meta (None = una vuelta entera, recién cruzada la línea). La
+    primera parada posible es al terminar esta vuelta (current_lap + 1).
+
+    El consumo se redondea hacia arriba a `consumption_step` (conservador y
+    para que vueltas con promedios casi iguales compartan la misma tabla).
+    El margen de seguridad se reserva siempre en el tanque.
+    """
+    if consumption <= 0 or laps_remaining <= 0 or capacity <= safety_margin:
+        return PitPlan()
+
+    # El plan empieza en la próxima línea: combustible y vueltas desde ahí
+    line_fuel = fuel - (consumption if remaining_burn is None else remaining_burn)
+    if line_fuel < 0:
+        return PitPlan(feasible=False)
+    laps_after = laps_remaining - 1
+
+    consumption = math.ceil(consumption / consumption_step - 1e-9) * consumption_step
+    table = get_table(round(consumption, 4), round(capacity - safety_margin, 1),
+                      refuel_rate, pit_loss, weight_penalty, steps_per_lap)
+    table.extend(laps_after)
+
+    units = min(int(max(line_fuel - safety_margin, 0.0) / table.unit + 1e-9),
+                table.capacity_units)
+    total = table.values[laps_after][units]
+    if total == INF:
+        return PitPlan(feasible=False)
+
+    # Reconstrucción del plan siguiendo las decisiones de la tabla
+    stops = []
+    tank = line_fuel  # Litros reales estimados en cada línea
+    for done in range(laps_after):
+        target = table.choices[laps_after - done][units]
+        if target >= 0:
+            fuel_to_add = max(target * table.unit + safety_margin - tank, 0.0)
+            stops.append(PitStop(lap=current_lap + 1 + done, fuel_to_add=fuel_to_add,
+                                 time_loss=pit_loss + fuel_to_add / refuel_rate))
+            tank += fuel_to_add
+            units = target
+        units -= table.steps
+        tank -= consumption
+    return PitPlan(stops=stops, time_loss=total)
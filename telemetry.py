@@ -0,0 +1,45 @@
+"""
+Estructuras de datos de telemetría compartidas por los conectores
+"""
+
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class TelemetryData:
+    """Datos de telemetría del juego"""
+    fuel: float = 0.0
+    max_fuel: float = 0.0
+    lap: int = 0
+    total_laps: int = 0
+    session_time: float = 0.0
+    last_lap_time: float = 0.0
+    lap_dist: float = 0.0  # Metros recorridos en la vuelta actual (0 si no se conoce)
+    track_length: float = 0.0  # Longitud del circuito en metros (0 si no se conoce)
+    in_pits: bool = False  # El jugador está en el pit lane (False si no se conoce)
+    track_name: str = ""  # Circuito (vacío si el conector no lo da)
+    vehicle_name: str = ""  # Coche del jugador (vacío si el conector no lo da)
+
+
+TELEMETRY_FIELDS = tuple(f.name for f in fields(TelemetryData))
+_DEFAULTS = tuple((f.name, f.default) for f in fields(TelemetryData))
+
+
+class TelemetryFrame:
+    """
+    Frame de telemetría reutilizable (Config.LOW_ALLOCATION_MODE)
+
+    Mismos campos que TelemetryData, con __slots__: el conector lo rellena en
+    cada lectura (read_telemetry_into) en lugar de crear un objeto nuevo. Lo
+    que se guarde de un tick para otro debe copiar los valores, no el frame.
+    """
+
+    __slots__ = TELEMETRY_FIELDS
+
+    def __init__(self):
+        for name, default in _DEFAULTS:
+            setattr(self, name, default)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in TELEMETRY_FIELDS)
+        return f"TelemetryFrame({values})"
@@ -0,0 +1,79 @@
+"""
+Pruebas de asignación de memoria del modo de baja asignación
+
+El tick completo (FuelMonitor.tick con LOW_ALLOCATION_MODE), cruzando la meta
+en cada vuelta, no deja asignaciones netas ni despierta al recolector.
+
+Uso:
+    python -m pytest -q test_allocations.py
+    python -m unittest test_allocations
+"""
+
+import unittest
+from benchmark import bench_allocations, check_allocations
+from calculator import FuelAnalysis
+from dashboard import DashboardDisplay
+from display import NullDisplay
+from stats import RingBuffer, WindowedMedian
+from telemetry import TelemetryFrame
+
+
+class _Server:
+    """Sustituto de DashboardServer: solo guarda lo publicado"""
+
+    def __init__(self):
+        self.latest = None
+
+    def publish(self, telemetry, analysis):
+        self.latest = (telemetry, analysis)
+
+
+class AllocationTest(unittest.TestCase):
+
+    def test_tick_without_net_allocations(self):
+        result = bench_allocations(laps=2)
+        self.assertGreaterEqual(result["laps_crossed"], 4)
+        self.assertEqual(result["net_bytes"], 0, result)
+        self.assertEqual(result["gc_collections"], 0, result)
+        self.assertTrue(check_allocations(result))
+
+    def test_check_rejects_retained_memory(self):
+        self.assertFalse(check_allocations({"laps_crossed": 4, "net_bytes": 32,
+                                            "gc_collections": 0}))
+        self.assertFalse(check_allocations({"laps_crossed": 0, "net_bytes": 0,
+                                            "gc_collections": 0}))
+
+    def test_windowed_median_matches_sorted_window(self):
+        window = WindowedMedian(5)
+        values = [3.1, 2.9, 3.4, 3.0, 2.8, 3.3, 3.2, 2.7, 3.5]
+        for i, value in enumerate(values):
+            window.append(value)
+            recent = sorted(values[max(0, i - 4):i + 1])
+            middle = len(recent) // 2
+            expected = recent[middle] if len(recent) % 2 else (recent[middle - 1] + recent[middle]) / 2
+            self.assertAlmostEqual(window.median, expected)
+        self.assertEqual(list(window), values[-5:])
+
+    def test_ring_buffer_resync_keeps_mean(self):
+        buffer = RingBuffer(3)
+        for value in range(10):
+            buffer.append(float(value))
+        self.assertAlmostEqual(buffer.mean, 8.0)
+
+    def test_dashboard_receives_copies_of_reused_frame(self):
+        server = _Server()
+        display = DashboardDisplay(server, NullDisplay(), copy_frames=True)
+        frame = TelemetryFrame()
+        frame.fuel = 42.0
+        analysis = FuelAnalysis(status="WARNING")
+        display.update(frame, analysis)
+        frame.fuel = 10.0  # El monitor rellena el mismo frame en el tick siguiente
+        telemetry, published = server.latest
+        self.assertIsNot(telemetry, frame)
+        self.assertIsNot(published, analysis)
+        self.assertEqual(telemetry.fuel, 42.0)
+        self.assertEqual(published.status, "WARNING")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Pruebas del emulador rF2 leído con el conector ctypes
+
+La parada en boxes del emulador (mInPits en el Scoring) llega a la
+calculadora: la vuelta de entrada y la de salida se clasifican como "pit" y
+no entran en la mediana de consumo.
+
+Uso:
+    python -m pytest -q test_emulator.py
+    python -m unittest test_emulator
+"""
+
+import shutil
+import tempfile
+import unittest
+from calculator import LAP_CLEAN, LAP_PIT, FuelCalculator
+from emulator import RF2Emulator
+from rf2_connector import RF2DirectConnector
+
+DT = 0.01  # Segundos por frame de telemetría
+SCORING_EVERY = 20  # Frames entre publicaciones del Scoring (5 Hz)
+
+
+class EmulatorPitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Poco combustible: para en boxes a las pocas vueltas
+        self.emulator = RF2Emulator(self.directory, lap_time=20.0, consumption=3.2,
+                                    fuel=12.0, total_laps=30, seed=1)
+        self.emulator.open()
+        self.connector = RF2DirectConnector()
+        self.connector.config.SHARED_MEMORY_DIR = self.directory
+        self.assertTrue(self.connector.connect())
+
+    def tearDown(self):
+        self.connector.disconnect()
+        self.emulator.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_laps(self, laps: int):
+        """Avanza el emulador y pasa cada lectura a la calculadora"""
+        calculator = FuelCalculator()
+        classes = []  # (vuelta completada, clase, consumo)
+        frame = 0
+        while self.emulator.cars[0].laps <= laps:
+            self.emulator.step(DT)
+            self.emulator.publish_telemetry(DT)
+            frame += 1
+            if frame % SCORING_EVERY == 0:
+                self.emulator._publish_scoring()
+            telemetry = self.connector.read_telemetry()
+            if telemetry is None or telemetry.lap <= 0:
+                continue
+            previous = calculator.last_lap
+            calculator.update(telemetry.fuel, telemetry.max_fuel, telemetry.lap,
+                              telemetry.total_laps, telemetry.last_lap_time,
+                              telemetry.lap_dist, telemetry.track_length, telemetry.in_pits)
+            if calculator.last_lap > previous > 0:
+                classes.append((previous, calculator.last_lap_class,
+                                calculator.last_lap_consumption))
+        return calculator, classes
+
+    def test_in_and_out_laps_are_pit_laps(self):
+        calculator, classes = self.run_laps(7)
+        kinds = [kind for _, kind, _ in classes]
+        pit_laps = [i for i, kind in enumerate(kinds) if kind == LAP_PIT]
+        # Una sola parada: vuelta de entrada y de salida, seguidas
+        self.assertEqual(len(pit_laps), 2, classes)
+        self.assertEqual(pit_laps[1], pit_laps[0] + 1, classes)
+        self.assertIn(LAP_CLEAN, kinds[:pit_laps[0]], classes)
+        self.assertIn(LAP_CLEAN, kinds[pit_laps[1] + 1:], classes)
+
+        # Solo las vueltas limpias alimentan la mediana y las estadísticas limpias
+        clean = [consumption for _, kind, consumption in classes if kind == LAP_CLEAN]
+        self.assertEqual(list(calculator.consumption_median), clean)
+        self.assertEqual(calculator.clean_stats.count, len(clean))
+        for _, kind, consumption in classes:
+            if kind == LAP_PIT and consumption is not None:
+                self.assertNotIn(consumption, clean)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -112,6 +112,24 @@ class FuelMonitorSimulation:
             print("\n\nSimulación detenida por el usuario")
 
 
+def run_monte_carlo(sim: FuelMonitorSimulation):
+    """Simula en lote el escenario base con la configuración actual"""
+    try:
+        from montecarlo import RaceScenario, simulate
+    except ImportError:
+        print("El modo Monte Carlo requiere numpy: pip install numpy")
+        return
+    
+    scenario = RaceScenario(
+        total_laps=sim.total_laps,
+        max_fuel=sim.max_fuel,
+        start_fuel=sim.current_fuel,
+        base_consumption=sim.base_consumption,
+        consumption_lap_std=sim.consumption_variance,
+    )
+    print(simulate(scenario, races=20000).summary())
+
+
 def run_test_scenarios():
     """Ejecuta varios escenarios de prueba"""
     
@@ -121,12 +139,17 @@ def run_test_scenarios():
     print("1. Escenario OK - Suficiente combustible")
     print("2. Escenario WARNING - Ajustado")
     print("3. Escenario CRITICAL - Necesitas ahorrar")
-    print("4. Escenario SIN COMBUSTIBLE - No llegas\n")
+    print("4. Escenario SIN COMBUSTIBLE - No llegas")
+    print("5. Monte Carlo - miles de carreras sin esperas (requiere numpy)\n")
     
-    choice = input("Selecciona un escenario (1-4) o Enter para escenario aleatorio: ")
+    choice = input("Selecciona un escenario (1-5) o Enter para escenario aleatorio: ")
     
     sim = FuelMonitorSimulation()
     
+    if choice == "5":
+        run_monte_carlo(sim)
+        return
+    
     if choice == "1":
         # Escenario OK
         sim.current_fuel = 75.0